@@ -1,9 +1,137 @@
 # This script contains all the functions that I use to scrape the out files
 #  from MCNP.
 
+import io
+import os
 import re
 import csv
+import bz2
+import glob
+import gzip
+import lzma
+import mmap
+import time
+import shutil
 import pickle
+import hashlib
+import functools
+import multiprocessing
+import numpy as np
+import tldGeometry as tld
+
+# These are the tally numbers for the 55 F6 tallies in the PNS input deck, in
+#  the order that MCNP prints them (F4006 to F4546). They come from the table
+#  of TLD stations in tldGeometry.py, which says where each one is.
+tally_numbers = tld.tally_numbers.astype('i8')
+
+# This is the layout of the structured array returned by scrape_out_file. Each
+#  record is one tally and holds the tally fluctuation chart (tfc) values from
+#  the last (or requested) nps along with the number of statistical checks
+#  that the tally passed. Values that weren't found in the file are left as NaN
+#  (or -1 for the integer fields).
+tally_dtype = np.dtype([('tally', 'i4'), ('nps', 'i8'), ('mean', 'f8'),
+                        ('error', 'f8'), ('vov', 'f8'), ('slope', 'f8'),
+                        ('fom', 'f8'), ('checks', 'i2')])
+
+# This is the layout of one row of the tally fluctuation chart. MCTAL files 
+#  only have the nps, mean, error and fom for each row, so vov and slope are NaN
+#  when the history comes from read_mctal.
+tfc_dtype = np.dtype([('nps', 'i8'), ('mean', 'f8'), ('error', 'f8'),
+                      ('vov', 'f8'), ('slope', 'f8'), ('fom', 'f8')])
+
+statistics_pattern = re.compile(r"\s{5}(4\d\d\d)\s{3}(\w\wssed)\s+(\S+)")
+# Only lines that are nothing but "tally <number>" pairs are group headers of
+#  the tally fluctuation charts. The tally printouts at every print dump have
+#  other lines that start with "tally", like 
+#  "tally type 6    track length estimate of heating."
+tfc_header_line_pattern = re.compile(r"^ *tally +\d+(?: +tally +\d+)* *\r?$", re.M)
+
+# These are the byte versions of the patterns used by "scan_out_file_mmap",
+#  which runs them over the whole memory-mapped output file instead of one 
+#  line at a time.
+statistics_bytes_pattern = re.compile(statistics_pattern.pattern.encode())
+tfc_header_pattern = re.compile(tfc_header_line_pattern.pattern.encode(), re.M)
+tfc_row_pattern = re.compile(rb"^ *\d+ [^\n]*", re.M)
+
+# Output files can be compressed on disk to save project quota. The type of
+#  compression is found from the file extension or, if the extension isn't one
+#  of these, from the first bytes of the file. zstd needs the "zstandard"
+#  package; the others are part of python.
+compressed_extensions = {'.gz': 'gzip', '.bz2': 'bz2', '.xz': 'xz',
+                         '.zst': 'zstd'}
+compression_magic = {b'\x1f\x8b': 'gzip', b'BZh': 'bz2',
+                     b'\xfd7zXZ\x00': 'xz', b'\x28\xb5\x2f\xfd': 'zstd'}
+
+def compression_of(filename):
+    # This function returns 'gzip', 'bz2', 'xz' or 'zstd' if the file is 
+    #  compressed and None if it is plain text.
+    extension = os.path.splitext(filename)[1]
+    if extension in compressed_extensions:
+        return compressed_extensions[extension]
+    with open(filename, 'rb') as myfile:
+        start = myfile.read(6)
+    for magic, method in compression_magic.items():
+        if start.startswith(magic):
+            return method
+    return None
+
+def import_zstandard():
+    # The zstandard package is only needed for .zst files, so it is only
+    #  imported when one of them is opened.
+    try:
+        import zstandard
+    except ImportError:
+        raise ImportError('Reading or writing .zst files needs the zstandard '
+                          'package (pip install zstandard)') from None
+    return zstandard
+
+def open_out_file(filename):
+    # This function opens an output (or MCTAL) file for reading as text, 
+    #  decompressing it on the fly if it is compressed. Nothing is written to
+    #  scratch, so compressed files can be scraped where they are.
+    method = compression_of(filename)
+    if method is None:
+        return open(filename, 'rt', buffering=1 << 20)
+    if method == 'gzip':
+        return gzip.open(filename, 'rt')
+    if method == 'bz2':
+        return bz2.open(filename, 'rt')
+    if method == 'xz':
+        return lzma.open(filename, 'rt')
+    zstandard = import_zstandard()
+    reader = zstandard.ZstdDecompressor().stream_reader(
+        open(filename, 'rb'), read_across_frames=True, closefd=True)
+    return io.TextIOWrapper(reader)
+
+def compress_out_file(filename, method='gzip', remove_original=True):
+    # This function compresses an output file and (by default) deletes the 
+    #  original. The compressed file is written next to it with a temporary 
+    #  name and renamed once it is complete, so a crash never leaves a
+    #  half-written file with the final name. It returns the new filename.
+    # method can be 'gzip', 'bz2', 'xz' or 'zstd'.
+    extensions = {'gzip': '.gz', 'bz2': '.bz2', 'xz': '.xz', 'zstd': '.zst'}
+    compressed_name = filename + extensions[method]
+    temp_name = compressed_name + '.tmp'
+    with open(filename, 'rb') as source:
+        if method == 'zstd':
+            zstandard = import_zstandard()
+            with open(temp_name, 'wb') as destination:
+                zstandard.ZstdCompressor(level=9).copy_stream(source,
+                                                              destination)
+        else:
+            if method == 'gzip':
+                destination = gzip.open(temp_name, 'wb', compresslevel=6)
+            elif method == 'bz2':
+                destination = bz2.open(temp_name, 'wb')
+            else:
+                destination = lzma.open(temp_name, 'wb')
+            with destination:
+                shutil.copyfileobj(source, destination, 1 << 20)
+    shutil.copystat(filename, temp_name)
+    os.replace(temp_name, compressed_name)
+    if remove_original:
+        os.remove(filename)
+    return compressed_name
 
 def get_tally_lines(filename,nps):
     # This function will pull the whole line of text from the MCNP output file
@@ -24,22 +152,19 @@ def get_tally_lines(filename,nps):
     linenum = 0
     tally_lines = list()
     tally_pattern = re.compile(r"\s{2}" + str(int(nps)) + r"\s{3}\d")
-    with open (filename, 'rt') as myfile:
+    with open_out_file(filename) as myfile:
         for line in myfile:
             linenum += 1
             if tally_pattern.search(line) != None:
                 tally_lines.append((line.rstrip('\n')))
     return tally_lines
 
-def get_all_tally_info(filename,nps):
-    # This function will use the function "get_tally_lines" to extract all the 
-    #  lines of text that contain tally information. It will use those lines
-    #  and call the other functions to ultimately save csv files for each of
-    #  the following pieces of information that are given in the MCNP output:
-        # mean
-        # error
-        # vov (variance of the variance)
-        # slope
+def get_all_tally_info(filename,nps=None):
+    # This function returns the mean, error, vov (variance of the variance) and
+    #  slope of every tally in one MCNP output file as four 1D lists, ordered
+    #  from tally F4006 to F4546. It used to pull the tally lines with 
+    #  "get_tally_lines" and split them once for each quantity, but it now uses
+    #  scrape_out_file so that the file is only read once.
     # NOTE: This function will only get tally information for the one filename
     #  that is the input variable. To get all tallys for a full run, this
     #  function will need to be iterated over all the output files.
@@ -49,14 +174,780 @@ def get_all_tally_info(filename,nps):
         #  function is used when in the output file's directory.
         # nps: This needs to be a whole number and written as an integer
         #  variable. It can be written in long notation (eg: 5000) or
-        # scientific notation (eg: 5e3).
-    tally_lines = get_tally_lines(filename, nps)
-    mean_list = get_mean_tallys(tally_lines)
-    error_list = get_error_tallys(tally_lines)
-    vov_list = get_vov_tallys(tally_lines)
-    slope_list = get_slope_tallys(tally_lines)
+        # scientific notation (eg: 5e3). If it is left as None, the last nps
+        #  in the tally fluctuation charts is used.
+    # The filename can also be a MCTAL file (mct=mctal_PNS_... in the sbatch
+    #  files), which is much smaller than the output file. MCTAL files don't 
+    #  have the vov or slope, so those lists will be all NaN.
+    if is_mctal_file(filename):
+        tallies = read_mctal(filename, nps)[0]
+    else:
+        tallies = scrape_out_file(filename, nps)
+    found = ~np.isnan(tallies['mean'])
+    mean_list = tallies['mean'][found].tolist()
+    error_list = tallies['error'][found].tolist()
+    vov_list = tallies['vov'][found].tolist()
+    slope_list = tallies['slope'][found].tolist()
     return mean_list, error_list, vov_list, slope_list
 
+def new_parse_state(nps=None, history=False):
+    # This function makes the dictionary that "feed_line" fills in as it goes
+    #  through an output file line by line. Keeping the state in a dictionary
+    #  means the same parsing can be done on a whole file at once or on pieces
+    #  of a file as they come in.
+        # in_tfc: True once the "tally fluctuation charts" heading is found
+        # group: the tally numbers of the current block of the tfc (MCNP 
+        #  prints the charts three tallies at a time)
+        # nps: if this isn't None, only the tfc line for this nps is kept
+        # rows: {tally number: (nps, mean, error, vov, slope, fom)}
+        # checks: {tally number: number of the 10 statistical checks passed}
+        # history: if history is True, {tally number: [every tfc row]} so the
+        #  convergence of each tally can be looked at (see "get_tfc_history").
+        #  MCNP prints the charts again at every print dump (prdmp), each time
+        #  with all of the earlier rows, so the history is started over at
+        #  every "tally fluctuation charts" heading and only the last print
+        #  is kept.
+    return {'in_tfc': False, 'group': [],
+            'nps': None if nps is None else int(float(nps)),
+            'rows': {}, 'checks': {},
+            'history': {} if history else None}
+
+def feed_line(state, line):
+    # This function takes one line of an MCNP output file and updates the
+    #  parse state made by "new_parse_state". Most lines of the output file 
+    #  are thrown away after two cheap string checks, so only the statistical
+    #  check lines and the tally fluctuation chart lines are ever split.
+    # The statistical check lines look like:
+        # "     4006   passed the 10 statistical checks for the tally ..."
+        # "     4016   missed  1 of 10 tfc bin checks: ..."
+    # The tally fluctuation chart lines look like:
+        # "                 tally     4006        tally     4016   ..."
+        # "          nps      mean     error   vov  slope    fom   ..."
+        # "     1000000000   3.9412E-06 0.0123 0.0004  10.0 6.4E+02   ..."
+    if 'ssed' in line:
+        match = statistics_pattern.search(line)
+        if match is not None:
+            if match.group(2) == 'passed':
+                state['checks'][int(match.group(1))] = 10
+            else:
+                state['checks'][int(match.group(1))] = 10 - int(match.group(3))
+            return
+    if 'tally fluctuation charts' in line:
+        start_tfc_print(state)
+        return
+    if not state['in_tfc']:
+        return
+    words = line.split()
+    if not words:
+        return
+    if words[0] == 'tally':
+        if tfc_header_line_pattern.match(line):
+            state['group'] = [int(word) for word in words[1::2]]
+        else:
+            state['group'] = []
+    elif words[0].isdigit():
+        feed_tfc_row(state, words)
+
+def start_tfc_print(state):
+    # This function starts a new print of the tally fluctuation charts. The
+    #  rows of the earlier prints are all printed again, so the history of
+    #  the earlier prints is thrown away.
+    state['in_tfc'] = True
+    state['group'] = []
+    if state['history'] is not None:
+        state['history'] = {}
+
+def feed_tfc_row(state, words):
+    # This function adds one split line of the tally fluctuation charts 
+    #  (nps followed by mean, error, vov, slope and fom for each tally in the
+    #  current group) to the parse state. The words can be str or bytes. Lines
+    #  that don't have 5 numbers for each tally in the group are skipped.
+    if len(words) != 1 + 5*len(state['group']):
+        return
+    row_nps = int(words[0])
+    keep = state['nps'] is None or row_nps == state['nps']
+    if not keep and state['history'] is None:
+        return
+    for i, tally in enumerate(state['group']):
+        values = words[1 + 5*i:6 + 5*i]
+        row = (row_nps, float(values[0]), float(values[1]),
+               float(values[2]), float(values[3]), float(values[4]))
+        if keep:
+            state['rows'][tally] = row
+        if state['history'] is not None:
+            state['history'].setdefault(tally, []).append(row)
+
+def empty_tally_array():
+    # This function makes a "tally_dtype" array for the 55 tallies with the
+    #  tally numbers filled in and everything else marked as not found.
+    tallies = np.zeros(len(tally_numbers), dtype=tally_dtype)
+    tallies['tally'] = tally_numbers
+    tallies['nps'] = -1
+    tallies['checks'] = -1
+    for field in ('mean', 'error', 'vov', 'slope', 'fom'):
+        tallies[field] = np.nan
+    return tallies
+
+def parse_state_to_array(state):
+    # This function turns a parse state into the structured array described by
+    #  "tally_dtype", with one record for each of the 55 tallies in 
+    #  "tally_numbers". Tallies that weren't in the file are NaN (or -1).
+    tallies = empty_tally_array()
+    for i, tally in enumerate(tally_numbers):
+        row = state['rows'].get(int(tally))
+        if row is not None:
+            tallies[i]['nps'] = row[0]
+            tallies[i]['mean'] = row[1]
+            tallies[i]['error'] = row[2]
+            tallies[i]['vov'] = row[3]
+            tallies[i]['slope'] = row[4]
+            tallies[i]['fom'] = row[5]
+        tallies[i]['checks'] = state['checks'].get(int(tally), -1)
+    return tallies
+
+def feed_file(state, filename, mode='lines'):
+    # This function fills the parse state from a whole output file. There are
+    #  two ways of doing this:
+        # 'lines': every line is decoded and given to "feed_line"
+        # 'mmap': the file is memory-mapped and only the statistical check 
+        #  lines and the tally fluctuation charts are looked at (see
+        #  "scan_out_file_mmap"). This is much faster for the multi-GB output
+        #  files. Compressed files can't be memory-mapped, so they are always
+        #  read line by line.
+    if mode == 'mmap' and compression_of(filename) is None:
+        scan_out_file_mmap(state, filename)
+        return
+    if mode not in ('lines', 'mmap'):
+        raise ValueError(f"mode must be 'lines' or 'mmap', not {mode!r}")
+    with open_out_file(filename) as myfile:
+        for line in myfile:
+            feed_line(state, line)
+
+def scan_out_file_mmap(state, filename):
+    # This function fills the parse state the same way "feed_line" would, but
+    #  without going through the output file line by line. The file is
+    #  memory-mapped and:
+        # the statistical check lines are found by searching the whole file 
+        #  for "ssed" (from passed/missed), which is done in C, and only the
+        #  lines around those hits are matched with the statistics pattern
+        # the tally fluctuation charts are found by searching backwards for
+        #  their last heading (every print repeats the rows of the earlier 
+        #  ones), and only the part of the file after it is scanned for the
+        #  group header lines and the nps lines
+    #  Everything else in the file (the echo of the input deck, the tables, 
+    #  the tally printouts) is never copied into Python.
+    with open(filename, 'rb') as myfile:
+        if os.fstat(myfile.fileno()).st_size == 0:
+            return
+        with mmap.mmap(myfile.fileno(), 0, access=mmap.ACCESS_READ) as buffer:
+            position = buffer.find(b'ssed')
+            while position != -1:
+                start = buffer.rfind(b'\n', 0, position) + 1
+                end = buffer.find(b'\n', position)
+                if end == -1:
+                    end = len(buffer)
+                match = statistics_bytes_pattern.search(buffer, start, end)
+                if match is not None:
+                    if match.group(2) == b'passed':
+                        state['checks'][int(match.group(1))] = 10
+                    else:
+                        state['checks'][int(match.group(1))] = 10 - int(match.group(3))
+                position = buffer.find(b'ssed', end)
+
+            start = buffer.rfind(b'tally fluctuation charts')
+            if start == -1:
+                return
+            start_tfc_print(state)
+            headers = list(tfc_header_pattern.finditer(buffer, start))
+            for n, header in enumerate(headers):
+                end = headers[n + 1].start() if n + 1 < len(headers) else len(buffer)
+                state['group'] = [int(word) for word in header.group().split()[1::2]]
+                for row in tfc_row_pattern.finditer(buffer, header.end(), end):
+                    feed_tfc_row(state, row.group().split())
+
+def scrape_out_file(filename, nps=None, mode='lines'):
+    # This function reads an MCNP output file once from top to bottom and 
+    #  returns everything we use from it as one structured numpy array (see
+    #  "tally_dtype"). It replaces reading the file once with 
+    #  "get_tally_lines", splitting every tally line four times, and then 
+    #  reading the file a second time with "get_statistics_check_lines".
+    # Example:
+        # tallies = scrape_out_file('out_PNS_1e-9MeV')
+        # tallies['mean']     -> 55 means, F4006 to F4546
+        # tallies['checks']   -> 55 numbers of statistical checks passed
+    # Requirements for input variables:
+        # filename: the absolute filename or just the file name if this
+        #  function is used when in the output file's directory.
+        # nps: if this is None, the last line of the tally fluctuation charts
+        #  is used. Otherwise only the line for this exact nps is used (this is
+        #  how "get_tally_lines" worked).
+        # mode: 'lines' or 'mmap' (see "feed_file"). Both give the same 
+        #  results, see "benchmark_scan_modes".
+    state = new_parse_state(nps)
+    feed_file(state, filename, mode)
+    return parse_state_to_array(state)
+
+def get_tfc_history(filename, nps=None, mode='lines'):
+    # This function reads an MCNP output file once and returns both the usual
+    #  tally array (see "scrape_out_file") and the whole tally fluctuation 
+    #  chart of every tally, not just the line for the final nps. Since the
+    #  print card has "prdmp 1.0e+09", there is a line for every 1e9 particles.
+    # It returns (tallies, history) where history is a structured array with
+    #  "tfc_dtype" and shape (55, number of tfc lines). For example:
+        # tallies, history = get_tfc_history('out_PNS_1e-9MeV')
+        # history[0]['nps']     -> nps of each line for tally F4006
+        # history[0]['error']   -> relative error of F4006 at each line
+        # history[0]['fom']     -> figure of merit of F4006 at each line
+    state = new_parse_state(nps, history=True)
+    feed_file(state, filename, mode)
+    return parse_state_to_array(state), history_to_array(state['history'])
+
+def history_to_array(history):
+    # This function turns a dictionary of {tally number: [tfc rows]} into a
+    #  structured array with "tfc_dtype" and shape (55, number of rows). If a
+    #  tally has fewer rows than the others, the extra spots are NaN (and -1 
+    #  for the nps).
+    num_rows = max([len(rows) for rows in history.values()] + [0])
+    history_array = np.zeros((len(tally_numbers), num_rows), dtype=tfc_dtype)
+    history_array['nps'] = -1
+    for field in ('mean', 'error', 'vov', 'slope', 'fom'):
+        history_array[field] = np.nan
+    for i, tally in enumerate(tally_numbers):
+        rows = history.get(int(tally), [])
+        if rows:
+            history_array[i, :len(rows)] = rows
+    return history_array
+
+def particles_needed(history, target_error):
+    # This function estimates how many particles each tally needs to reach a
+    #  relative error of target_error, using the last line of its tally 
+    #  fluctuation chart and the 1/sqrt(nps) behavior of the relative error:
+        # nps_needed = nps * (error / target_error)**2
+    #  This is only trustworthy for tallies that pass the statistical checks,
+    #  but it is a quick way to see if 1e10 particles is more than an energy
+    #  bin needs. It returns an array with one value per tally (NaN if the 
+    #  tally has no tfc lines).
+    last = np.full(len(history), -1)
+    for i in range(len(history)):
+        found = np.nonzero(history[i]['nps'] > 0)[0]
+        if len(found):
+            last[i] = found[-1]
+    needed = np.full(len(history), np.nan)
+    has_rows = last >= 0
+    rows = history[np.nonzero(has_rows)[0], last[has_rows]]
+    needed[has_rows] = rows['nps']*(rows['error']/target_error)**2
+    return needed
+
+def is_mctal_file(filename):
+    # This function checks if a file is a MCTAL file instead of an output file.
+    #  The sbatch files name them "mctal_PNS_..." so the name is checked first,
+    #  and otherwise the first word of the third line is checked since it is
+    #  always "ntal" in a MCTAL file.
+    if os.path.basename(filename).startswith('mctal'):
+        return True
+    try:
+        with open_out_file(filename) as myfile:
+            first_lines = [myfile.readline() for _ in range(3)]
+    except (OSError, EOFError, ImportError, UnicodeDecodeError):
+        return False
+    return first_lines[2].split()[:1] == ['ntal']
+
+def read_mctal(filename, nps=None):
+    # This function reads the MCTAL file that MCNP writes at the end of a run
+    #  and returns the F6 tallies (F4006 to F4546). It returns two arrays:
+        # tallies: a structured array with "tally_dtype", one record per tally
+        #  in "tally_numbers". The mean and error come from the "vals" block of
+        #  the tally (the last bin, which is the tfc bin) and the nps and fom
+        #  from the last line of the "tfc" block. vov and slope aren't in a 
+        #  MCTAL file, so they are NaN, and checks is -1.
+        # history: a structured array with "tfc_dtype" and shape (55, number
+        #  of tfc lines). It has every line of the tfc block of each tally, so
+        #  it can be used to look at convergence.
+    # If nps is given, the mean, error and fom in "tallies" come from the tfc
+    #  line for that nps instead of the final values.
+    # The parts of a MCTAL file that are used look like:
+        # tally  4006   -1    0
+        # ...
+        # vals
+        #   3.94120E-06 0.0123
+        # tfc   10    1    1    1    1    1    1    1    1
+        #       100000000   3.94120E-06 0.0389  6.4E+02
+    if nps is not None:
+        nps = int(float(nps))
+    vals = {}
+    tfc = {}
+    final_nps = -1
+    tally = None
+    mode = None
+    tfc_lines_left = 0
+    with open_out_file(filename) as myfile:
+        header = myfile.readline().split()
+        if len(header) >= 2 and header[-2].isdigit():
+            final_nps = int(header[-2])
+        for line in myfile:
+            words = line.split()
+            if not words:
+                continue
+            if mode == 'tfc' and tfc_lines_left > 0:
+                tfc[tally].append((int(float(words[0])), float(words[1]),
+                                   float(words[2]), np.nan, np.nan,
+                                   float(words[3])))
+                tfc_lines_left -= 1
+                continue
+            if words[0] == 'tally':
+                tally = int(words[1])
+                vals[tally] = []
+                tfc[tally] = []
+                mode = None
+            elif tally is None:
+                continue
+            elif words[0] == 'vals':
+                mode = 'vals'
+            elif words[0] == 'tfc':
+                mode = 'tfc'
+                tfc_lines_left = int(words[1])
+            elif mode == 'vals':
+                vals[tally].extend(float(word) for word in words)
+
+    tallies = empty_tally_array()
+    history = history_to_array(tfc)
+    for i, number in enumerate(tally_numbers):
+        number = int(number)
+        rows = tfc.get(number, [])
+        if len(vals.get(number, [])) >= 2:
+            tallies[i]['mean'] = vals[number][-2]
+            tallies[i]['error'] = vals[number][-1]
+            tallies[i]['nps'] = rows[-1][0] if rows else final_nps
+        if rows:
+            tallies[i]['fom'] = rows[-1][5]
+        if nps is not None:
+            matches = [row for row in rows if row[0] == nps]
+            if matches:
+                tallies[i]['nps'] = nps
+                tallies[i]['mean'] = matches[-1][1]
+                tallies[i]['error'] = matches[-1][2]
+                tallies[i]['fom'] = matches[-1][5]
+            else:
+                tallies[i]['nps'] = -1
+                tallies[i]['mean'] = np.nan
+                tallies[i]['error'] = np.nan
+                tallies[i]['fom'] = np.nan
+    return tallies, history
+
+def natural_sort_key(filename):
+    # This function is used as a sort key so that files are put in the order a
+    #  person would expect (out_Run2_rand_energy before out_Run10_rand_energy).
+    return [int(part) if part.isdigit() else part
+            for part in re.split(r'(\d+)', os.path.basename(filename))]
+
+def find_out_files(run_dirs, use_mctal=False):
+    # This function finds every MCNP output file in one or more run
+    #  directories. The output files are named by the sbatch files as:
+        # out_PNS_<energy bin>            (one energy per deck)
+        # out_Run<N>_rand_energy          (random spectrum decks)
+        # ..._cont                        (continuation runs)
+    #  If use_mctal is True, the mctal_PNS_<energy bin> files are found instead.
+    # run_dirs can be one directory or a list of directories. The files are
+    #  returned in directory order and then in natural order within each one.
+    if isinstance(run_dirs, str):
+        run_dirs = [run_dirs]
+    if use_mctal:
+        patterns = ['mctal_PNS_*', 'mctal_Run*_rand_energy*']
+    else:
+        patterns = ['out_PNS_*', 'out_Run*_rand_energy*']
+    filenames = []
+    for run_dir in run_dirs:
+        run_files = set()
+        for pattern in patterns:
+            run_files.update(glob.glob(os.path.join(run_dir, pattern)))
+        filenames.extend(sorted(run_files, key=natural_sort_key))
+    return filenames
+
+def scrape_file_safely(filename, mode='lines'):
+    # This function is what each worker in "scrape_run_dirs" runs. It scrapes
+    #  one output (or MCTAL) file and catches any error, so one bad file (for
+    #  example a run that was killed halfway through writing its output) 
+    #  doesn't stop the rest of the campaign from being scraped.
+    # It returns (filename, tallies, error), where error is None if the file
+    #  was scraped and tallies is None if it wasn't.
+    try:
+        if is_mctal_file(filename):
+            tallies = read_mctal(filename)[0]
+        else:
+            tallies = scrape_out_file(filename, mode=mode)
+        return filename, tallies, None
+    except Exception as err:
+        return filename, None, f'{type(err).__name__}: {err}'
+
+def scrape_run_dirs(run_dirs, processes=None, use_mctal=False,
+                    cache_file=None, mode='lines'):
+    # This function scrapes every output file in one or more run directories
+    #  using a pool of processes (one per core by default). It is the entry
+    #  point for scraping a whole campaign instead of calling 
+    #  "get_all_tally_info" by hand for each file.
+    # The results are returned in the same order as "find_out_files" as a list
+    #  of (filename, tallies, error) tuples (see "scrape_file_safely").
+    # If cache_file is given, files that were already scraped and haven't 
+    #  changed since are taken from the cache instead of being parsed again
+    #  (see "scrape_files"). mode is how the output files are read (see 
+    #  "feed_file").
+    # Example:
+        # results = scrape_run_dirs(['2023-03-01_1000', '2023-03-02_0930'],
+        #                           cache_file='scrape_cache.pickle')
+        # for filename, tallies, error in results:
+        #     if error is not None:
+        #         print(f'{filename} could not be scraped: {error}')
+    # NOTE: On Windows, this needs to be called from inside an
+    #  "if __name__ == '__main__':" block since the workers are spawned.
+    filenames = find_out_files(run_dirs, use_mctal)
+    return scrape_files(filenames, processes, cache_file, mode)
+
+def scrape_files(filenames, processes=None, cache_file=None, mode='lines'):
+    # This function does the work for "scrape_run_dirs" on a list of files.
+    #  Small lists are scraped in this process since starting the pool takes
+    #  longer than scraping a couple of files.
+    # If cache_file is given, only the files that are new or have changed 
+    #  since the last time the cache was saved are parsed, and the cache is 
+    #  updated with them afterwards. Files that couldn't be scraped are never
+    #  cached so they are tried again next time.
+    cache = load_scrape_cache(cache_file) if cache_file is not None else {}
+    results = [None]*len(filenames)
+    to_scrape = []
+    identities = {}
+    for i, filename in enumerate(filenames):
+        if cache_file is None:
+            to_scrape.append(i)
+            continue
+        key = os.path.abspath(filename)
+        try:
+            identity = file_identity(filename, cache.get(key))
+        except OSError as err:
+            results[i] = (filename, None, f'{type(err).__name__}: {err}')
+            continue
+        entry = cache.get(key)
+        if entry is not None and entry['identity'] == identity:
+            results[i] = (filename, entry['tallies'], None)
+        else:
+            identities[key] = identity
+            to_scrape.append(i)
+
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(to_scrape))
+    todo = [filenames[i] for i in to_scrape]
+    scrape_file = functools.partial(scrape_file_safely, mode=mode)
+    if processes <= 1:
+        scraped = [scrape_file(filename) for filename in todo]
+    else:
+        chunksize = max(1, len(todo) // (4*processes))
+        with multiprocessing.Pool(processes) as pool:
+            scraped = pool.map(scrape_file, todo, chunksize)
+
+    for i, result in zip(to_scrape, scraped):
+        results[i] = result
+        if cache_file is not None and result[2] is None:
+            key = os.path.abspath(result[0])
+            cache[key] = {'identity': identities[key], 'tallies': result[1]}
+    if cache_file is not None and to_scrape:
+        save_scrape_cache(cache_file, cache)
+    return results
+
+def scrape_and_compress(run_dirs, method='gzip', processes=None,
+                        cache_file=None):
+    # This function is the ingest step for finished runs. It scrapes every 
+    #  output file in the run directories (see "scrape_run_dirs") and then 
+    #  compresses each plain text output file that was scraped without an 
+    #  error (see "compress_out_file"). Files that couldn't be scraped are
+    #  left alone so they can be looked at. If a cache file is used, the
+    #  compressed files are added to it with the tallies that were just 
+    #  scraped so they aren't parsed again next time.
+    # It returns the scrape results with the filenames changed to the 
+    #  compressed files.
+    results = scrape_run_dirs(run_dirs, processes, cache_file=cache_file)
+    to_compress = [i for i, (filename, tallies, error) in enumerate(results)
+                   if error is None and compression_of(filename) is None]
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(to_compress))
+    jobs = [(results[i][0], method) for i in to_compress]
+    if processes <= 1:
+        compressed = [compress_file_safely(job) for job in jobs]
+    else:
+        with multiprocessing.Pool(processes) as pool:
+            compressed = pool.map(compress_file_safely, jobs)
+
+    cache = load_scrape_cache(cache_file) if cache_file is not None else None
+    for i, (compressed_name, error) in zip(to_compress, compressed):
+        if error is not None:
+            print(f'Could not compress {results[i][0]}: {error}')
+            continue
+        if cache is not None:
+            cache.pop(os.path.abspath(results[i][0]), None)
+            cache[os.path.abspath(compressed_name)] = {
+                'identity': file_identity(compressed_name),
+                'tallies': results[i][1]}
+        results[i] = (compressed_name, results[i][1], None)
+    if cache is not None and to_compress:
+        save_scrape_cache(cache_file, cache)
+    return results
+
+def compress_file_safely(job):
+    # This function is what each worker in "scrape_and_compress" runs. job is
+    #  (filename, method). It returns (compressed filename, error).
+    filename, method = job
+    try:
+        return compress_out_file(filename, method), None
+    except Exception as err:
+        return None, f'{type(err).__name__}: {err}'
+
+def scrape_out_file_old(filename, nps):
+    # This function is the way output files were scraped before 
+    #  "scrape_out_file": "get_tally_lines" reads the file once for the tally
+    #  lines, each of the four "get_..._tallys" splits them again, and 
+    #  "get_statistics_check_lines" reads the file a second time for the 
+    #  checks (which make_stats_dict then picked apart). It is only kept so
+    #  "benchmark_scan_modes" can compare against it.
+    tally_lines = get_tally_lines(filename, nps)
+    lists = (get_mean_tallys(tally_lines), get_error_tallys(tally_lines),
+             get_vov_tallys(tally_lines), get_slope_tallys(tally_lines))
+    checks = {}
+    for line in get_statistics_check_lines(filename):
+        words = line.split()
+        checks[words[0]] = 10 if words[1] == 'passed' else 10 - int(words[2])
+    return lists, checks
+
+def benchmark_scan_modes(filenames, repeats=3):
+    # This function times the two ways of reading an output file (see
+    #  "feed_file") on one or more output files and checks that they give 
+    #  the same tallies. They are both compared to the old way of scraping
+    #  (see "scrape_out_file_old"), at the last nps of each file. The best 
+    #  time out of the repeats is used for each mode so the OS file cache 
+    #  doesn't favor whichever mode runs second.
+    # It prints and returns {mode: seconds for all the files}.
+    # Example:
+        # benchmark_scan_modes(glob.glob('2023-03-01_1000/out_PNS_*'))
+    if isinstance(filenames, str):
+        filenames = [filenames]
+    times = {}
+    results = {}
+    for mode in ('lines', 'mmap'):
+        best = np.inf
+        for i in range(repeats):
+            start = time.perf_counter()
+            results[mode] = [scrape_out_file(filename, mode=mode)
+                             for filename in filenames]
+            best = min(best, time.perf_counter() - start)
+        times[mode] = best
+    last_nps = [int(tallies['nps'].max()) for tallies in results['lines']]
+    best = np.inf
+    for i in range(repeats):
+        start = time.perf_counter()
+        for filename, nps in zip(filenames, last_nps):
+            scrape_out_file_old(filename, nps)
+        best = min(best, time.perf_counter() - start)
+    times['old'] = best
+    for filename, lines, mapped in zip(filenames, results['lines'], results['mmap']):
+        if lines.tobytes() != mapped.tobytes():
+            print(f'WARNING: the two modes disagree on {filename}')
+    size = sum(os.path.getsize(filename) for filename in filenames) / 1e6
+    for mode, seconds in times.items():
+        print(f'{mode:>5}: {seconds:.3f} s for {len(filenames)} files '
+              f'({size/seconds:.0f} MB/s)')
+    print(f'lines is {times["old"]/times["lines"]:.1f} times faster than old')
+    print(f'mmap is {times["old"]/times["mmap"]:.1f} times faster than old '
+          f'and {times["lines"]/times["mmap"]:.1f} times faster than lines')
+    return times
+
+def file_identity(filename, cache_entry=None, sample_size=1 << 20):
+    # This function returns what is used to tell whether a file has changed 
+    #  since it was cached: (size, mtime, content hash). The content hash is 
+    #  a blake2b hash of the size and the first and last megabyte of the file.
+    #  Hashing the whole file would take as long as parsing it, and the end of
+    #  an output file (where the tallies are) is what changes when a run is
+    #  continued or rerun.
+    # If the cached entry has the same size and mtime, the cached hash is 
+    #  reused so that unchanged files aren't opened at all. If only the mtime
+    #  changed (for example the files were copied without keeping the times),
+    #  the hash is recomputed and the cached tallies are still used if it 
+    #  matches.
+    stat = os.stat(filename)
+    if cache_entry is not None:
+        size, mtime, content_hash = cache_entry['identity']
+        if size == stat.st_size and mtime == stat.st_mtime_ns:
+            return cache_entry['identity']
+    digest = hashlib.blake2b(str(stat.st_size).encode(), digest_size=16)
+    with open(filename, 'rb') as myfile:
+        digest.update(myfile.read(sample_size))
+        if stat.st_size > sample_size:
+            myfile.seek(max(sample_size, stat.st_size - sample_size))
+            digest.update(myfile.read(sample_size))
+    identity = (stat.st_size, stat.st_mtime_ns, digest.hexdigest())
+    if cache_entry is not None and cache_entry['identity'][0] == stat.st_size \
+            and cache_entry['identity'][2] == identity[2]:
+        cache_entry['identity'] = identity
+    return identity
+
+def load_scrape_cache(cache_file):
+    # This function loads the scrape cache, which is a pickled dictionary of
+    #  {absolute filename: {'identity': (size, mtime, hash), 'tallies': array}}.
+    #  A missing or unreadable cache file just means everything is scraped.
+    try:
+        with open(cache_file, 'rb') as f:
+            return pickle.load(f)
+    except (OSError, EOFError, pickle.UnpicklingError):
+        return {}
+
+def save_scrape_cache(cache_file, cache):
+    # This function saves the scrape cache. It is written to a temporary file
+    #  first and then renamed so a crash partway through saving doesn't leave
+    #  a broken cache behind.
+    temp_file = cache_file + '.tmp'
+    with open(temp_file, 'wb') as f:
+        pickle.dump(cache, f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(temp_file, cache_file)
+
+def deck_name_from_out_file(filename):
+    # This function turns an output (or MCTAL) file name into the name of the
+    #  deck it came from.
+    # Example: '.../out_PNS_1e-9MeV_cont.gz' -> 'PNS_1e-9MeV'
+    #          '.../out_PNS_1e-9MeV_cont2' -> 'PNS_1e-9MeV'
+    name = os.path.basename(filename)
+    if os.path.splitext(name)[1] in compressed_extensions:
+        name = os.path.splitext(name)[0]
+    for prefix in ('out_', 'mctal_'):
+        if name.startswith(prefix):
+            name = name[len(prefix):]
+    # Continuations are _cont (batch_cont.bash) or _cont<N> (the links of a
+    #  continuation chain, see continuationChain.py)
+    return re.sub(r"_cont\d*$", "", name)
+
+def quality_mask(checks, error, vov, min_checks=10, max_error=0.05,
+                 max_vov=0.1):
+    # This function returns True for every tally that passes the quality
+    #  gate. The inputs can be any shape (one file, a whole campaign, or a 
+    #  tally dataset) as long as they are the same shape. A tally passes if:
+        # it passed at least min_checks of the 10 statistical checks
+        # its relative error is at most max_error
+        # its vov is at most max_vov
+    #  Anything that is missing (NaN, or -1 checks) fails. If vov isn't 
+    #  available (MCTAL files), pass max_vov=None to skip that part.
+    checks = np.asarray(checks)
+    error = np.asarray(error)
+    passed = (checks >= min_checks) & (error <= max_error)
+    if max_vov is not None:
+        passed &= np.asarray(vov) <= max_vov
+    return passed
+
+def quality_gate(results, min_checks=10, max_error=0.05, max_vov=0.1,
+                 target_nps=None, tallies=None):
+    # This function checks a whole campaign at once. results is the list 
+    #  returned by "scrape_run_dirs" or "scrape_files". All of the tallies of 
+    #  all of the files are stacked into (files, 55) arrays and checked with 
+    #  "quality_mask" in one go.
+    # Requirements for input variables:
+        # min_checks, max_error, max_vov: see "quality_mask"
+        # target_nps: the nps on the decks' nps card. Decks that stopped 
+        #  before reaching it (timed out) are marked for a continuation run 
+        #  instead of more particles. If None, this isn't checked.
+        # tallies: the tally numbers that have to pass (all 55 if None)
+    # It returns a dictionary with:
+        # filenames: the files in the same order as the arrays
+        # passed: (files, 55) array, True where the tally passed
+        # pass_counts: (files,) number of tallies that passed in each file
+        # deck_passed: (files,) True if every checked tally in the file passed
+        # requeue: a list of (run directory, deck, reason, nps_needed) for the
+        #  decks that failed, where reason is 'continue' (the run didn't reach
+        #  target_nps), 'more particles' (it did, but the tallies still aren't
+        #  good enough) or 'not scraped' (the output file couldn't be read).
+        #  nps_needed is the estimate from the 1/sqrt(nps) behavior of the 
+        #  worst relative error (see "particles_needed").
+    filenames = [result[0] for result in results]
+    scraped = np.array([result[2] is None for result in results], dtype=bool)
+    stacked = np.stack([result[1] if result[2] is None else empty_tally_array()
+                        for result in results]) if results else \
+        np.zeros((0, len(tally_numbers)), dtype=tally_dtype)
+    passed = quality_mask(stacked['checks'], stacked['error'], stacked['vov'],
+                          min_checks, max_error, max_vov)
+    checked = np.ones(len(tally_numbers), dtype=bool) if tallies is None \
+        else np.isin(tally_numbers, tallies)
+    deck_passed = passed[:, checked].all(axis=1) & scraped
+
+    final_nps = stacked['nps'].max(axis=1)
+    errors = np.where(np.isnan(stacked['error'][:, checked]), np.inf,
+                      stacked['error'][:, checked])
+    worst_error = errors.max(axis=1) if checked.any() else np.zeros(len(results))
+    # If the errors are already small enough but the checks or vov failed,
+    #  the number of particles is doubled.
+    with np.errstate(invalid='ignore', over='ignore'):
+        nps_needed = np.maximum(final_nps*(worst_error/max_error)**2,
+                                2*final_nps)
+    timed_out = np.zeros(len(results), dtype=bool) if target_nps is None \
+        else final_nps < float(target_nps)
+
+    requeue = []
+    for i in np.nonzero(~deck_passed)[0]:
+        run_dir = os.path.dirname(filenames[i])
+        deck = deck_name_from_out_file(filenames[i])
+        if not scraped[i]:
+            requeue.append((run_dir, deck, 'not scraped', np.nan))
+        elif timed_out[i]:
+            requeue.append((run_dir, deck, 'continue', float(target_nps)))
+        else:
+            requeue.append((run_dir, deck, 'more particles',
+                            float(nps_needed[i])))
+    return {'filenames': filenames,
+            'passed': passed,
+            'pass_counts': passed[:, checked].sum(axis=1),
+            'deck_passed': deck_passed,
+            'requeue': requeue}
+
+def write_requeue_list(requeue, filename='requeue.csv'):
+    # This function saves the requeue list from "quality_gate" as a csv file
+    #  with one line per deck that needs to be run again:
+        # run_dir,deck,reason,nps_needed
+    #  The decks marked 'continue' can be restarted from their runtpe files 
+    #  (see generateModel.write_sbatch_continuation) and the ones marked 'more
+    #  particles' need their nps card raised to nps_needed.
+    with open(filename, 'w', newline='') as csvfile:
+        csvwriter = csv.writer(csvfile)
+        csvwriter.writerow(['run_dir', 'deck', 'reason', 'nps_needed'])
+        for run_dir, deck, reason, nps_needed in requeue:
+            csvwriter.writerow([run_dir, deck, reason,
+                                '' if np.isnan(nps_needed) else f'{nps_needed:.3e}'])
+    return filename
+
+def merge_tallies(parts):
+    # This function combines the tallies of independent runs of the same deck
+    #  (eg. the sub-decks made by splitSeed.split_deck) into the result one
+    #  run with all of their particles would give. parts is a list of
+    #  "tally_dtype" arrays. For each tally, with n the nps of each part:
+        # mean: the nps weighted mean, sum(n*mean)/sum(n)
+        # error: the relative error of that mean, from the variance of each
+        #  part's mean, (mean*error)**2, weighted by (n/sum(n))**2
+        # fom: 1/(error**2 * T), where T is the sum of each part's computer
+        #  time, 1/(fom*error**2)
+        # checks: the fewest checks any part passed
+        # vov and slope can't be combined from the parts and are NaN
+    #  A tally that is missing from any part is marked as not found.
+    stacked = np.stack(parts)
+    merged = empty_tally_array()
+    found = (stacked['nps'] > 0).all(axis=0)
+    n = np.where(stacked['nps'] > 0, stacked['nps'], 0).astype('f8')
+    total = n.sum(axis=0)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        weights = n/total
+        mean = (weights*stacked['mean']).sum(axis=0)
+        variance = (weights**2*(stacked['mean']*stacked['error'])**2).sum(axis=0)
+        error = np.where(mean != 0, np.sqrt(variance)/np.abs(mean), 0.0)
+        time = (1/(stacked['fom']*stacked['error']**2)).sum(axis=0)
+        fom = 1/(error**2*time)
+    merged['nps'] = np.where(found, total, -1)
+    merged['mean'] = np.where(found, mean, np.nan)
+    merged['error'] = np.where(found, error, np.nan)
+    merged['fom'] = np.where(found, fom, np.nan)
+    merged['checks'] = np.where(found, stacked['checks'].min(axis=0), -1)
+    return merged
+
 def get_mean_tallys(tally_lines):
     # This function will use the tally line text to pull the mean tally info.
     #  The output of this function is a 1D list containing the mean 
@@ -140,53 +1031,39 @@ def get_statistics_check_lines(filename):
         # "     4NNN   XXssed"
     statistics_lines = list()
     statistics_pattern = re.compile(r"\s{5}4\d\d\d\s{3}\w\wssed")
-    with open(filename, 'rt') as myfile:
+    with open_out_file(filename) as myfile:
         for line in myfile:
             if statistics_pattern.search(line) != None:
                 statistics_lines.append((line.rstrip('\n')))
     return statistics_lines
 
-def make_stats_dict(E_bin_names):
-    # This function will take all of the statistic_lines from the function
-    #  get_statistics_check_lines and make a dictionary storing all of the 
-    #  information. The keys of the dictionary will be the tally names (eg. 
+def make_stats_dict(E_bin_names, cache_file='scrape_cache.pickle'):
+    # This function will make a dictionary storing the number of statistical
+    #  checks that each tally passed for each energy bin. The keys of the
+    #  dictionary will be the energy bin names and then the tally names (eg. 
     #  "4006", "4016", ...) and the values will be the number of statistical
     #  checks that each tally passed in the MCNP run.
-    # The way the output file (which the statistics lines came from) works is 
-    #  that the line will either read:
+    # The way the output file works is that the line will either read:
         # "4006" passed all checks
     #  or
         # "4006" missed X out of 10 checks
-    #  In the function below, I will get the number from the line of text and 
-    #  subtract it from 10.
-    tally_names = ['4006', '4016', '4026', '4036', '4046', '4056', '4066', 
-               '4076', '4086', '4096', '4106', '4116', '4126', '4136', 
-               '4146', '4156', '4166', '4176', '4186', '4196', '4206', 
-               '4216', '4226', '4236', '4246', '4256', '4266', '4276', 
-               '4286', '4296', '4306', '4316', '4326', '4336', '4346', 
-               '4356', '4366', '4376', '4386', '4396', '4406', '4416', 
-               '4426', '4436', '4446', '4456', '4466', '4476', '4486', 
-               '4496', '4506', '4516', '4526', '4536', '4546']
+    #  The subtraction from 10 is done in "feed_line" as the file is read.
+    # This used to save the dictionary to stats_checks.pickle. The scraped 
+    #  results are now kept in the scrape cache (see "scrape_files") instead,
+    #  so running this again only reads the output files that have changed.
+    #  Set cache_file to None to not use a cache.
+    filenames = ['out_PNS_'+E_bin for E_bin in E_bin_names]
+    results = scrape_files(filenames, cache_file=cache_file)
     stats_dict = {}
-    for E_bin in E_bin_names:
+    for E_bin, (filename, tallies, error) in zip(E_bin_names, results):
+        if error is not None:
+            raise RuntimeError(f'Could not scrape {filename}: {error}')
         stats_dict[E_bin] = {}
-        
-    for E_bin in E_bin_names:
-        filename = 'out_PNS_'+E_bin
-        statistics_lines = get_statistics_check_lines(filename)
-        for name in tally_names:
-            stats_dict[E_bin][name] = []
-
-        for line in statistics_lines:
-            for name in tally_names:
-                if line.split()[0] == name:
-                    if line.split()[1] == 'passed':
-                        stats_dict[E_bin][name].append(10)
-                    else:
-                        stats_dict[E_bin][name].append(10-int(line.split()[2]))
-    pickle_file_name = 'stats_checks.pickle'
-    with open(pickle_file_name,'wb') as f:
-          pickle.dump(stats_dict,f)
+        for tally, checks in zip(tallies['tally'], tallies['checks']):
+            if checks >= 0:
+                stats_dict[E_bin][str(tally)] = [int(checks)]
+            else:
+                stats_dict[E_bin][str(tally)] = []
     return stats_dict
 
 def save_data(filename,headers,tally_lists):
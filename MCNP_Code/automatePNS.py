@@ -1,5 +1,9 @@
 # Script to automate multiple PNS model runs
+import argparse
+import json
 import generateModel as gm
+import deckScheduler
+import splitSeed
 
 # ---------------------------------------------------------------------------
 # |                              Automate PNS                               |
@@ -29,6 +33,9 @@ import generateModel as gm
     #  times out on quartz. There is a 24 hour job time-limit on quartz. This 
     #  continuation file should only be used once. If I run into a situation in
     #  which more than 48 hours is needed, I will need to modify this file.
+    #  For that, --chain-depth writes submit_chain.bash, which submits the 
+    #  batch file and a chain of continuation jobs that only continue the 
+    #  decks that aren't done (see continuationChain.py).
     # A notes file. Upon running this script, the user is asked for prompts. 
     #  These prompts will be recorded in this file and should contain relevant
     #  information regarding the creation of these input decks. 
@@ -106,6 +113,140 @@ E_bin_names = ["1e-9MeV","158e-9MeV","251e-9MeV","398e-9MeV","631e-9MeV",
                "178e1MeV","2e1MeV","251e1MeV","316e1MeV","398e1MeV",
                "501e1MeV","631e1MeV","794e1MeV","1e2MeV"]
 
-# This last line of code initiates the execution that generates the input decks
-#  and batch files.
-gm.write_PNS_input(E_bins,E_bin_names,sdef_list,nps,which_source,numNodes,numCores)
\ No newline at end of file
+# ---------------------------------------------------------------------------
+# |                         Command Line and Config                         |
+# ---------------------------------------------------------------------------
+# Running this script with no arguments works the same as it always has: the
+#  parameters above are used and the detector material and the notes are typed
+#  in. Any of the parameters can also be given on the command line or in a JSON
+#  config file (the keys are the argument names below with underscores, eg. 
+#  {"nps": "1e9", "which_source": 4, "num_spectra": 100}). Command line 
+#  arguments win over the config file, which wins over the values above.
+# With --headless, nothing is ever asked for. The detector material defaults to
+#  22 (Li-6) and the notes to the --notes lines, so campaigns can be made on a
+#  compute node or by another script. Examples:
+    # python automatePNS.py
+    # python automatePNS.py --headless --config campaign.json
+    # python automatePNS.py --headless --which-source 4 --num-spectra 500 
+    #   --master-seed 12345 --output-root /p/lustre1/condon3/PNS --no-transfer
+    #   --notes "Test run"
+    # python automatePNS.py --headless --config campaign.json
+    #   --resume-path /p/lustre1/condon3/PNS/2023-03-01/2023-03-01_1000
+    # python automatePNS.py --headless --which-source 1 --nps 2e9
+    #   --resume-path /p/lustre1/condon3/PNS/2023-03-01/2023-03-01_1000
+    # python automatePNS.py --headless --which-source 1 --job-array
+    #   --max-running 20 --walltime 12:00:00
+    # python automatePNS.py --headless --which-source 1 --pack
+    #   --rates-from /p/lustre1/condon3/PNS/2023-03-01/2023-03-01_1000
+    # python automatePNS.py --headless --which-source 1 --runtime-model runtime_model.json
+    # python automatePNS.py --headless --which-source 1 --chain-depth 4 --target-error 0.01
+    # python automatePNS.py --headless --which-source 1 --split 12
+def parse_arguments(argv=None):
+    parser = argparse.ArgumentParser(description='Generate the PNS input decks and batch files.')
+    parser.add_argument('--config', help='JSON file with any of the options below')
+    parser.add_argument('--nps')
+    parser.add_argument('--num-nodes', type=int)
+    parser.add_argument('--num-cores', type=int)
+    parser.add_argument('--which-source', type=int)
+    parser.add_argument('--num-spectra', type=int, help='number of random spectrum decks (source 4)')
+    parser.add_argument('--master-seed', type=int, help='seed for the random spectrum decks (source 4) or the --split-method seed sub-decks')
+    parser.add_argument('--processes', type=int, help='processes used to make the random spectrum decks')
+    parser.add_argument('--detector-material', help='22 for Li-6, 2 for Au')
+    parser.add_argument('--notes', action='append', help='a line for the notes file (can be repeated)')
+    parser.add_argument('--output-root', help='where the daily and run directories are made')
+    parser.add_argument('--transfer-directory', help='where the run directory is copied to')
+    parser.add_argument('--no-transfer', action='store_true', help="don't copy the run directory")
+    parser.add_argument('--resume-path', help='run directory to finish (source 4) or update with only the decks that changed')
+    parser.add_argument('--shared-blocks', action='store_true', default=None,
+                        help='write the cell/surface/material/tally cards once and READ them in every deck')
+    parser.add_argument('--result-cache', help='result cache file, decks already run are not run again')
+    parser.add_argument('--no-lint', dest='lint', action='store_false', default=None,
+                        help="don't check the decks once they are written")
+    parser.add_argument('--job-array', action='store_true', default=None,
+                        help='run the decks as a Slurm job array instead of one job')
+    parser.add_argument('--max-running', type=int, help='most job array tasks that run at once')
+    parser.add_argument('--walltime', help='time limit of one deck in a job array task (eg. 12:00:00)')
+    parser.add_argument('--decks-per-task', type=int, help='decks each job array task runs')
+    parser.add_argument('--pack', dest='packing', action='store_true', default=None,
+                        help='pack the decks onto as few nodes as finish in the time limit')
+    parser.add_argument('--rates-from', action='append',
+                        help='run directory whose out files give the speed of each deck for --pack (can be repeated)')
+    parser.add_argument('--runtime-model', help='runtime model file (see runtimeModel.py) that sets ctme and the time limits')
+    parser.add_argument('--fit-nps', action='store_true', default=None,
+                        help='with --runtime-model, lower the nps of decks that would not finish in one job')
+    parser.add_argument('--chain-depth', type=int,
+                        help='most continuation jobs submit_chain.bash submits after the first batch file')
+    parser.add_argument('--target-error', type=float,
+                        help='with --chain-depth, decks whose tallies are all at or below this error are done')
+    parser.add_argument('--split', type=int,
+                        help='split each deck into this many sub-decks that run as a job array of short jobs (see splitSeed.py)')
+    parser.add_argument('--split-method', choices=splitSeed.split_methods,
+                        help='how the sub-decks get different random numbers')
+    parser.add_argument('--headless', action='store_true', help='never ask for any input')
+    args = parser.parse_args(argv)
+
+    options = {'nps': nps, 'num_nodes': numNodes, 'num_cores': numCores,
+               'which_source': which_source, 'num_spectra': 1,
+               'master_seed': None, 'processes': None, 'resume_path': None,
+               'shared_blocks': False, 'result_cache': None, 'lint': True,
+               'job_array': False, 'max_running': None, 'walltime': None,
+               'decks_per_task': 1, 'packing': False, 'rates_from': None,
+               'runtime_model': None, 'fit_nps': False,
+               'chain_depth': 0, 'target_error': None,
+               'split': 1, 'split_method': 'hist',
+               'detector_material': None, 'notes': None,
+               'output_root': gm.default_output_root,
+               'transfer_directory': gm.default_transfer_directory}
+    if args.config is not None:
+        with open(args.config) as f:
+            config = json.load(f)
+        unknown = set(config) - set(options)
+        if unknown:
+            parser.error(f"unknown options in {args.config}: {', '.join(sorted(unknown))}")
+        options.update(config)
+    for key in options:
+        value = getattr(args, key)
+        if value is not None:
+            options[key] = value
+    if args.no_transfer:
+        options['transfer_directory'] = None
+    if args.headless:
+        if options['detector_material'] is None:
+            options['detector_material'] = '22'
+        if options['notes'] is None:
+            options['notes'] = []
+    # nps goes straight onto the nps card, so a number from the config file
+    #  (eg. 1e9) is written the way it would be typed.
+    if not isinstance(options['nps'], str):
+        options['nps'] = format(float(options['nps']), 'g')
+    if options['detector_material'] is not None:
+        options['detector_material'] = str(options['detector_material'])
+    return options
+
+if __name__ == '__main__':
+    options = parse_arguments()
+    batch_options = {key: options[key] for key in gm.default_batch_options
+                     if options.get(key) is not None}
+    if options['rates_from']:
+        batch_options['deck_rates'] = deckScheduler.rates_from_run_dirs(options['rates_from'])
+    # This initiates the execution that generates the input decks and batch 
+    #  files.
+    gm.write_PNS_input(E_bins,E_bin_names,sdef_list,options['nps'],
+                       options['which_source'],options['num_nodes'],
+                       options['num_cores'],
+                       detector_material=options['detector_material'],
+                       notes=options['notes'],
+                       num_spectra=options['num_spectra'],
+                       output_root=options['output_root'],
+                       transfer_directory=options['transfer_directory'],
+                       master_seed=options['master_seed'],
+                       processes=options['processes'],
+                       resume_path=options['resume_path'],
+                       shared_blocks=options['shared_blocks'],
+                       result_cache=options['result_cache'],
+                       lint=options['lint'],
+                       runtime_model=options['runtime_model'],
+                       fit_nps=options['fit_nps'],
+                       split=options['split'],
+                       split_method=options['split_method'],
+                       batch_options=batch_options)
\ No newline at end of file
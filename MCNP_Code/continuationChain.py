@@ -0,0 +1,236 @@
+# This script makes and checks a chain of continuation jobs, so decks that
+#  need more than one 23.5 hour job keep going without anyone submitting
+#  batch_cont.bash by hand (and without editing it for runs longer than 48
+#  hours).
+# submit_chain.bash submits the first batch file and a small check job
+#  (batch_chain_check.bash) with --dependency=afterany, so it starts once the
+#  job before it has ended for any reason (finished, failed or hit the time
+#  limit). Check job N:
+    # 1. runs the check step (python3 continuationChain.py chain_targets.json
+    #    --link N) which finds the decks that haven't reached their nps (or, 
+    #    if there is a target error, whose tallies haven't all reached it)
+    # 2. stops if every deck is done
+    # 3. submits link N (batch_chain.bash) with only as many nodes as the
+    #    unfinished decks need, and check job N+1 after it (up to max_depth)
+#  A link continues each unfinished deck from its runtpe file, or starts it
+#  from the input deck if it never got to write one. Link N writes 
+#  out_<deck>_cont<N>, so each link's results are kept. Nothing is submitted
+#  before the check step knows it is needed, so the links never hold nodes
+#  for decks that are already done.
+# The run directory gets a copy of this script and the scripts it imports
+#  (chain_modules) so the check step can run on Quartz.
+
+import argparse
+import glob
+import json
+import math
+import os
+import re
+import shutil
+import subprocess
+import numpy as np
+import ScrapeMCNP as scrape
+import deckScheduler
+
+chain_modules = ('continuationChain.py', 'deckScheduler.py', 'ScrapeMCNP.py', 'tldGeometry.py')
+targets_name = "chain_targets.json"
+continue_name = "chain_continue.txt"
+start_name = "chain_start.txt"
+# The time limit of a check job, which only reads the out files
+check_walltime = "00:10:00"
+link_pattern = re.compile(r"_cont(\d*)$")
+
+def deck_out_files(run_dir, deck):
+    # This function returns the out files of a deck in the order they were
+    #  made: out_<deck>, then out_<deck>_cont (batch_cont.bash), then
+    #  out_<deck>_cont1, out_<deck>_cont2, ... (the chain links). Compressed
+    #  files (see ScrapeMCNP.compress_out_file) are included.
+    filenames = glob.glob(os.path.join(run_dir, 'out_' + deck)) + \
+                glob.glob(os.path.join(run_dir, 'out_' + deck + '.*')) + \
+                glob.glob(os.path.join(run_dir, 'out_' + deck + '_cont*'))
+    def link_number(filename):
+        name = os.path.basename(filename)
+        if os.path.splitext(name)[1] in scrape.compressed_extensions:
+            name = os.path.splitext(name)[0]
+        match = link_pattern.search(name)
+        if match is None:
+            return -1
+        return int(match.group(1) or 0)
+    return sorted((filename for filename in filenames
+                   if scrape.deck_name_from_out_file(filename) == deck), key=link_number)
+
+def deck_status(run_dir, deck, nps, target_error=None):
+    # This function returns what has to be done with a deck:
+        # 'done': its latest out file got to nps, or every tally got to
+        #  target_error (if it isn't None)
+        # 'continue': it didn't, and it has a runtpe file to continue from
+        # 'start': it has no runtpe file, so it has to start over
+    out_files = deck_out_files(run_dir, deck)
+    if out_files:
+        latest = out_files[-1]
+        try:
+            run_time = deckScheduler.read_run_time(latest)
+        except (OSError, EOFError, ValueError):
+            run_time = None
+        if run_time is not None and run_time[0] >= float(nps):
+            return 'done'
+        if target_error is not None:
+            try:
+                tallies = scrape.scrape_out_file(latest)
+            except (OSError, EOFError, ValueError):
+                tallies = None
+            if (tallies is not None and (tallies['nps'] > 0).all()
+                    and np.nanmax(tallies['error']) <= target_error):
+                return 'done'
+    if os.path.exists(os.path.join(run_dir, 'r_' + deck)):
+        return 'continue'
+    return 'start'
+
+def check_decks(run_dir, targets_file=targets_name):
+    # This function is the check step of a link. It reads the targets of the
+    #  chain ({'nps': {deck: nps}, 'target_error': error or None}), and
+    #  writes the decks to continue and the decks to start over, one per line,
+    #  to chain_continue.txt and chain_start.txt in the run directory. It
+    #  returns {deck: status} for the decks that aren't done.
+    targets = load_chain_targets(run_dir, targets_file)
+    todo = {}
+    for deck, nps in targets['nps'].items():
+        status = deck_status(run_dir, deck, nps, targets.get('target_error'))
+        if status != 'done':
+            todo[deck] = status
+    for name, status in ((continue_name, 'continue'), (start_name, 'start')):
+        with open(os.path.join(run_dir, name), "w", newline='\n') as f:
+            f.write("".join(deck + "\n" for deck in todo if todo[deck] == status))
+    return todo
+
+def load_chain_targets(run_dir, targets_file=targets_name):
+    # This function reads the targets written by write_chain_targets.
+    with open(os.path.join(run_dir, targets_file), "r") as f:
+        return json.load(f)
+
+def link_nodes(num_decks, cores):
+    # This function returns the nodes a link needs to run num_decks decks
+    #  with this many cores each at the same time.
+    return max(1, math.ceil(num_decks*cores/deckScheduler.cores_per_node))
+
+def submit_link(run_dir, link, targets_file=targets_name):
+    # This function is what check job link runs: the check step (see 
+    #  check_decks), then, if any deck isn't done, it submits link with 
+    #  -N for just those decks and, if link is less than max_depth, the next
+    #  check job after it. It returns the job id of the link, or None if 
+    #  every deck is done.
+    targets = load_chain_targets(run_dir, targets_file)
+    todo = check_decks(run_dir, targets_file)
+    if not todo:
+        print("Every deck is done, the chain stops here")
+        return None
+    nodes = link_nodes(len(todo), targets['cores'])
+    job_id = sbatch(run_dir, ['-N', str(nodes), targets['chain_batch'], str(link)])
+    print(f"Submitted chain link {link} for {len(todo)} decks on {nodes} nodes as {job_id}")
+    if link < targets['max_depth']:
+        check_id = sbatch(run_dir, ['--dependency=afterany:' + job_id, targets['check_batch'], str(link + 1)])
+        print(f"Submitted check job {link + 1} as {check_id}")
+    return job_id
+
+def sbatch(run_dir, arguments):
+    # This function submits a batch file and returns its job id.
+    result = subprocess.run(['sbatch', '--parsable'] + arguments, cwd=run_dir,
+                            capture_output=True, text=True, check=True)
+    return result.stdout.strip().split(';')[0]
+
+def write_chain_targets(run_path, deck_nps, target_error=None, cores=deckScheduler.cores_per_node,
+                        max_depth=1, chain_batch="batch_chain.bash", check_batch="batch_chain_check.bash"):
+    # This function writes the targets the check step uses (see check_decks
+    #  and submit_link) and copies the scripts it needs into the run 
+    #  directory. chain_batch and check_batch are the whole file names (with
+    #  the date in front).
+    with open(os.path.join(run_path, targets_name), "w") as f:
+        json.dump({'nps': {deck: str(nps) for deck, nps in deck_nps.items()},
+                   'target_error': target_error, 'cores': cores, 'max_depth': max_depth,
+                   'chain_batch': chain_batch, 'check_batch': check_batch}, f, indent=1)
+    here = os.path.dirname(os.path.abspath(__file__))
+    for name in chain_modules:
+        if os.path.abspath(os.path.join(run_path, name)) != os.path.join(here, name):
+            shutil.copy2(os.path.join(here, name), os.path.join(run_path, name))
+
+def write_sbatch_chain(run_path, dir1, dir2, numCores, walltime="23:30:00",
+                       batch_name="batch_chain.bash"):
+    # This function writes the batch file of one chain link (see the top of
+    #  the file). The link number is its first argument. It runs the decks
+    #  the check step listed, each with numCores cores, all at the same time.
+    #  The check step gives it -N when it submits it, so the -N 1 here is 
+    #  only used if it is submitted by hand.
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
+    sbatch_file.write("#!/bin/csh\n")
+    sbatch_file.write("#SBATCH -N 1\n")
+    sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
+    sbatch_file.write("#SBATCH -t " + walltime + "\n")
+    sbatch_file.write("#SBATCH -p pbatch\n")
+    sbatch_file.write("#SBATCH --mail-type=ALL\n")
+    sbatch_file.write("#SBATCH -A cbronze\n")
+    sbatch_file.write("#SBATCH -D /g/g20/condon3/PNS/" + dir2 + "\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("echo '=================Job diagnostics================='\n")
+    sbatch_file.write("date\n")
+    sbatch_file.write("echo -n 'This machine is ';hostname\n")
+    sbatch_file.write("echo -n 'My jobid is '; echo $SLURM_JOBID\n")
+    sbatch_file.write("echo -n 'Chain link '; echo $1\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("echo '=================Job Starting================='\n")
+    sbatch_file.write("foreach deck (`cat " + continue_name + "`)\n")
+    sbatch_file.write("    srun -N1 -n"+str(numCores)+" mcnp6 c r=r_$deck o=out_${deck}_cont$1 &\n")
+    sbatch_file.write("end\n")
+    sbatch_file.write("foreach deck (`cat " + start_name + "`)\n")
+    sbatch_file.write("    srun -N1 -n"+str(numCores)+" mcnp6 i=$deck o=out_${deck}_cont$1 runtpe=r_$deck &\n")
+    sbatch_file.write("end\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("wait\n")
+    sbatch_file.write("echo 'Done'")
+    sbatch_file.close()
+    return batch_name
+
+def write_sbatch_chain_check(run_path, dir1, dir2, batch_name="batch_chain_check.bash"):
+    # This function writes the batch file of a check job (see the top of the
+    #  file). The link number it checks for is its first argument.
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
+    sbatch_file.write("#!/bin/csh\n")
+    sbatch_file.write("#SBATCH -N 1\n")
+    sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "_check\n")
+    sbatch_file.write("#SBATCH -t " + check_walltime + "\n")
+    sbatch_file.write("#SBATCH -p pbatch\n")
+    sbatch_file.write("#SBATCH -A cbronze\n")
+    sbatch_file.write("#SBATCH -D /g/g20/condon3/PNS/" + dir2 + "\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("echo '=================Checking decks================='\n")
+    sbatch_file.write("python3 continuationChain.py " + targets_name + " --link $1\n")
+    sbatch_file.close()
+    return batch_name
+
+def write_submit_chain(run_path, dir1, first_batch, check_batch="batch_chain_check.bash",
+                       submit_name="submit_chain.bash"):
+    # This function writes the script that submits first_batch and the first
+    #  check job with --dependency=afterany on it. The check jobs submit the
+    #  rest of the chain (see submit_link).
+    submit_file = open(run_path + os.sep + dir1 + submit_name,"x",newline='\n')
+    submit_file.write("#!/bin/csh\n")
+    submit_file.write("set jid = `sbatch --parsable " + dir1 + first_batch + " | cut -d';' -f1`\n")
+    submit_file.write("echo \"Submitted " + dir1 + first_batch + " as $jid\"\n")
+    submit_file.write("set jid = `sbatch --parsable --dependency=afterany:$jid " + dir1 + check_batch + " 1 | cut -d';' -f1`\n")
+    submit_file.write("echo \"Submitted check job 1 as $jid\"\n")
+    submit_file.close()
+    return submit_name
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check which decks of a continuation chain still have to run.')
+    parser.add_argument('targets', nargs='?', default=targets_name, help='the chain targets file')
+    parser.add_argument('--run-dir', default='.')
+    parser.add_argument('--link', type=int,
+                        help='submit this chain link for the decks that still have to run (see submit_link)')
+    args = parser.parse_args()
+    if args.link is not None:
+        submit_link(args.run_dir, args.link, args.targets)
+    else:
+        todo = check_decks(args.run_dir, args.targets)
+        for deck, status in todo.items():
+            print(f"{deck}: {status}")
+        print(f"{len(todo)} decks still have to run")
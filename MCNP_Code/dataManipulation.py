@@ -2,6 +2,7 @@ import re
 import csv
 import numpy as np
 import matplotlib.pyplot as plt
+import tldGeometry as tld
 
 def get_tally_lines(filename,nps):
     # This function will pull the whole line of text from the MCNP output file
@@ -138,12 +139,23 @@ def save_data(filename,headers,tally_lists):
         csvwriter.writerows(tally_lists)
     return
 
+def as_tally_array(data_table):
+    # This function lets the functions below take either a pandas table (read
+    #  from the CSV files that save_data writes) or a numpy array with one row
+    #  per energy bin and one column per tally (such as one run of a tally
+    #  dataset, see tallyDataset.run_table).
+    if hasattr(data_table, 'to_numpy'):
+        return data_table.to_numpy()
+    return np.asarray(data_table)
+
 def make_graph_compare2(first_data_table,second_data_table,tally_number,
                         plot_title,first_legend,second_legend):
     # Variable requirements:
         # Both data tables need to be for the full range of data from a whole
         #  set of simulations. In other words, they should have 55 columns (one
         #  for each of tally cells) and 84 rows (one for each energy bin)
+        # The data tables can be pandas tables or (84, 55) arrays, such as the
+        #  ones from tallyDataset.run_table, which are sliced without copying.
         # Tally number should be from 0 to 54 to signify which element will get
         #  compared.
         # This section is for Tally 4186, which is at x=-14 from the center
@@ -161,11 +173,8 @@ def make_graph_compare2(first_data_table,second_data_table,tally_number,
               3.16e0,3.55e0,3.98e0,4.47e0,5.01e0,5.62e0,6.31e0,7.08e0,7.94e0,8.91e0,
               1e1,1.12e1,1.26e1,1.41e1,1.58e1,1.78e1,2e1,2.51e1,3.16e1,3.98e1,
               5.01e1,6.31e1,7.94e1,1e2]
-    first_data_list = np.zeros(84)
-    second_data_list = np.zeros(84)
-    for i in range(84):
-        first_data_list[i] = first_data_table.loc[i][tally_number]
-        second_data_list[i] = second_data_table.loc[i][tally_number]
+    first_data_list = as_tally_array(first_data_table)[:,tally_number]
+    second_data_list = as_tally_array(second_data_table)[:,tally_number]
 
     if len(str(tally_number)) == 1:
         tally_number = '0'+str(tally_number)
@@ -197,15 +206,9 @@ def make_surface_plots(data_table):
               3.16e0,3.55e0,3.98e0,4.47e0,5.01e0,5.62e0,6.31e0,7.08e0,7.94e0,8.91e0,
               1e1,1.12e1,1.26e1,1.41e1,1.58e1,1.78e1,2e1,2.51e1,3.16e1,3.98e1,
               5.01e1,6.31e1,7.94e1,1e2]
-    all_tallys = data_table.to_numpy()
-    x_tallys = np.vstack((all_tallys[:,18],all_tallys[:,16],all_tallys[:,14],
-                          all_tallys[:,12],all_tallys[:,10],all_tallys[:,8],
-                          all_tallys[:,6],all_tallys[:,4],all_tallys[:,2],
-                          all_tallys[:,0],all_tallys[:,1],all_tallys[:,3],
-                          all_tallys[:,5],all_tallys[:,7],all_tallys[:,9],
-                          all_tallys[:,11],all_tallys[:,13],all_tallys[:,15],
-                          all_tallys[:,17]))
-    x_tallys = np.transpose(x_tallys)
+    all_tallys = np.array(as_tally_array(data_table))
+    # The X-axis tallies from -14 to 14 (see tldGeometry.py)
+    x_tallys = all_tallys[:,tld.tld_axis_columns[0]]
     for i in range(len(x_tallys)):
         x_tallys[i] = x_tallys[i]/max(x_tallys[i])
     X,Y = np.meshgrid(x,E_bins)
@@ -223,18 +226,12 @@ def get_tld_totals(tally_table):
     #  be for the positive.
     # The first axis of the variable "tld_totals" is for the X axis of the PNS,
     #  the second is for the Y axis, and the third is for the Z axis.
-    tld_totals = np.zeros((3,19))
-    X_tld_names = ['4186','4166','4146','4126','4106','4086','4066','4046',
-                   '4026','4006','4016','4036','4056','4076','4096','4116',
-                   '4136','4156','4176']
-    Y_tld_names = ['4366','4346','4326','4306','4286','4266','4246','4226',
-                   '4206','4006','4196','4216','4236','4256','4276','4296',
-                   '4316','4336','4356']
-    Z_tld_names = ['4546','4526','4506','4486','4466','4446','4426','4406',
-                   '4386','4006','4376','4396','4416','4436','4456','4476',
-                   '4496','4516','4536']
-    for i in range(19):
-        tld_totals[0,i] = sum(tally_table[X_tld_names[i]].values)
-        tld_totals[1,i] = sum(tally_table[Y_tld_names[i]].values)
-        tld_totals[2,i] = sum(tally_table[Z_tld_names[i]].values)
+    # The order of the tallies along each axis comes from tldGeometry.py, the
+    #  center TLD (F4006) is in the middle of all three.
+    if hasattr(tally_table, 'columns'):
+        names = [str(tally) for tally in tld.tally_numbers]
+        all_tallys = tally_table[names].to_numpy()
+    else:
+        all_tallys = as_tally_array(tally_table)
+    tld_totals = all_tallys[:,tld.tld_axis_columns].sum(axis=0)
     return tld_totals
\ No newline at end of file
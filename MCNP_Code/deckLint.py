@@ -0,0 +1,247 @@
+# This script checks input decks for mistakes that MCNP would only find after
+#  the job has waited in the queue (or worse, that it wouldn't find at all and
+#  would run the whole 23.5 hours with). It reads the cell, surface and data
+#  cards of each deck and checks that:
+    # - every cell and surface number is only used once
+    # - every surface in a cell's geometry exists
+    # - every cell in a # complement or a LIKE n BUT exists
+    # - every material used by a cell has an m card
+    # - every cell (or surface) on a tally exists and no tally is repeated
+    # - there is one SDEF card, every distribution it uses (d1, d2, ...) has
+    #   an SI or DS card, every SI has an SP, and every SI/SP/SB/DS is used
+# Each deck takes about a millisecond, and write_PNS_input in generateModel.py
+#  checks every deck it makes with lint_decks before they are copied to the
+#  transfer directory.
+# To check decks or run directories by hand:
+    # python deckLint.py 2023-03-01_1000 PNS_1e-9MeV
+
+import argparse
+import multiprocessing
+import os
+import re
+
+comment_pattern = re.compile(r"^ {0,4}[cC]( |$)")
+read_card_pattern = re.compile(r"^\s*read\s+file\s*=\s*(\S+)", re.I)
+complement_pattern = re.compile(r"#\s*(\d+)")
+number_pattern = re.compile(r"(\d+)(?:\.\d+)?")
+distribution_pattern = re.compile(r"\bd(\d+)\b", re.I)
+distribution_card_pattern = re.compile(r"^(si|sp|sb|ds)(\d+)$")
+material_card_pattern = re.compile(r"^m(\d+)$")
+tally_card_pattern = re.compile(r"^\+?\*?f(\d+)(:\S*)?$")
+deck_patterns = (re.compile(r"^PNS_.*MeV(_s\d+)?$"), re.compile(r"^Run\d+_rand_energy(_s\d+)?$"))
+
+read_file_cache = {}
+
+def read_included_file(filename):
+    # This function returns the lines of a file on a READ card. The shared
+    #  card files of a run directory are read by every deck, so they are only
+    #  read once (until they change).
+    stat = os.stat(filename)
+    key = (os.path.abspath(filename), stat.st_mtime_ns, stat.st_size)
+    if key not in read_file_cache:
+        with open(filename, "r") as f:
+            read_file_cache[key] = f.read().splitlines()
+    return read_file_cache[key]
+
+def deck_blocks(deck_text, directory='.'):
+    # This function splits a deck into its cell, surface and data blocks and
+    #  each block into cards. A card that goes on for more than one line (with
+    #  & or 5 spaces) is put on one line, comments are taken out and the files
+    #  on READ cards are put in. It returns a list of three lists of cards.
+    lines = deck_text.splitlines()[1:]
+    expanded = []
+    for line in lines:
+        read_card = read_card_pattern.match(line)
+        if read_card:
+            expanded.extend(read_included_file(os.path.join(directory, read_card.group(1))))
+        else:
+            expanded.append(line)
+    blocks = [[]]
+    continued = False
+    for line in expanded:
+        if not line.strip():
+            if blocks[-1] or len(blocks) > 1:
+                blocks.append([])
+            continued = False
+            continue
+        if comment_pattern.match(line):
+            continue
+        text = line.split("$")[0].rstrip()
+        if not text:
+            continue
+        if blocks[-1] and (continued or text.startswith("     ")):
+            blocks[-1][-1] += " " + text.strip()
+        else:
+            blocks[-1].append(text.strip())
+        continued = blocks[-1][-1].endswith("&")
+        if continued:
+            blocks[-1][-1] = blocks[-1][-1][:-1].rstrip()
+    blocks = [block for block in blocks if block]
+    return (blocks + [[], [], []])[:3]
+
+def parse_cell(card):
+    # This function returns (cell, material, like, cells, surfaces) for one
+    #  cell card. material is None for a LIKE BUT cell that doesn't change it,
+    #  like is the cell it is like (or None), and cells and surfaces are the
+    #  ones its geometry uses.
+    words = card.split()
+    cell = int(words[0])
+    if words[1].lower() == 'like':
+        material = None
+        for word in words[4:]:
+            if word.lower().startswith('mat='):
+                material = int(word[4:])
+        return cell, material, int(words[2]), [], []
+    material = int(words[1])
+    geometry = []
+    for word in words[3 if material != 0 else 2:]:
+        if re.match(r"^[#():]*[a-zA-Z*]", word):
+            break
+        geometry.append(word)
+    geometry = " ".join(geometry)
+    cells = [int(number) for number in complement_pattern.findall(geometry)]
+    surfaces = [int(number) for number in number_pattern.findall(complement_pattern.sub(" ", geometry))]
+    return cell, material, None, cells, surfaces
+
+def lint_deck_text(deck_text, directory='.'):
+    # This function checks the text of one deck (see the top of the file).
+    #  directory is where the files on READ cards are. It returns a list of
+    #  the problems that were found, which is empty if the deck is fine.
+    problems = []
+    try:
+        cell_cards, surface_cards, data_cards = deck_blocks(deck_text, directory)
+    except OSError as err:
+        return [f"READ file could not be read: {err}"]
+
+    cells = {}
+    for card in cell_cards:
+        try:
+            parsed = parse_cell(card)
+        except (ValueError, IndexError):
+            problems.append(f"Cell card could not be read: {card[:60]}")
+            continue
+        if parsed[0] in cells:
+            problems.append(f"Cell {parsed[0]} is defined more than once")
+        cells[parsed[0]] = parsed
+    surfaces = set()
+    for card in surface_cards:
+        try:
+            surface = int(card.split()[0].lstrip('*+'))
+        except ValueError:
+            problems.append(f"Surface card could not be read: {card[:60]}")
+            continue
+        if surface in surfaces:
+            problems.append(f"Surface {surface} is defined more than once")
+        surfaces.add(surface)
+
+    materials = set()
+    sdef_cards = []
+    distributions = {}
+    tallies = set()
+    for card in data_cards:
+        words = card.split()
+        name = words[0].lower()
+        if material_card_pattern.match(name):
+            materials.add(int(name[1:]))
+        elif name == 'sdef':
+            sdef_cards.append(card)
+        elif distribution_card_pattern.match(name):
+            kind, number = distribution_card_pattern.match(name).groups()
+            distributions.setdefault(int(number), {})[kind] = words[1:]
+        elif tally_card_pattern.match(name):
+            tally = int(tally_card_pattern.match(name).group(1))
+            if tally in tallies:
+                problems.append(f"Tally F{tally} is defined more than once")
+            tallies.add(tally)
+            # Surface tallies end in 1 or 2, point detectors in 5 aren't checked
+            kind = tally % 10
+            if kind == 5:
+                continue
+            known, what = (surfaces, "surface") if kind in (1, 2) else (cells, "cell")
+            for number in re.findall(r"(?<![\w.])\d+(?![\w.])", " ".join(words[1:])):
+                if int(number) not in known:
+                    problems.append(f"Tally F{tally} uses {what} {number}, which doesn't exist")
+
+    for cell, material, like, used_cells, used_surfaces in cells.values():
+        if like is not None and like not in cells:
+            problems.append(f"Cell {cell} is LIKE cell {like}, which doesn't exist")
+        if material not in (None, 0) and material not in materials:
+            problems.append(f"Cell {cell} uses material {material}, which has no m card")
+        for used in used_cells:
+            if used not in cells:
+                problems.append(f"Cell {cell} uses #{used}, which isn't a cell")
+        for used in used_surfaces:
+            if used not in surfaces:
+                problems.append(f"Cell {cell} uses surface {used}, which doesn't exist")
+
+    if len(sdef_cards) != 1:
+        problems.append(f"There are {len(sdef_cards)} SDEF cards instead of 1")
+    used = {int(number) for card in sdef_cards for number in distribution_pattern.findall(card)}
+    for number in sorted(used):
+        cards = distributions.get(number, {})
+        # An SP with a built-in function (a negative number) doesn't need an SI
+        built_in = cards.get('sp', ['0'])[0].lstrip().startswith('-')
+        if not ('si' in cards or 'ds' in cards or built_in):
+            problems.append(f"Distribution d{number} is used by SDEF but has no SI or DS card")
+    for number, cards in sorted(distributions.items()):
+        if number not in used:
+            problems.append(f"Distribution {number} ({', '.join(kind.upper() for kind in cards)}) isn't used by SDEF")
+        if 'si' in cards and 'sp' not in cards:
+            problems.append(f"SI{number} has no SP{number}")
+        if 'sb' in cards and 'sp' not in cards:
+            problems.append(f"SB{number} has no SP{number}")
+    return problems
+
+def lint_deck(filename):
+    # This function is what each worker in lint_decks runs. It returns
+    #  (filename, problems) for one deck file.
+    try:
+        with open(filename, "r") as f:
+            deck_text = f.read()
+    except OSError as err:
+        return filename, [f"Deck could not be read: {err}"]
+    return filename, lint_deck_text(deck_text, os.path.dirname(filename) or '.')
+
+def find_decks(run_dir):
+    # This function returns the input decks in a run directory (the energy bin
+    #  decks PNS_<bin>MeV and the random spectrum decks Run<n>_rand_energy,
+    #  and their sub-decks <deck>_s<i> from splitSeed.py).
+    return sorted(os.path.join(run_dir, name) for name in os.listdir(run_dir)
+                  if any(pattern.match(name) for pattern in deck_patterns))
+
+def lint_decks(filenames, processes=None):
+    # This function checks many decks with a pool of processes (one per core
+    #  by default). Like ScrapeMCNP.scrape_files, a short list is checked in
+    #  this process since starting the pool would take longer. It returns
+    #  {filename: problems} for the decks that have problems.
+    # NOTE: On Windows, this needs to be called from inside an
+    #  "if __name__ == '__main__':" block since the workers are spawned.
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = min(processes, len(filenames) // 50)
+    if processes <= 1:
+        results = [lint_deck(filename) for filename in filenames]
+    else:
+        chunksize = max(1, len(filenames) // (4*processes))
+        with multiprocessing.Pool(processes) as pool:
+            results = pool.map(lint_deck, filenames, chunksize)
+    return {filename: problems for filename, problems in results if problems}
+
+def print_problems(problems):
+    # This function prints what lint_decks returns.
+    for filename, deck_problems in problems.items():
+        print(filename + ":")
+        for problem in deck_problems:
+            print("    " + problem)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Check MCNP input decks before they are run.')
+    parser.add_argument('paths', nargs='+', help='decks or run directories')
+    parser.add_argument('--processes', type=int, default=None)
+    args = parser.parse_args()
+    filenames = []
+    for path in args.paths:
+        filenames.extend(find_decks(path) if os.path.isdir(path) else [path])
+    problems = lint_decks(filenames, args.processes)
+    print_problems(problems)
+    print(f"{len(filenames)} decks checked, {len(problems)} with problems")
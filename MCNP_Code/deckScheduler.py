@@ -0,0 +1,208 @@
+# This script decides which decks run on which node and in what order, so a
+#  set of decks finishes as early as it can inside the time limit on Quartz.
+#  The decks don't all take the same time: the thermal bins run much slower
+#  per particle than the fast ones, so starting every deck on its own node at
+#  once leaves most of the nodes idle while the slowest decks finish.
+# The cost of a deck is its nps divided by its speed (particles per core per
+#  second) and the number of cores it runs on. The speeds come from the out
+#  files of earlier runs of the same decks (see rates_from_run_dirs). A deck
+#  that hasn't been run before gets default_rate, which is the calibration
+#  that 1e10 particles take about 18 hours on one 36 core node.
+# The decks are packed with the longest processing time first rule: the
+#  decks are sorted from the longest to the shortest and each one is put on
+#  the slot (cores_per_deck cores of a node) that will be free first. The
+#  decks on a slot run one after the other. The fewest nodes that finish
+#  inside the time limit are used.
+# Example:
+    # rates = rates_from_run_dirs(['2023-03-01/2023-03-01_1000'])
+    # schedule = schedule_decks({'PNS_1e-9MeV': 1e10, ...}, rates)
+    # write_sbatch_schedule(run_path, dir1, dir2, schedule)
+
+import os
+import re
+import math
+import ScrapeMCNP as scrape
+
+cores_per_node = 36
+time_limit = 23.5*3600
+# The estimates are only as good as the earlier runs, so the schedule leaves
+#  this much room and the job asks for it
+time_margin = 1.1
+default_rate = 1e10/(18*3600*36)
+
+terminated_pattern = re.compile(r"run terminated when +(\d+) +particle histories were done")
+computer_time_pattern = re.compile(r"computer time = +([\d.Ee+-]+) +minutes")
+dump_pattern = re.compile(r"nps = +(\d+) +coll = +\d+ +ctm = +([\d.Ee+-]+)")
+subtasks_pattern = re.compile(r"master starting +(\d+) +by +\d+ +subtasks")
+
+def read_run_time(filename):
+    # This function returns (nps, seconds, cores) of one out file: the
+    #  particles that were run, the computer time it took and the number of
+    #  cores it ran on (the MPI subtasks plus the master, or None if it
+    #  doesn't say). A run that was stopped by the time limit doesn't have
+    #  the lines at the end, so the last runtpe dump is used instead. It
+    #  returns None if the file has neither.
+    nps = seconds = cores = None
+    dump = None
+    with scrape.open_out_file(filename) as f:
+        for line in f:
+            if 'subtasks' in line and cores is None:
+                match = subtasks_pattern.search(line)
+                if match:
+                    cores = int(match.group(1)) + 1
+            elif 'ctm =' in line:
+                match = dump_pattern.search(line)
+                if match:
+                    dump = (int(match.group(1)), float(match.group(2))*60)
+            elif 'particle histories were done' in line:
+                match = terminated_pattern.search(line)
+                if match:
+                    nps = int(match.group(1))
+            elif 'computer time =' in line:
+                match = computer_time_pattern.search(line)
+                if match:
+                    seconds = float(match.group(1))*60
+    if nps is None or seconds is None:
+        if dump is None:
+            return None
+        nps, seconds = dump
+    return nps, seconds, cores
+
+def rates_from_out_files(filenames, cores=cores_per_node):
+    # This function returns {deck name: particles per core per second} from
+    #  out files. cores is used for files that don't say how many cores they
+    #  ran on. If a deck has more than one out file, the one that ran the
+    #  most particles is used, since it has the least startup time in it.
+    best = {}
+    for filename in filenames:
+        try:
+            run_time = read_run_time(filename)
+        except (OSError, EOFError, ValueError):
+            continue
+        if run_time is None or run_time[0] <= 0 or run_time[1] <= 0:
+            continue
+        deck = scrape.deck_name_from_out_file(filename)
+        if deck not in best or run_time[0] > best[deck][0]:
+            best[deck] = run_time
+    return {deck: nps/(seconds*(run_cores or cores))
+            for deck, (nps, seconds, run_cores) in best.items()}
+
+def rates_from_run_dirs(run_dirs, cores=cores_per_node):
+    # This function returns the speed of every deck that has an out file in
+    #  one or more run directories (see rates_from_out_files). Continuation
+    #  out files are left out since their computer time doesn't start at 0.
+    filenames = [filename for filename in scrape.find_out_files(run_dirs)
+                 if '_cont' not in os.path.basename(filename)]
+    return rates_from_out_files(filenames, cores)
+
+def deck_seconds(nps, rate, cores):
+    # This function returns how long a deck with this nps takes on this many
+    #  cores at rate particles per core per second.
+    return float(nps)/(rate*cores)
+
+def pack_decks(deck_costs, num_slots):
+    # This function packs decks ({deck name: seconds}) onto num_slots slots
+    #  with the longest processing time first rule (see the top of the file).
+    #  It returns (slots, loads): the decks on each slot in the order they
+    #  run and the total seconds of each slot.
+    slots = [[] for i in range(num_slots)]
+    loads = [0.0]*num_slots
+    for deck in sorted(deck_costs, key=lambda deck: (-deck_costs[deck], deck)):
+        slot = loads.index(min(loads))
+        slots[slot].append(deck)
+        loads[slot] += deck_costs[deck]
+    return slots, loads
+
+def schedule_decks(deck_nps, rates, cores_per_deck=cores_per_node, limit=time_limit/time_margin,
+                   max_nodes=None, rate=default_rate):
+    # This function finds the fewest nodes that run every deck inside limit
+    #  seconds and how to pack the decks onto them.
+    # Requirements for input variables:
+        # deck_nps: {deck name: nps}
+        # rates: {deck name: particles per core per second}, decks that
+        #  aren't in it get rate
+        # cores_per_deck: the cores each deck runs on, 36 (a whole node) for
+        #  the energy bin decks and 1 for the source 4 decks
+        # max_nodes: the most nodes that can be asked for, or None
+    # A deck that takes longer than limit on its own can't be finished in
+    #  one job. It is still scheduled (alone on its slot, since it is packed
+    #  first) and listed in 'too_long' so it can be picked up by the
+    #  continuation job.
+    # It returns a dictionary with:
+        # nodes, cores_per_deck, slots, loads: see pack_decks
+        # seconds: {deck name: estimated seconds}
+        # makespan: the estimated seconds until the last deck finishes
+        # too_long: the decks that take longer than limit on their own
+    if cores_per_deck > cores_per_node or cores_per_node % cores_per_deck:
+        raise ValueError(f"cores_per_deck has to divide {cores_per_node}, not {cores_per_deck}")
+    slots_per_node = cores_per_node // cores_per_deck
+    seconds = {deck: deck_seconds(nps, rates.get(deck, rate), cores_per_deck)
+               for deck, nps in deck_nps.items()}
+    too_long = sorted(deck for deck in seconds if seconds[deck] > limit)
+    target = max([limit] + [seconds[deck] for deck in too_long])
+    most_nodes = max(1, math.ceil(len(seconds)/slots_per_node))
+    if max_nodes is not None:
+        most_nodes = min(most_nodes, max_nodes)
+    nodes = max(1, min(most_nodes, math.ceil(sum(seconds.values())/(target*slots_per_node))))
+    while True:
+        slots, loads = pack_decks(seconds, nodes*slots_per_node)
+        if max(loads) <= target or nodes >= most_nodes:
+            break
+        nodes += 1
+    return {'nodes': nodes, 'cores_per_deck': cores_per_deck, 'slots': slots,
+            'loads': loads, 'seconds': seconds, 'makespan': max(loads),
+            'too_long': too_long}
+
+def format_walltime(seconds, limit=time_limit):
+    # This function turns seconds into the HH:MM:SS of an #SBATCH -t line. It
+    #  is rounded up to the next 10 minutes and never goes over limit.
+    minutes = min(math.ceil(seconds/600)*10, int(limit//60))
+    return f"{minutes//60:02d}:{minutes%60:02d}:00"
+
+def walltime_seconds(walltime):
+    # This function turns the HH:MM:SS of an #SBATCH -t line into seconds.
+    hours, minutes, seconds = (int(value) for value in walltime.split(':'))
+    return hours*3600 + minutes*60 + seconds
+
+def write_sbatch_schedule(run_path, dir1, dir2, schedule, batch_name="batch_packed.bash",
+                          margin=time_margin):
+    # This function writes the SBATCH file for a schedule from
+    #  schedule_decks. The job asks for the schedule's nodes and a time limit
+    #  of the makespan times margin. The decks on each slot are run one after
+    #  the other in the background, so the slots run at the same time.
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
+    sbatch_file.write("#!/bin/csh\n")
+    sbatch_file.write("#SBATCH -N " + str(schedule['nodes']) + "\n")
+    sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
+    sbatch_file.write("#SBATCH -t " + format_walltime(schedule['makespan']*margin) + "\n")
+    sbatch_file.write("#SBATCH -p pbatch\n")
+    sbatch_file.write("#SBATCH --mail-type=ALL\n")
+    sbatch_file.write("#SBATCH -A cbronze\n")
+    sbatch_file.write("#SBATCH -D /g/g20/condon3/PNS/" + dir2 + "\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("echo '=================Job diagnostics================='\n")
+    sbatch_file.write("date\n")
+    sbatch_file.write("echo -n 'This machine is ';hostname\n")
+    sbatch_file.write("echo -n 'My jobid is '; echo $SLURM_JOBID\n")
+    sbatch_file.write("echo 'My path is:'\n")
+    sbatch_file.write("echo $PATH\n")
+    sbatch_file.write("echo 'My job info:'\n")
+    sbatch_file.write("squeue -j $SLURM_JOBID\n")
+    sbatch_file.write("echo 'Machine info'\n")
+    sbatch_file.write("sinfo -s\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("echo '=================Job Starting================='\n")
+    sbatch_file.write("echo 'Job_id = $SLURM_JOBID'\n")
+    cores = str(schedule['cores_per_deck'])
+    for slot, load in zip(schedule['slots'], schedule['loads']):
+        if not slot:
+            continue
+        runs = ["srun -N1 -n"+cores+" mcnp6 i="+deck+" o=out_"+deck+" runtpe=r_"+deck
+                for deck in slot]
+        sbatch_file.write("# about " + format(load/3600, '.1f') + " hours\n")
+        sbatch_file.write("( " + " ; \\\n  ".join(runs) + " ) &\n")
+    sbatch_file.write("\n")
+    sbatch_file.write("wait\n")
+    sbatch_file.write("echo 'Done'")
+    sbatch_file.close()
+    return batch_name
@@ -2,11 +2,43 @@
 
 from datetime import datetime
 import os
+import csv
+import json
+import hashlib
 import shutil
 import math
 import random
+import multiprocessing
+import numpy as np
+import resultCache
+import deckLint
+import deckScheduler
+import runtimeModel
+import continuationChain
+import splitSeed
+import tldGeometry as tld
 
-def make_today_dir():
+# These are where the run directories are made and where they are copied to so
+#  they can be sent to Quartz. Both can be changed with the output_root and
+#  transfer_directory inputs of write_PNS_input() (see automatePNS.py).
+default_output_root = "C:/Users/zacht/OneDrive/OSU/Research/MCNP/PNS Model/"
+# The ctme (minutes) of a deck that has no runtime prediction (see 
+#  runtimeModel.plan_deck()). It is long enough that it never stops a run.
+default_ctme = 57600
+
+# The options that decide which batch files are written and how (see 
+#  write_batch_files()). Any of them can be given in batch_options of 
+#  write_PNS_input().
+default_batch_options = {'job_array': False, 'max_running': None, 'walltime': "23:30:00",
+                         'decks_per_task': 1, 'packing': False, 'deck_rates': None,
+                         'chain_depth': 0, 'target_error': None}
+# Slurm only takes array task ids below MaxArraySize (1001 by default), so a 
+#  job array can have at most this many tasks.
+max_array_tasks = 1000
+
+default_transfer_directory = 'C:\\Users\\zacht\\AppData\\Local\\Packages\\CanonicalGroupLimited.Ubuntu20.04onWindows_79rhkp1fndgsc\\LocalState\\rootfs\\home\\zach\\Research\\quartzTransfer\\'
+
+def make_today_dir(output_root=default_output_root):
     # This function makes a new folder using today's date. This folder is the
     #  daily folder. It checks for the presence of the folder already and will
     #  not create anything if this function already ran today. My goal is to be
@@ -17,7 +49,7 @@ def make_today_dir():
     now = datetime.now()
     date_string = now.strftime("%Y-%m-%d")
     new_directory = date_string
-    parent_directory = "C:/Users/zacht/OneDrive/OSU/Research/MCNP/PNS Model/"
+    parent_directory = output_root
     path = os.path.join(parent_directory,new_directory)
     try:
         os.mkdir(path)
@@ -25,45 +57,50 @@ def make_today_dir():
         print(f"Today's directory {date_string} already exists")
     return new_directory
 
-def make_run_dir():
+def make_run_dir(output_root=default_output_root):
     # This function make the directory for the current run. It uses today's
     #  date to navigate to the current daily directory, then will create a
     #  directory associated with the current time (the "dt_string" variable)
     #  is a string with the current time. If there is a directory already
     #  associated with the curren time, it will make a second one with "_2"
-    #  appended to the end. If that one already exists (for example, this script
-    #  was run three times in one minute), it will do nothing and say to wait.
+    #  appended to the end, then "_3" and so on, so any number of runs can be
+    #  made in one minute.
     # The format for the two variables that are returned:
-        # path = "C:/Users/zacht/OneDrive/OSU/Research/MCNP/PNS Model/YYYY-MM-DD
-        # new_directory = "YYYY-MM-DD_TTTT"
+        # path = "C:/Users/zacht/OneDrive/OSU/Research/MCNP/PNS Model/YYYY-MM-DD/YYYY-MM-DD_TTTT"
+        # new_directory = "YYYY-MM-DD_TTTT" (or "YYYY-MM-DD_TTTT_2", ...)
     now = datetime.now()
     date_string = now.strftime("%Y-%m-%d")
-    parent_directory = "C:/Users/zacht/OneDrive/OSU/Research/MCNP/PNS Model/" + date_string + "/"
+    parent_directory = os.path.join(output_root, date_string)
+    os.makedirs(parent_directory, exist_ok=True)
     dt_string = now.strftime("%Y-%m-%d_%H%M")
     new_directory = dt_string
-    path = os.path.join(parent_directory,new_directory)
-    try:
-        os.mkdir(path)
-    except:
-        path = path + "_2"
+    copy_number = 1
+    while True:
+        path = os.path.join(parent_directory,new_directory)
         try:
             os.mkdir(path)
-            print(f"Directory {dt_string} already exists. Making a second directory: {dt_string}_2")
-        except:
-            print("There are already two directories for this minute. Please just wait a minute.")
+            break
+        except FileExistsError:
+            copy_number += 1
+            new_directory = dt_string + "_" + str(copy_number)
+    if copy_number > 1:
+        print(f"Directory {dt_string} already exists. Making directory {new_directory}")
     return path, new_directory
 
-def write_run_notes(run_path,current_time_directory,num_runs,source_text):
+def write_run_notes(run_path,current_time_directory,num_runs,source_text,notes=None):
     # This function writes a .txt file and allows me to input notes for each 
     #  run. Ideally, I will have set things that I will record each time, but
     #  I am sure as I move forward, I will learn more things that I need to 
     #  keep track of.
+    # If notes is None, the notes are typed in line by line. Otherwise notes is
+    #  a list of lines (or one string) that is written without asking for 
+    #  anything, so the decks can be made without anyone at the keyboard.
     # The format of the input variables is:
         # run_path = "C:/Users/zacht/OneDrive/OSU/Research/MCNP/PNS Model/2022-08-18/2022-08-18_1526"
         # current_time_directory = "2022-08-18_1526"
         # num_runs = "84"
         # source_text = ["xxx","xxx","xxx",...]
-    run_notes = open(run_path + '\\notes_' + current_time_directory + '.txt',"x")
+    run_notes = open(run_path + os.sep + 'notes_' + current_time_directory + '.txt',"x")
     now = datetime.now()
     run_notes.write(f'*****Notes for PNS model run generated at {now.strftime("%Y-%m-%d_%H%M")}*****. \n')
     run_notes.write('\n')
@@ -72,12 +109,18 @@ def write_run_notes(run_path,current_time_directory,num_runs,source_text):
     run_notes.write('\n')
     run_notes.write('    NOTE: In case the run times out, the file *_cont.bash will continue the run.\n')
     run_notes.write('\n')
-    notes_input = 'start notes'
-    print("Write notes here. After each sentence, hit 'enter'\n")
-    print("To stop writing notes, type 'end'\n")
-    while notes_input != 'end':
-        notes_input = input('Write notes here, line by line: ')
-        run_notes.write(notes_input + ' \n')
+    if notes is None:
+        notes_input = 'start notes'
+        print("Write notes here. After each sentence, hit 'enter'\n")
+        print("To stop writing notes, type 'end'\n")
+        while notes_input != 'end':
+            notes_input = input('Write notes here, line by line: ')
+            run_notes.write(notes_input + ' \n')
+    else:
+        if isinstance(notes,str):
+            notes = notes.splitlines()
+        for line in notes:
+            run_notes.write(line + ' \n')
     run_notes.write('If this is a broad spectrum source, energy info will be below in order from lowest to highest energy:')
     run_notes.close()
     
@@ -94,7 +137,7 @@ def append_run_notes(run_path,current_time_directory,i,source_strength):
         # source_strength = [N.NNN, N.NNN, N.NNN, ...]
             # This variable will be a random length that corresponds to the 
             # number of randomized energy values for each simulation.
-    append_notes = open(run_path + '\\notes_' + current_time_directory + '.txt',"a")
+    append_notes = open(run_path + os.sep + 'notes_' + current_time_directory + '.txt',"a")
     append_notes.write('\n')
     spectrum_text = str(i+1) + ": "
     for s in source_strength:
@@ -102,7 +145,7 @@ def append_run_notes(run_path,current_time_directory,i,source_strength):
     append_notes.write(spectrum_text + "\n")
     append_notes.close()
 
-def define_which_source(which_source,E_bins,sdef_list):
+def define_which_source(which_source,E_bins,sdef_list,rng=random):
     # This function is important in that it defines what neutron source is used
     #  in each input deck. Within each if statement is a for loop that appends
     #  the sdef_list array with a line of text for each energy bin. Right now, 
@@ -130,7 +173,9 @@ def define_which_source(which_source,E_bins,sdef_list):
     #  location at a distance of 30 to 100 cm and consists of a range of
     #  energies. It consists of the original 84 energy bins from the original 
     #  PNS design. Each energy will have a random strength. This randomization 
-    #  is not realistic compared to a real neutron spectrum though.
+    #  is not realistic compared to a real neutron spectrum though. The random
+    #  numbers come from rng, which is the random module unless a generator 
+    #  with its own stream is given (see write_spectrum_campaign()).
     # Source 5 - This is six sources, along all of the Cartesian axes (positive
     #  x, negative x, positive y, etc.). This source is used to make the 
     #  simulation symmetric to make a detector response matrix.
@@ -158,42 +203,9 @@ def define_which_source(which_source,E_bins,sdef_list):
                     "SB1  0    1     9\n"]
         source_text = 'Source 3: A point source emitting radiation in a cone that encompasses only the detector.'
     elif which_source == 4:
-        # Set the first source line
-        source_pos = [round(random.uniform(30,100),1), round(random.uniform(30,100),1), round(random.uniform(30,100),1)]
-        sdef_list.append("SDEF   POS="+str(source_pos[0])+" "+str(source_pos[1])+" "+str(source_pos[2])+" ERG=d1 PAR=N  VEC=-"+str(source_pos[0])+" -"+str(source_pos[1])+" -"+str(source_pos[2])+"  DIR=d2\n")
-        # Initialize sdef_mod array
-        sdef_mod = []
-        # Define the source information with all of the energy values
-        SI1_text = "SI1 L"
-        i = 0
-        for E in E_bins:
-            i += 1
-            SI1_text += "    " + "{:.2e}".format(E)
-            if i == 10:
-                sdef_mod.append(SI1_text + "&\n")
-                SI1_text = ""
-                i = 0
-        sdef_mod.append(SI1_text + "\n")
-        
-        # Define the source strength for each energy
-        random_source_strength = [random.random() for _ in range(84)]
-        source_strength = [round(strength/sum(random_source_strength),3) for strength in random_source_strength]
-        SP1_text = "SP1 D"
-        i = 0
-        for S in source_strength:
-            i += 1
-            SP1_text += "    " + "{:.3}".format(S)
-            if i == 10:
-                sdef_mod.append(SP1_text + "&\n")
-                SP1_text = ""
-                i = 0
-        sdef_mod.append(SP1_text + "\n")
-        # Define the direction modification so that the neutrons are emitted in a cone at the PNS
-        distance_sourceToDetector = math.sqrt(source_pos[0]**2+source_pos[1]**2+source_pos[2]**2)
-        mu = round(math.cos(math.atan(15/distance_sourceToDetector)),4)
-        sdef_mod.append("SI2  -1   "+str(mu)+"   1\n")
-        sdef_mod.append("SP2  0    "+str(1+mu)+"  "+str(1-mu)+"\n")
-        sdef_mod.append("SB2  0    1     99\n")
+        source_pos, source_strength = sample_source4(E_bins, rng)
+        sdef, sdef_mod, mu = source4_cards(source_pos, source_strength, E_bins)
+        sdef_list.append(sdef)
         source_text = ''
     elif which_source == 5:
         for E in E_bins:
@@ -226,6 +238,375 @@ def define_which_source(which_source,E_bins,sdef_list):
 
     return source_text, sdef_mod, source_strength
             
+def sample_source4(E_bins,rng=random):
+    # This function draws the random parts of source 4: the position of the 
+    #  point source (each coordinate between 30 and 100 cm, rounded to 1 mm)
+    #  and the strength of each energy bin (normalized to sum to 1, rounded to
+    #  3 decimals). rng can be the random module or anything with the same 
+    #  uniform() and random() methods (eg. a numpy Generator).
+    # It returns (source_pos, source_strength).
+    source_pos = [round(rng.uniform(30,100),1), round(rng.uniform(30,100),1), round(rng.uniform(30,100),1)]
+    random_source_strength = [rng.random() for _ in range(len(E_bins))]
+    total_strength = sum(random_source_strength)
+    source_strength = [round(strength/total_strength,3) for strength in random_source_strength]
+    return source_pos, source_strength
+
+def source4_cards(source_pos,source_strength,E_bins):
+    # This function writes the source 4 cards for a source position and 
+    #  spectrum from sample_source4(). It returns the SDEF line, the list of
+    #  lines for the SI/SP/SB cards (sdef_mod) and the cosine of the cone 
+    #  (mu) that the neutrons are emitted in.
+    # Define the direction modification so that the neutrons are emitted in a cone at the PNS
+    distance_sourceToDetector = math.sqrt(source_pos[0]**2+source_pos[1]**2+source_pos[2]**2)
+    mu = round(math.cos(math.atan(15/distance_sourceToDetector)),4)
+    sdef, sdef_mod = source4_card_batch(np.array([source_pos]), np.array([source_strength]),
+                                        np.array([mu]), E_bins)[0]
+    return sdef, sdef_mod, mu
+
+def sample_source4_batch(num_decks,E_bins,rng=None):
+    # This function draws the random parts of source 4 for num_decks decks at
+    #  once with numpy instead of one number at a time. It returns three 
+    #  arrays (see source4_from_draws()):
+        # positions - shape (num_decks, 3), each coordinate 30 to 100 cm
+        # strengths - shape (num_decks, number of energy bins), each row sums
+        #  to 1
+        # mu - shape (num_decks,), cosine of the cone aimed at the PNS
+    # rng is a numpy Generator (a new unseeded one if it is None).
+    if rng is None:
+        rng = np.random.default_rng()
+    position_draws = rng.uniform(30,100,(num_decks,3))
+    strength_draws = rng.random((num_decks,len(E_bins)))
+    return source4_from_draws(position_draws, strength_draws)
+
+def source4_from_draws(position_draws,strength_draws):
+    # This function turns uniform random numbers into source 4 positions,
+    #  spectra and cone cosines, rounded the same way as sample_source4() and
+    #  source4_cards(). position_draws are the (decks, 3) raw positions in cm
+    #  and strength_draws are the (decks, energy bins) raw strengths.
+    positions = np.round(position_draws,1)
+    strengths = np.round(strength_draws/strength_draws.sum(axis=1,keepdims=True),3)
+    distance_sourceToDetector = np.sqrt((positions**2).sum(axis=1))
+    mu = np.round(np.cos(np.arctan(15/distance_sourceToDetector)),4)
+    return positions, strengths, mu
+
+def format_strengths(strengths):
+    # This function formats an array of source strengths the same way 
+    #  "{:.3}".format() does (3 significant figures, and a whole number like 0
+    #  gets ".0" added to it) for the whole array at once.
+    words = np.char.mod('%.3g', strengths)
+    whole = (np.char.find(words,'.') < 0) & (np.char.find(words,'e') < 0)
+    return np.where(whole, np.char.add(words,'.0'), words)
+
+def distribution_lines(label,cells):
+    # This function splits the entries of an SI or SP card into lines of 10
+    #  entries, with "&" at the end of every full line so MCNP continues the
+    #  card on the next line. cells is a list of already formatted entries 
+    #  (each starting with its spacing).
+    num_full = len(cells) - len(cells)%10
+    lines = ["".join(cells[k:k+10]) + "&\n" for k in range(0,num_full,10)]
+    lines.append("".join(cells[num_full:]) + "\n")
+    lines[0] = label + lines[0]
+    return lines
+
+def source4_card_batch(positions,strengths,mu,E_bins):
+    # This function writes the source 4 cards for many decks at once from the
+    #  arrays that sample_source4_batch() returns. The numbers are formatted
+    #  for every deck at once with numpy, the output is the same text that 
+    #  source4_cards() has always written.
+    # It returns a list with (SDEF line, sdef_mod) for each deck.
+    SI1_lines = distribution_lines("SI1 L", np.char.add("    ", np.char.mod('%.2e', np.asarray(E_bins,dtype=float))).tolist())
+    SP1_cells = np.char.add("    ", format_strengths(strengths)).tolist()
+    pos = positions.astype(str).tolist()
+    mu_text = mu.astype(str).tolist()
+    plus_text = (1+mu).astype(str).tolist()
+    minus_text = (1-mu).astype(str).tolist()
+    cards = []
+    for i in range(len(pos)):
+        x, y, z = pos[i]
+        sdef = "SDEF   POS="+x+" "+y+" "+z+" ERG=d1 PAR=N  VEC=-"+x+" -"+y+" -"+z+"  DIR=d2\n"
+        sdef_mod = (SI1_lines + distribution_lines("SP1 D", SP1_cells[i])
+                    + ["SI2  -1   "+mu_text[i]+"   1\n",
+                       "SP2  0    "+plus_text[i]+"  "+minus_text[i]+"\n",
+                       "SB2  0    1     99\n"])
+        cards.append((sdef, sdef_mod))
+    return cards
+
+def deck_rng(master_seed,deck_index):
+    # This function returns the random number generator for one deck of a 
+    #  random spectrum campaign. Every deck gets its own stream that only 
+    #  depends on the master seed and the deck's index, so a deck can be made
+    #  again on its own and the campaign comes out the same no matter how many
+    #  processes make it.
+    return np.random.default_rng(np.random.SeedSequence(master_seed, spawn_key=(deck_index,)))
+
+def spectrum_deck_name(deck_index):
+    # This function returns the file name of a random spectrum deck (the 
+    #  first deck is Run1_rand_energy).
+    return "Run" + str(deck_index+1) + "_rand_energy"
+
+def write_spectrum_decks(job):
+    # This function is what each worker in write_spectrum_campaign() runs. It
+    #  makes the decks with the indices in job (see write_deck_atomic()) and
+    #  returns a journal entry for each of them with the deck's manifest row 
+    #  and the sha256 of the file.
+    # The random numbers of each deck come from its own stream, but they are
+    #  turned into sources and cards for the whole chunk at once.
+    run_path, deck_indices, Ebins, nps, detector_material, master_seed, shared, ctme = job
+    rngs = [deck_rng(master_seed, deck_index) for deck_index in deck_indices]
+    position_draws = np.array([rng.uniform(30,100,3) for rng in rngs]).reshape(-1,3)
+    strength_draws = np.array([rng.random(len(Ebins)) for rng in rngs]).reshape(-1,len(Ebins))
+    positions, strengths, mu = source4_from_draws(position_draws, strength_draws)
+    cards = source4_card_batch(positions, strengths, mu, Ebins)
+    entries = []
+    for n, deck_index in enumerate(deck_indices):
+        sdef, sdef_mod = cards[n]
+        deck_text = render_PNS_deck(0,sdef,sdef_mod,nps,detector_material,4,shared,ctme)
+        deck_name = spectrum_deck_name(deck_index)
+        sha256 = write_deck_atomic(os.path.join(run_path, deck_name), deck_text)
+        row = [deck_name, deck_index] + positions[n].tolist() + [mu[n].item()] + strengths[n].tolist()
+        entries.append({'index': deck_index, 'sha256': sha256, 'row': row})
+    return entries
+
+def deck_bytes(deck_text):
+    # This function returns the bytes that writing deck_text to a file in text
+    #  mode would put in the file (on Windows, every "\n" becomes "\r\n").
+    return deck_text.replace("\n", os.linesep).encode()
+
+def write_deck_atomic(filename,deck_text):
+    # This function writes an input deck so that the file is either the whole
+    #  deck or not there at all. The deck is written to filename + ".tmp" and
+    #  only renamed to filename once all of it is on the disk, so a crash 
+    #  can't leave half of a deck behind. An existing deck with the same name
+    #  is replaced.
+    # It returns the sha256 of the file, which goes in the campaign journal.
+    data = deck_bytes(deck_text)
+    temp_name = filename + ".tmp"
+    with open(temp_name, "wb") as PNS_model:
+        PNS_model.write(data)
+        PNS_model.flush()
+        os.fsync(PNS_model.fileno())
+    os.replace(temp_name, filename)
+    return hashlib.sha256(data).hexdigest()
+
+def file_sha256(filename):
+    # This function returns the sha256 of a file, or None if it doesn't exist.
+    sha256 = hashlib.sha256()
+    try:
+        with open(filename, "rb") as f:
+            for block in iter(lambda: f.read(1 << 20), b""):
+                sha256.update(block)
+    except FileNotFoundError:
+        return None
+    return sha256.hexdigest()
+
+# Every run directory has this file with the sha256 of each deck (and shared
+#  card file) in it, see write_deck_hashes().
+deck_hash_manifest_name = "deck_hashes.json"
+
+def store_decks(run_path,decks):
+    # This function writes decks ({file name: deck text}) to the run directory,
+    #  but only the ones whose text is different from the file that is already
+    #  there (or that aren't there yet). When a run directory is made again 
+    #  after one parameter changed, only the decks it affects are rewritten.
+    # It returns ({file name: sha256}, [file names that were written]).
+    hashes = {}
+    changed = []
+    for name, deck_text in decks.items():
+        sha256 = hashlib.sha256(deck_bytes(deck_text)).hexdigest()
+        filename = os.path.join(run_path, name)
+        if file_sha256(filename) != sha256:
+            write_deck_atomic(filename, deck_text)
+            changed.append(name)
+        hashes[name] = sha256
+    return hashes, changed
+
+def load_deck_hashes(run_path):
+    # This function reads the deck hash manifest of a run directory. It returns
+    #  {} if there isn't one.
+    filename = os.path.join(run_path, deck_hash_manifest_name)
+    if not os.path.exists(filename):
+        return {}
+    with open(filename, "r") as manifest:
+        return json.load(manifest)
+
+def write_deck_hashes(run_path,hashes,changed,rerun):
+    # This function writes the deck hash manifest of a run directory. It has
+        # decks: {file name: sha256} of every deck and shared card file
+        # changed: the files that were written the last time the run directory
+        #  was made or updated
+        # rerun: the decks that have to be run (again) because of that. If a
+        #  shared card file changed, this is every deck that reads it.
+    # Syncing and submission use this to only send and run what is new.
+    manifest = {'decks': hashes, 'changed': sorted(changed), 'rerun': sorted(rerun)}
+    write_deck_atomic(os.path.join(run_path, deck_hash_manifest_name),
+                      json.dumps(manifest, indent=1) + "\n")
+
+def sync_run_dir(run_path,destination):
+    # This function copies a run directory to destination (eg. the transfer 
+    #  directory for Quartz). If destination is already a copy of an older 
+    #  version of the run directory, only the files that are different are 
+    #  copied. Decks are compared with the deck hash manifests of the two 
+    #  directories, so they don't have to be read again. It returns the list 
+    #  of files that were copied.
+    if not os.path.isdir(destination):
+        shutil.copytree(run_path, destination)
+        return sorted(os.listdir(run_path))
+    old_hashes = load_deck_hashes(destination).get('decks', {})
+    new_hashes = load_deck_hashes(run_path).get('decks', {})
+    copied = []
+    for name in sorted(os.listdir(run_path)):
+        source = os.path.join(run_path, name)
+        target = os.path.join(destination, name)
+        if os.path.isdir(source):
+            continue
+        if name in new_hashes and os.path.exists(target):
+            if old_hashes.get(name) == new_hashes[name]:
+                continue
+        elif file_sha256(source) == file_sha256(target):
+            continue
+        shutil.copy2(source, target)
+        copied.append(name)
+    return copied
+
+def load_campaign_journal(journal_path):
+    # This function reads the journal of a random spectrum campaign. The 
+    #  journal is a text file with one JSON object per line. The first line 
+    #  has the settings of the campaign and every line after that is a deck 
+    #  that was finished (see write_spectrum_decks()). A line that was only
+    #  partly written when the program crashed is ignored.
+    # It returns (settings, {deck index: entry}). settings is None if there is
+    #  no journal yet.
+    settings = None
+    entries = {}
+    if not os.path.exists(journal_path):
+        return settings, entries
+    with open(journal_path, "r") as journal:
+        for line in journal:
+            try:
+                record = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if 'settings' in record:
+                settings = record['settings']
+            else:
+                entries[record['index']] = record
+    return settings, entries
+
+def write_spectrum_campaign(run_path,num_decks,Ebins,nps,detector_material,
+                            master_seed=None,processes=None,
+                            manifest_name="manifest.csv",
+                            journal_name="campaign_journal.jsonl",
+                            shared=False,ctme=default_ctme):
+    # This function makes num_decks random spectrum (source 4) decks using a
+    #  pool of processes (one per core by default), which is what is needed to
+    #  make the 10^4 to 10^5 decks for a training set.
+    # Each deck has its own random stream made from master_seed (see 
+    #  deck_rng()). If master_seed is None, a new one is drawn. Either way it is
+    #  returned, and it should be written down so the campaign can be made 
+    #  again.
+    # Instead of adding each spectrum to the notes file, the deck name, deck
+    #  index, source position (x, y, z), cone cosine (mu) and the strength of
+    #  each energy bin are saved as one row per deck in a CSV manifest in the
+    #  run directory.
+    # The campaign can be stopped (or crash) at any point and be picked up 
+    #  again by calling this again on the same run directory. Every deck is
+    #  written atomically (see write_deck_atomic()) and added to a journal 
+    #  with its sha256 as soon as its chunk is done. When this is called again,
+    #  the decks in the journal whose files are still there with the same 
+    #  sha256 are skipped and only the rest are made. The master seed and the
+    #  other settings are taken from the journal, and if they don't match the
+    #  ones that were given a ValueError is raised instead of mixing two 
+    #  campaigns. The manifest is written once every deck is done.
+    # If shared is True, the decks read the invariant cards from shared files
+    #  (see write_shared_blocks()).
+    # ctme is the ctme card of every deck (see runtimeModel.plan_deck()).
+    # The deck hash manifest (see write_deck_hashes()) is written at the end,
+    #  with the decks made by this call as the ones that changed.
+    # NOTE: On Windows, this needs to be called from inside an
+    #  "if __name__ == '__main__':" block since the workers are spawned.
+    journal_path = os.path.join(run_path, journal_name)
+    settings, entries = load_campaign_journal(journal_path)
+    if settings is not None:
+        if master_seed is None:
+            master_seed = settings['master_seed']
+        given = {'master_seed': master_seed, 'num_decks': num_decks, 'nps': str(nps),
+                 'detector_material': str(detector_material),
+                 'Ebins': [float(E) for E in Ebins], 'shared': shared, 'ctme': ctme}
+        different = [key for key in given if settings.get(key) != given[key]]
+        if different:
+            raise ValueError(f"{journal_path} is for a campaign with different "
+                             f"{', '.join(different)}. Use a new run directory.")
+    if master_seed is None:
+        master_seed = np.random.SeedSequence().entropy
+    if settings is None:
+        settings = {'master_seed': master_seed, 'num_decks': num_decks, 'nps': str(nps),
+                    'detector_material': str(detector_material),
+                    'Ebins': [float(E) for E in Ebins], 'shared': shared, 'ctme': ctme}
+        with open(journal_path, "w") as journal:
+            journal.write(json.dumps({'settings': settings}) + "\n")
+
+    # Decks from before a crash are only kept if they are whole
+    for filename in os.listdir(run_path):
+        if filename.endswith(".tmp"):
+            os.remove(os.path.join(run_path, filename))
+    todo = [deck_index for deck_index in range(num_decks)
+            if deck_index not in entries
+            or file_sha256(os.path.join(run_path, spectrum_deck_name(deck_index))) != entries[deck_index]['sha256']]
+    hashes, changed = {}, []
+    if shared:
+        hashes, changed = write_shared_blocks(run_path, detector_material, 4)
+    if len(todo) < num_decks:
+        print(f"Resuming campaign: {num_decks - len(todo)} decks are already done, {len(todo)} to go")
+
+    if todo:
+        if processes is None:
+            processes = os.cpu_count() or 1
+        processes = max(1, min(processes, len(todo)))
+        # Small chunks of decks keep every worker busy until the end and don't
+        #  lose much work if the campaign is stopped
+        chunk_size = max(1, min(1000, len(todo) // (4*processes)))
+        jobs = [(run_path, todo[start:start + chunk_size], Ebins, nps,
+                 detector_material, master_seed, shared, ctme)
+                for start in range(0, len(todo), chunk_size)]
+        with open(journal_path, "rb+") as journal:
+            # A line that was cut off by a crash is ended so the next entry 
+            #  starts on its own line
+            journal.seek(0, os.SEEK_END)
+            if journal.tell() > 0:
+                journal.seek(-1, os.SEEK_END)
+                if journal.read(1) != b"\n":
+                    journal.write(b"\n")
+        with open(journal_path, "a") as journal:
+            if processes == 1:
+                chunks = map(write_spectrum_decks, jobs)
+                pool = None
+            else:
+                pool = multiprocessing.Pool(processes)
+                chunks = pool.imap_unordered(write_spectrum_decks, jobs)
+            try:
+                for chunk in chunks:
+                    for entry in chunk:
+                        journal.write(json.dumps(entry) + "\n")
+                        entries[entry['index']] = entry
+                    journal.flush()
+            finally:
+                if pool is not None:
+                    pool.terminate()
+
+    with open(os.path.join(run_path, manifest_name), "w", newline='') as manifest:
+        writer = csv.writer(manifest)
+        writer.writerow(["deck", "deck_index", "x", "y", "z", "mu"] + ["{:.2e}".format(E) for E in Ebins])
+        for deck_index in range(num_decks):
+            writer.writerow(entries[deck_index]['row'])
+    rerun = [spectrum_deck_name(deck_index) for deck_index in todo]
+    if changed:
+        rerun = [spectrum_deck_name(deck_index) for deck_index in range(num_decks)]
+    hashes.update((spectrum_deck_name(deck_index), entries[deck_index]['sha256'])
+                  for deck_index in range(num_decks))
+    write_deck_hashes(run_path, hashes, changed + [spectrum_deck_name(deck_index) for deck_index in todo],
+                      rerun)
+    return master_seed
+
 def initialize_PNS_deck(run_path,filename,Ebin):
     # This function makes a new file for each input deck. It also writes the
     #  first line of the input deck.
@@ -242,9 +623,85 @@ def initialize_PNS_deck(run_path,filename,Ebin):
         # Ebin - This variable is a list of doubles and is defined in the file
         #  automatePNS.py. It contains each of the 84 energy bins.
     PNS_model = open(run_path + filename,"x")
-    PNS_model.write("MCNP6 model of the LLNL PNS sphere ("+ str(Ebin)+ " MeV)\n")
+    PNS_model.write(render_title(Ebin))
     PNS_model.close()
     
+def render_title(Ebin):
+    # This function returns the first line of an input deck (the title).
+    return "MCNP6 model of the LLNL PNS sphere ("+ str(Ebin)+ " MeV)\n"
+
+# The cell, surface, material and tally cards are the same in every input deck
+#  of a run, so they are only built once and kept here. The key is 
+#  (detector material, which_source) and the value is a dictionary with the
+#  text of each of the four cards.
+invariant_block_cache = {}
+
+# These are the names of the files the invariant cards are written to when 
+#  the decks of a run share them (see write_shared_blocks()). The blank line 
+#  that ends the cell and surface cards stays in each deck, since MCNP doesn't
+#  allow the blank line delimiters inside a file that is read in.
+shared_block_files = {'cells': 'PNS_cells.inc', 'surfaces': 'PNS_surfaces.inc',
+                      'materials': 'PNS_materials.inc', 'tallies': 'PNS_tallies.inc'}
+
+def render_invariant_cards(detectorMaterial,which_source):
+    # This function returns the cards that don't change between the input 
+    #  decks of a run as a dictionary with the keys 'cells', 'surfaces', 
+    #  'materials' and 'tallies'. The cell and surface cards don't have their
+    #  blank line at the end. They are built the first time they are asked for
+    #  and taken from invariant_block_cache after that.
+    key = (str(detectorMaterial), which_source)
+    if key not in invariant_block_cache:
+        invariant_block_cache[key] = {
+            'cells': render_cell_card(detectorMaterial)[:-1],
+            'surfaces': render_surf_card(which_source)[:-1],
+            'materials': render_material_card(),
+            'tallies': render_tally_card()}
+    return invariant_block_cache[key]
+
+def render_invariant_blocks(detectorMaterial,which_source,shared=False):
+    # This function returns the text that goes before the source card (the 
+    #  cell, surface and material cards) and the text that goes after it (the
+    #  tally card). If shared is True, the cards are replaced by READ cards 
+    #  for the files made by write_shared_blocks().
+    if shared:
+        cards = {name: "READ FILE=" + filename + "\n"
+                 for name, filename in shared_block_files.items()}
+    else:
+        cards = render_invariant_cards(detectorMaterial, which_source)
+    before_source = cards['cells'] + "\n" + cards['surfaces'] + "\n" + cards['materials']
+    return before_source, cards['tallies']
+
+def write_shared_blocks(run_path,detectorMaterial,which_source):
+    # This function writes the invariant cards to the files in 
+    #  shared_block_files in the run directory, so decks made with 
+    #  shared=True only have to have the title, source and print cards. For a
+    #  campaign of thousands of decks this makes the decks about 100 times 
+    #  smaller to write and to send to Quartz. The decks have to be run from
+    #  the run directory (which the sbatch files do with #SBATCH -D).
+    # Only the files that changed are rewritten (see store_decks()), and 
+    #  (hashes, changed) is returned.
+    cards = render_invariant_cards(detectorMaterial, which_source)
+    return store_decks(run_path, {filename: cards[name]
+                                  for name, filename in shared_block_files.items()})
+
+def render_PNS_deck(Ebin,sdef,sdef_mod,nps,detectorMaterial,which_source,shared=False,
+                    ctme=default_ctme):
+    # This function returns the whole text of one input deck. Only the title,
+    #  source card and print card are made for each deck, the rest comes from
+    #  render_invariant_blocks() (either the cards themselves or, if shared is
+    #  True, READ cards for the shared files).
+    before_source, after_source = render_invariant_blocks(detectorMaterial, which_source, shared)
+    return (render_title(Ebin) + before_source + render_source_card(sdef, sdef_mod)
+            + after_source + render_print_card(nps,ctme))
+
+def write_PNS_deck(run_path,filename,deck_text):
+    # This function makes the file for an input deck and writes the text from
+    #  render_PNS_deck() to it in one write, instead of opening the file once
+    #  for each card.
+    PNS_model = open(run_path + filename,"x")
+    PNS_model.write(deck_text)
+    PNS_model.close()
+
 def TRCL(new_cell_num, like_cell_num, x_shift, y_shift, z_shift):
     # There are a lot of TRCLs in the input deck and this function just makes 
     #  it easy to call this instead of writing out each TRCL.
@@ -253,429 +710,136 @@ def TRCL(new_cell_num, like_cell_num, x_shift, y_shift, z_shift):
 def write_cell_card(run_path,filename):
     # This function writes all of the cell cards. It uses the two variables
     #  'run_path' and 'filename' to be able to open the input deck file and 
-    #  append each line. 
-    imp1 = "imp:n=1 imp:a=1 imp:p=1 imp:e=1"
-    imp3 = "imp:n=3 imp:a=3 imp:p=3 imp:e=3"
+    #  append the text from render_cell_card().
+    detectorMaterial = ask_detector_material()
     PNS_model = open(run_path + filename,"a")
-    PNS_model.write("C    **************CELL CARD**************\n")
-    PNS_model.write("C    -------MOIST AIR AROUND SPHERE-------\n")
-    PNS_model.write("801    1 -1.29E-3 -800 20000 20100 20200 20300 #2000 #2001 #2002 #2003 #2004 &\n     " + imp1 + "\n")
-    PNS_model.write("C    ---------SPHERE AND CYLINDER---------\n")
-    PNS_model.write("C    Poly sphere (outside of cylinder and holes)\n")
-    PNS_model.write("10000 20 -0.93  -20000 20100 20200 20300 #2000 "+ imp1+ "\n")
-    PNS_model.write("C    X-axis cylinder\n")
-    PNS_model.write("10100 20 -0.93  -20100 21000 21100 21200 21300 21400 21500 21600 21700 21800 &\n     21900 22000 22100 22200 22300 22400 22500 22600 22700 22800 &\n     "+ imp1+ "\n")
-    PNS_model.write("C    Y-axis cylinder\n")
-    PNS_model.write("10200 20 -0.93  -20200 20100 23000 23100 23200 23300 23400 23500 23600 23700 &\n     23800 23900 24000 24100 24200 24300 24400 24500 24600 24700 &\n     "+ imp1+ "\n")
-    PNS_model.write("C    Z-axis cylinder\n")
-    PNS_model.write("10300 20 -0.93  -20300 20100 20200 25000 25100 25200 25300 25400 25500 25600 &\n     25700 25800 25900 26000 26100 26200 26300 26400 26500 26600 26700 &\n     "+ imp1+ "\n")
-    PNS_model.write("C    ---------HOLES IN CYLINDER---------\n")
-    PNS_model.write("C             (Filled with air)         \n")
-    PNS_model.write("C    X-axis holes\n")
-    PNS_model.write("11000 1 -1.2E-3 (-21000:-21100:-21200:-21300:-21400:-21500:-21600:-21700:-21800:-21900:\n"
-                    "        -22000:-22100:-22200:-22300:-22400:-22500:-22600:-22700:-22800)-20100 #200 #201\n"
-                    "        #202 #203 #204 #205 #206 #207 #208 #209 #210 #211 #212 #213 #214 #215 #216 #217\n"
-                    "        #218 #400 #401 #402 #403 #404 #405 #406 #407 #408 #409 #410 #411 #412 #413 #414\n"
-                    "        #415 #416 #417 #418 #300 #301 #302 #303 #304 #305 #306 #307 #308 #309 #310 #311\n"
-                    "        #312 #313 #314 #315 #316 #317 #318 #500 #501 #502 #503 #504 #505 #506 #507 #508\n"
-                    "        #509 #510 #511 #512 #513 #514 #515 #516 #517 #518 #600 #601 #602 #603 #604 #605\n"
-                    "        #606 #607 #608 #609 #610 #611 #612 #613 #614 #615 #616 #617 #618 #700 #701 #702\n"
-                    "        #703 #704 #705 #706 #707 #708 #709 #710 #711 #712 #713 #714 #715 #716 #717 #718\n"
-                    "        "+ imp1+ "\n")
-    PNS_model.write("C    Y-axis holes\n")
-    PNS_model.write("11100 1 -1.2E-3 (-23000:-23100:-23200:-23300:-23400:-23500:-23600:-23700:-23800:-23900:\n"
-                    "        -24000:-24100:-24200:-24300:-24400:-24500:-24600:-24700) -20200 #219 #220 #221\n"
-                    "        #222 #223 #224 #225 #226 #227 #228 #229 #230 #231 #232 #233 #234 #235 #236 #419\n"
-                    "        #420 #421 #422 #423 #424 #425 #426 #427 #428 #429 #430 #431 #432 #433 #434 #435\n"
-                    "        #436 #319 #320 #321 #322 #323 #324 #325 #326 #327 #328 #329 #330 #331 #332 #333\n"
-                    "        #334 #335 #336 #519 #520 #521 #522 #523 #524 #525 #526 #527 #528 #529 #530 #531\n"
-                    "        #532 #533 #534 #535 #536 #619 #620 #621 #622 #623 #624 #625 #626 #627 #628 #629\n"
-                    "        #630 #631 #632 #633 #634 #635 #636 #719 #720 #721 #722 #723 #724 #725 #726 #727\n"
-                    "        #728 #729 #730 #731 #732 #733 #734 #735 #736 "+ imp1+ "\n")
-    PNS_model.write("C    Z-axis holes\n")
-    PNS_model.write("11200 1 -1.2E-3 (-25000:-25100:-25200:-25300:-25400:-25500:-25600:-25700:-25800:-25900:\n"
-                    "        -26000:-26100:-26200:-26300:-26400:-26500:-26600:-26700)-20300 #237 #238 #239 #240\n"
-                    "        #241 #242 #243 #244 #245 #246 #247 #248 #249 #250 #251 #252 #253 #254 #437 #438 #439\n"
-                    "        #440 #441 #442 #443 #444 #445 #446 #447 #448 #449 #450 #451 #452 #453 #454 #337\n"
-                    "        #338 #339 #340 #341 #342 #343 #344 #345 #346 #347 #348 #349 #350 #351 #352 #353\n"
-                    "        #354 #537 #538 #539 #540 #541 #542 #543 #544 #545 #546 #547 #548 #549 #550 #551\n"
-                    "        #552 #553 #554 #637 #638 #639 #640 #641 #642 #643 #644 #645 #646 #647 #648 #649\n"
-                    "        #650 #651 #652 #653 #654 #737 #738 #739 #740 #741 #742 #743 #744 #745 #746 #747\n"
-                    "        #748 #749 #750 #751 #752 #753 #754 "+ imp1+ "\n")
-    PNS_model.write("C    --------TLD MATERIAL (A-SIDE)------\n")
-    PNS_model.write("C    X-axis front casing of Li-6\n")
-    PNS_model.write("200 24 -1.42 -200 "+ imp1+ "\n")
-    PNS_model.write(TRCL(201, 200, 3, 0, 0))
-    PNS_model.write(TRCL(202, 200, -3, 0, 0))
-    PNS_model.write(TRCL(203, 200, 6, 0, 0))
-    PNS_model.write(TRCL(204, 200, -5.8, 0, 0))
-    PNS_model.write(TRCL(205, 200, 8, 0, 0))
-    PNS_model.write(TRCL(206, 200, -7.8, 0, 0))
-    PNS_model.write(TRCL(207, 200, 9, 0, 0))
-    PNS_model.write(TRCL(208, 200, -8.8, 0, 0))
-    PNS_model.write(TRCL(209, 200, 10, 0, 0))
-    PNS_model.write(TRCL(210, 200, -10, 0, 0))
-    PNS_model.write(TRCL(211, 200, 11, 0, 0))
-    PNS_model.write(TRCL(212, 200, -11, 0, 0))
-    PNS_model.write(TRCL(213, 200, 12, 0, 0))
-    PNS_model.write(TRCL(214, 200, -12, 0, 0))
-    PNS_model.write(TRCL(215, 200, 13, 0, 0))
-    PNS_model.write(TRCL(216, 200, -13, 0, 0))
-    PNS_model.write(TRCL(217, 200, 14, 0, 0))
-    PNS_model.write(TRCL(218, 200, -14, 0, 0))
-    PNS_model.write("C    Y-axis front casing of Li-6\n")
-    PNS_model.write("219 24 -1.42 -201 TRCL= (0 3 0) "+ imp1+ "\n")
-    PNS_model.write("220 24 -1.42 -202 TRCL= (0 -3 0) "+ imp1+ "\n")
-    PNS_model.write("221 24 -1.42 -201 TRCL= (0 6 0) "+ imp1+ "\n")
-    PNS_model.write("222 24 -1.42 -202 TRCL= (0 -5.8 0) "+ imp1+ "\n")
-    PNS_model.write("223 24 -1.42 -201 TRCL= (0 8 0) "+ imp1+ "\n")
-    PNS_model.write("224 24 -1.42 -202 TRCL= (0 -7.8 0) "+ imp1+ "\n")
-    PNS_model.write("225 24 -1.42 -201 TRCL= (0 9 0) "+ imp1+ "\n")
-    PNS_model.write("226 24 -1.42 -202 TRCL= (0 -8.8 0) "+ imp1+ "\n")
-    PNS_model.write("227 24 -1.42 -201 TRCL= (0 10 0) "+ imp1+ "\n")
-    PNS_model.write("228 24 -1.42 -202 TRCL= (0 -10 0) "+ imp1+ "\n")
-    PNS_model.write("229 24 -1.42 -201 TRCL= (0 11 0) "+ imp1+ "\n")
-    PNS_model.write("230 24 -1.42 -202 TRCL= (0 -11 0) "+ imp1+ "\n")
-    PNS_model.write("231 24 -1.42 -201 TRCL= (0 12 0) "+ imp1+ "\n")
-    PNS_model.write("232 24 -1.42 -202 TRCL= (0 -12 0) "+ imp1+ "\n")
-    PNS_model.write("233 24 -1.42 -201 TRCL= (0 13 0) "+ imp1+ "\n")
-    PNS_model.write("234 24 -1.42 -202 TRCL= (0 -13 0) "+ imp1+ "\n")
-    PNS_model.write("235 24 -1.42 -201 TRCL= (0 14 0) "+ imp1+ "\n")
-    PNS_model.write("236 24 -1.42 -202 TRCL= (0 -14 0) "+ imp1+ "\n")
-    PNS_model.write("C    Z-axis front casing of Li-6\n")
-    PNS_model.write("237 24 -1.42 -203 TRCL= (-1 0 3) "+ imp1+ "\n")
-    PNS_model.write("238 24 -1.42 -204 TRCL= (-1 0 -3) "+ imp1+ "\n")
-    PNS_model.write("239 24 -1.42 -203 TRCL= (-1 0 6) "+ imp1+ "\n")
-    PNS_model.write("240 24 -1.42 -204 TRCL= (-1 0 -5.8) "+ imp1+ "\n")
-    PNS_model.write("241 24 -1.42 -203 TRCL= (-1 0 8) "+ imp1+ "\n")
-    PNS_model.write("242 24 -1.42 -204 TRCL= (-1 0 -7.8) "+ imp1+ "\n")
-    PNS_model.write("243 24 -1.42 -203 TRCL= (-1 0 9) "+ imp1+ "\n")
-    PNS_model.write("244 24 -1.42 -204 TRCL= (-1 0 -8.8) "+ imp1+ "\n")
-    PNS_model.write("245 24 -1.42 -203 TRCL= (-1 0 10) "+ imp1+ "\n")
-    PNS_model.write("246 24 -1.42 -204 TRCL= (-1 0 -10) "+ imp1+ "\n")
-    PNS_model.write("247 24 -1.42 -203 TRCL= (-1 0 11) "+ imp1+ "\n")
-    PNS_model.write("248 24 -1.42 -204 TRCL= (-1 0 -11) "+ imp1+ "\n")
-    PNS_model.write("249 24 -1.42 -203 TRCL= (-1 0 12) "+ imp1+ "\n")
-    PNS_model.write("250 24 -1.42 -204 TRCL= (-1 0 -12) "+ imp1+ "\n")
-    PNS_model.write("251 24 -1.42 -203 TRCL= (-1 0 13) "+ imp1+ "\n")
-    PNS_model.write("252 24 -1.42 -204 TRCL= (-1 0 -13) "+ imp1+ "\n")
-    PNS_model.write("253 24 -1.42 -203 TRCL= (-1 0 14) "+ imp1+ "\n")
-    PNS_model.write("254 24 -1.42 -204 TRCL= (-1 0 -14) "+ imp1+ "\n")
+    PNS_model.write(render_cell_card(detectorMaterial))
+    PNS_model.close()
+
+def ask_detector_material():
+    # This function asks which material to use for the detector (Li-6) cells.
     print('Detector material options: 22=>Li6, 2=>Au')
-    detectorMaterial = input('Which material for detector? ')
-    PNS_model.write("C    X-axis Li-6\n")
-    PNS_model.write("400 "+ detectorMaterial + " -2.635 -400 "+ imp3+ "\n")
-    PNS_model.write(TRCL(401, 400, 3, 0, 0))
-    PNS_model.write(TRCL(402, 400, -3, 0, 0))
-    PNS_model.write(TRCL(403, 400, 6, 0, 0))
-    PNS_model.write(TRCL(404, 400, -5.8, 0, 0))
-    PNS_model.write(TRCL(405, 400, 8, 0, 0))
-    PNS_model.write(TRCL(406, 400, -7.8, 0, 0))
-    PNS_model.write(TRCL(407, 400, 9, 0, 0))
-    PNS_model.write(TRCL(408, 400, -8.8, 0, 0))
-    PNS_model.write(TRCL(409, 400, 10, 0, 0))
-    PNS_model.write(TRCL(410, 400, -10, 0, 0))
-    PNS_model.write(TRCL(411, 400, 11, 0, 0))
-    PNS_model.write(TRCL(412, 400, -11, 0, 0))
-    PNS_model.write(TRCL(413, 400, 12, 0, 0))
-    PNS_model.write(TRCL(414, 400, -12, 0, 0))
-    PNS_model.write(TRCL(415, 400, 13, 0, 0))
-    PNS_model.write(TRCL(416, 400, -13, 0, 0))
-    PNS_model.write(TRCL(417, 400, 14, 0, 0))
-    PNS_model.write(TRCL(418, 400, -14, 0, 0))
-    PNS_model.write("C    Y-axis Li-6\n")
-    PNS_model.write("419 "+ detectorMaterial + " -2.635 -401 TRCL= (0 3 0) "+ imp3+ "\n")
-    PNS_model.write("420 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -3 0) "+ imp3+ "\n")
-    PNS_model.write("421 "+ detectorMaterial + " -2.635 -401 TRCL= (0 6 0) "+ imp3+ "\n")
-    PNS_model.write("422 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -5.8 0) "+ imp3+ "\n")
-    PNS_model.write("423 "+ detectorMaterial + " -2.635 -401 TRCL= (0 8 0) "+ imp3+ "\n")
-    PNS_model.write("424 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -7.8 0) "+ imp3+ "\n")
-    PNS_model.write("425 "+ detectorMaterial + " -2.635 -401 TRCL= (0 9 0) "+ imp3+ "\n")
-    PNS_model.write("426 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -8.8 0) "+ imp3+ "\n")
-    PNS_model.write("427 "+ detectorMaterial + " -2.635 -401 TRCL= (0 10 0) "+ imp3+ "\n")
-    PNS_model.write("428 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -10 0) "+ imp3+ "\n")
-    PNS_model.write("429 "+ detectorMaterial + " -2.635 -401 TRCL= (0 11 0) "+ imp3+ "\n")
-    PNS_model.write("430 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -11 0) "+ imp3+ "\n")
-    PNS_model.write("431 "+ detectorMaterial + " -2.635 -401 TRCL= (0 12 0) "+ imp3+ "\n")
-    PNS_model.write("432 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -12 0) "+ imp3+ "\n")
-    PNS_model.write("433 "+ detectorMaterial + " -2.635 -401 TRCL= (0 13 0) "+ imp3+ "\n")
-    PNS_model.write("434 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -13 0) "+ imp3+ "\n")
-    PNS_model.write("435 "+ detectorMaterial + " -2.635 -401 TRCL= (0 14 0) "+ imp3+ "\n")
-    PNS_model.write("436 "+ detectorMaterial + " -2.635 -402 TRCL= (0 -14 0) "+ imp3+ "\n")
-    PNS_model.write("C    Z-axis Li-6\n")
-    PNS_model.write("437 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 3) "+ imp3+ "\n")
-    PNS_model.write("438 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -3) "+ imp3+ "\n")
-    PNS_model.write("439 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 6) "+ imp3+ "\n")
-    PNS_model.write("440 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -5.8) "+ imp3+ "\n")
-    PNS_model.write("441 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 8) "+ imp3+ "\n")
-    PNS_model.write("442 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -7.8) "+ imp3+ "\n")
-    PNS_model.write("443 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 9) "+ imp3+ "\n")
-    PNS_model.write("444 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -8.8) "+ imp3+ "\n")
-    PNS_model.write("445 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 10) "+ imp3+ "\n")
-    PNS_model.write("446 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -10) "+ imp3+ "\n")
-    PNS_model.write("447 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 11) "+ imp3+ "\n")
-    PNS_model.write("448 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -11) "+ imp3+ "\n")
-    PNS_model.write("449 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 12) "+ imp3+ "\n")
-    PNS_model.write("450 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -12) "+ imp3+ "\n")
-    PNS_model.write("451 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 13) "+ imp3+ "\n")
-    PNS_model.write("452 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -13) "+ imp3+ "\n")
-    PNS_model.write("453 "+ detectorMaterial + " -2.635 -403 TRCL= (-1 0 14) "+ imp3+ "\n")
-    PNS_model.write("454 "+ detectorMaterial + " -2.635 -404 TRCL= (-1 0 -14) "+ imp3+ "\n")
-    PNS_model.write("C    X-axis back casing of Li-6\n")
-    PNS_model.write("300 24 -1.42 -300 "+ imp1+ "\n")
-    PNS_model.write(TRCL(301, 300, 3, 0, 0))
-    PNS_model.write(TRCL(302, 300, -3, 0, 0))
-    PNS_model.write(TRCL(303, 300, 6, 0, 0))
-    PNS_model.write(TRCL(304, 300, -5.8, 0, 0))
-    PNS_model.write(TRCL(305, 300, 8, 0, 0))
-    PNS_model.write(TRCL(306, 300, -7.8, 0, 0))
-    PNS_model.write(TRCL(307, 300, 9, 0, 0))
-    PNS_model.write(TRCL(308, 300, -8.8, 0, 0))
-    PNS_model.write(TRCL(309, 300, 10, 0, 0))
-    PNS_model.write(TRCL(310, 300, -10, 0, 0))
-    PNS_model.write(TRCL(311, 300, 11, 0, 0))
-    PNS_model.write(TRCL(312, 300, -11, 0, 0))
-    PNS_model.write(TRCL(313, 300, 12, 0, 0))
-    PNS_model.write(TRCL(314, 300, -12, 0, 0))
-    PNS_model.write(TRCL(315, 300, 13, 0, 0))
-    PNS_model.write(TRCL(316, 300, -13, 0, 0))
-    PNS_model.write(TRCL(317, 300, 14, 0, 0))
-    PNS_model.write(TRCL(318, 300, -14, 0, 0))
-    PNS_model.write("C    Y-axis back casing of Li-6\n")
-    PNS_model.write("319 24 -1.42 -301 TRCL= (0 3 0) "+ imp1+ "\n")
-    PNS_model.write("320 24 -1.42 -302 TRCL= (0 -3 0) "+ imp1+ "\n")
-    PNS_model.write("321 24 -1.42 -301 TRCL= (0 6 0) "+ imp1+ "\n")
-    PNS_model.write("322 24 -1.42 -302 TRCL= (0 -5.8 0) "+ imp1+ "\n")
-    PNS_model.write("323 24 -1.42 -301 TRCL= (0 8 0) "+ imp1+ "\n")
-    PNS_model.write("324 24 -1.42 -302 TRCL= (0 -7.8 0) "+ imp1+ "\n")
-    PNS_model.write("325 24 -1.42 -301 TRCL= (0 9 0) "+ imp1+ "\n")
-    PNS_model.write("326 24 -1.42 -302 TRCL= (0 -8.8 0) "+ imp1+ "\n")
-    PNS_model.write("327 24 -1.42 -301 TRCL= (0 10 0) "+ imp1+ "\n")
-    PNS_model.write("328 24 -1.42 -302 TRCL= (0 -10 0) "+ imp1+ "\n")
-    PNS_model.write("329 24 -1.42 -301 TRCL= (0 11 0) "+ imp1+ "\n")
-    PNS_model.write("330 24 -1.42 -302 TRCL= (0 -11 0) "+ imp1+ "\n")
-    PNS_model.write("331 24 -1.42 -301 TRCL= (0 12 0) "+ imp1+ "\n")
-    PNS_model.write("332 24 -1.42 -302 TRCL= (0 -12 0) "+ imp1+ "\n")
-    PNS_model.write("333 24 -1.42 -301 TRCL= (0 13 0) "+ imp1+ "\n")
-    PNS_model.write("334 24 -1.42 -302 TRCL= (0 -13 0) "+ imp1+ "\n")
-    PNS_model.write("335 24 -1.42 -301 TRCL= (0 14 0) "+ imp1+ "\n")
-    PNS_model.write("336 24 -1.42 -302 TRCL= (0 -14 0) "+ imp1+ "\n")
-    PNS_model.write("C    Z-axis front casing of Li-6\n")
-    PNS_model.write("337 24 -1.42 -303 TRCL= (-1 0 3) "+ imp1+ "\n")
-    PNS_model.write("338 24 -1.42 -304 TRCL= (-1 0 -3) "+ imp1+ "\n")
-    PNS_model.write("339 24 -1.42 -303 TRCL= (-1 0 6) "+ imp1+ "\n")
-    PNS_model.write("340 24 -1.42 -304 TRCL= (-1 0 -5.8) "+ imp1+ "\n")
-    PNS_model.write("341 24 -1.42 -303 TRCL= (-1 0 8) "+ imp1+ "\n")
-    PNS_model.write("342 24 -1.42 -304 TRCL= (-1 0 -7.8) "+ imp1+ "\n")
-    PNS_model.write("343 24 -1.42 -303 TRCL= (-1 0 9) "+ imp1+ "\n")
-    PNS_model.write("344 24 -1.42 -304 TRCL= (-1 0 -8.8) "+ imp1+ "\n")
-    PNS_model.write("345 24 -1.42 -303 TRCL= (-1 0 10) "+ imp1+ "\n")
-    PNS_model.write("346 24 -1.42 -304 TRCL= (-1 0 -10) "+ imp1+ "\n")
-    PNS_model.write("347 24 -1.42 -303 TRCL= (-1 0 11) "+ imp1+ "\n")
-    PNS_model.write("348 24 -1.42 -304 TRCL= (-1 0 -11) "+ imp1+ "\n")
-    PNS_model.write("349 24 -1.42 -303 TRCL= (-1 0 12) "+ imp1+ "\n")
-    PNS_model.write("350 24 -1.42 -304 TRCL= (-1 0 -12) "+ imp1+ "\n")
-    PNS_model.write("351 24 -1.42 -303 TRCL= (-1 0 13) "+ imp1+ "\n")
-    PNS_model.write("352 24 -1.42 -304 TRCL= (-1 0 -13) "+ imp1+ "\n")
-    PNS_model.write("353 24 -1.42 -303 TRCL= (-1 0 14) "+ imp1+ "\n")
-    PNS_model.write("354 24 -1.42 -304 TRCL= (-1 0 -14) "+ imp1+ "\n")
-    PNS_model.write("C    --------TLD MATERIAL (B-SIDE)------\n")
-    PNS_model.write("C    X-axis front casing of Li-7\n")
-    PNS_model.write("500 24 -1.42 -500 "+ imp1+ "\n")
-    PNS_model.write(TRCL(501, 500, 3, 0, 0))
-    PNS_model.write(TRCL(502, 500, -3, 0, 0))
-    PNS_model.write(TRCL(503, 500, 6, 0, 0))
-    PNS_model.write(TRCL(504, 500, -5.8, 0, 0))
-    PNS_model.write(TRCL(505, 500, 8, 0, 0))
-    PNS_model.write(TRCL(506, 500, -7.8, 0, 0))
-    PNS_model.write(TRCL(507, 500, 9, 0, 0))
-    PNS_model.write(TRCL(508, 500, -8.8, 0, 0))
-    PNS_model.write(TRCL(509, 500, 10, 0, 0))
-    PNS_model.write(TRCL(510, 500, -10, 0, 0))
-    PNS_model.write(TRCL(511, 500, 11, 0, 0))
-    PNS_model.write(TRCL(512, 500, -11, 0, 0))
-    PNS_model.write(TRCL(513, 500, 12, 0, 0))
-    PNS_model.write(TRCL(514, 500, -12, 0, 0))
-    PNS_model.write(TRCL(515, 500, 13, 0, 0))
-    PNS_model.write(TRCL(516, 500, -13, 0, 0))
-    PNS_model.write(TRCL(517, 500, 14, 0, 0))
-    PNS_model.write(TRCL(518, 500, -14, 0, 0))
-    PNS_model.write("C    Y-axis front casing of Li-7\n")
-    PNS_model.write("519 24 -1.42 -501 TRCL= (0 3 0) "+ imp1+ "\n")
-    PNS_model.write("520 24 -1.42 -502 TRCL= (0 -3 0) "+ imp1+ "\n")
-    PNS_model.write("521 24 -1.42 -501 TRCL= (0 6 0) "+ imp1+ "\n")
-    PNS_model.write("522 24 -1.42 -502 TRCL= (0 -5.8 0) "+ imp1+ "\n")
-    PNS_model.write("523 24 -1.42 -501 TRCL= (0 8 0) "+ imp1+ "\n")
-    PNS_model.write("524 24 -1.42 -502 TRCL= (0 -7.8 0) "+ imp1+ "\n")
-    PNS_model.write("525 24 -1.42 -501 TRCL= (0 9 0) "+ imp1+ "\n")
-    PNS_model.write("526 24 -1.42 -502 TRCL= (0 -8.8 0) "+ imp1+ "\n")
-    PNS_model.write("527 24 -1.42 -501 TRCL= (0 10 0) "+ imp1+ "\n")
-    PNS_model.write("528 24 -1.42 -502 TRCL= (0 -10 0) "+ imp1+ "\n")
-    PNS_model.write("529 24 -1.42 -501 TRCL= (0 11 0) "+ imp1+ "\n")
-    PNS_model.write("530 24 -1.42 -502 TRCL= (0 -11 0) "+ imp1+ "\n")
-    PNS_model.write("531 24 -1.42 -501 TRCL= (0 12 0) "+ imp1+ "\n")
-    PNS_model.write("532 24 -1.42 -502 TRCL= (0 -12 0) "+ imp1+ "\n")
-    PNS_model.write("533 24 -1.42 -501 TRCL= (0 13 0) "+ imp1+ "\n")
-    PNS_model.write("534 24 -1.42 -502 TRCL= (0 -13 0) "+ imp1+ "\n")
-    PNS_model.write("535 24 -1.42 -501 TRCL= (0 14 0) "+ imp1+ "\n")
-    PNS_model.write("536 24 -1.42 -502 TRCL= (0 -14 0) "+ imp1+ "\n")
-    PNS_model.write("C    Z-axis front casing of Li-7\n")
-    PNS_model.write("537 24 -1.42 -503 TRCL= (-1 0 3) "+ imp1+ "\n")
-    PNS_model.write("538 24 -1.42 -504 TRCL= (-1 0 -3) "+ imp1+ "\n")
-    PNS_model.write("539 24 -1.42 -503 TRCL= (-1 0 6) "+ imp1+ "\n")
-    PNS_model.write("540 24 -1.42 -504 TRCL= (-1 0 -5.8) "+ imp1+ "\n")
-    PNS_model.write("541 24 -1.42 -503 TRCL= (-1 0 8) "+ imp1+ "\n")
-    PNS_model.write("542 24 -1.42 -504 TRCL= (-1 0 -7.8) "+ imp1+ "\n")
-    PNS_model.write("543 24 -1.42 -503 TRCL= (-1 0 9) "+ imp1+ "\n")
-    PNS_model.write("544 24 -1.42 -504 TRCL= (-1 0 -8.8) "+ imp1+ "\n")
-    PNS_model.write("545 24 -1.42 -503 TRCL= (-1 0 10) "+ imp1+ "\n")
-    PNS_model.write("546 24 -1.42 -504 TRCL= (-1 0 -10) "+ imp1+ "\n")
-    PNS_model.write("547 24 -1.42 -503 TRCL= (-1 0 11) "+ imp1+ "\n")
-    PNS_model.write("548 24 -1.42 -504 TRCL= (-1 0 -11) "+ imp1+ "\n")
-    PNS_model.write("549 24 -1.42 -503 TRCL= (-1 0 12) "+ imp1+ "\n")
-    PNS_model.write("550 24 -1.42 -504 TRCL= (-1 0 -12) "+ imp1+ "\n")
-    PNS_model.write("551 24 -1.42 -503 TRCL= (-1 0 13) "+ imp1+ "\n")
-    PNS_model.write("552 24 -1.42 -504 TRCL= (-1 0 -13) "+ imp1+ "\n")
-    PNS_model.write("553 24 -1.42 -503 TRCL= (-1 0 14) "+ imp1+ "\n")
-    PNS_model.write("554 24 -1.42 -504 TRCL= (-1 0 -14) "+ imp1+ "\n")
-    PNS_model.write("C    X-axis Li-7\n")
-    PNS_model.write("600 23 -2.635 -600 "+ imp3+ "\n")
-    PNS_model.write(TRCL(601, 600, 3, 0, 0))
-    PNS_model.write(TRCL(602, 600, -3, 0, 0))
-    PNS_model.write(TRCL(603, 600, 6, 0, 0))
-    PNS_model.write(TRCL(604, 600, -5.8, 0, 0))
-    PNS_model.write(TRCL(605, 600, 8, 0, 0))
-    PNS_model.write(TRCL(606, 600, -7.8, 0, 0))
-    PNS_model.write(TRCL(607, 600, 9, 0, 0))
-    PNS_model.write(TRCL(608, 600, -8.8, 0, 0))
-    PNS_model.write(TRCL(609, 600, 10, 0, 0))
-    PNS_model.write(TRCL(610, 600, -10, 0, 0))
-    PNS_model.write(TRCL(611, 600, 11, 0, 0))
-    PNS_model.write(TRCL(612, 600, -11, 0, 0))
-    PNS_model.write(TRCL(613, 600, 12, 0, 0))
-    PNS_model.write(TRCL(614, 600, -12, 0, 0))
-    PNS_model.write(TRCL(615, 600, 13, 0, 0))
-    PNS_model.write(TRCL(616, 600, -13, 0, 0))
-    PNS_model.write(TRCL(617, 600, 14, 0, 0))
-    PNS_model.write(TRCL(618, 600, -14, 0, 0))
-    PNS_model.write("C    Y-axis Li-7\n")
-    PNS_model.write("619 23 -2.635 -601 TRCL= (0 3 0) "+ imp3+ "\n")
-    PNS_model.write("620 23 -2.635 -602 TRCL= (0 -3 0) "+ imp3+ "\n")
-    PNS_model.write("621 23 -2.635 -601 TRCL= (0 6 0) "+ imp3+ "\n")
-    PNS_model.write("622 23 -2.635 -602 TRCL= (0 -5.8 0) "+ imp3+ "\n")
-    PNS_model.write("623 23 -2.635 -601 TRCL= (0 8 0) "+ imp3+ "\n")
-    PNS_model.write("624 23 -2.635 -602 TRCL= (0 -7.8 0) "+ imp3+ "\n")
-    PNS_model.write("625 23 -2.635 -601 TRCL= (0 9 0) "+ imp3+ "\n")
-    PNS_model.write("626 23 -2.635 -602 TRCL= (0 -8.8 0) "+ imp3+ "\n")
-    PNS_model.write("627 23 -2.635 -601 TRCL= (0 10 0) "+ imp3+ "\n")
-    PNS_model.write("628 23 -2.635 -602 TRCL= (0 -10 0) "+ imp3+ "\n")
-    PNS_model.write("629 23 -2.635 -601 TRCL= (0 11 0) "+ imp3+ "\n")
-    PNS_model.write("630 23 -2.635 -602 TRCL= (0 -11 0) "+ imp3+ "\n")
-    PNS_model.write("631 23 -2.635 -601 TRCL= (0 12 0) "+ imp3+ "\n")
-    PNS_model.write("632 23 -2.635 -602 TRCL= (0 -12 0) "+ imp3+ "\n")
-    PNS_model.write("633 23 -2.635 -601 TRCL= (0 13 0) "+ imp3+ "\n")
-    PNS_model.write("634 23 -2.635 -602 TRCL= (0 -13 0) "+ imp3+ "\n")
-    PNS_model.write("635 23 -2.635 -601 TRCL= (0 14 0) "+ imp3+ "\n")
-    PNS_model.write("636 23 -2.635 -602 TRCL= (0 -14 0) "+ imp3+ "\n")
-    PNS_model.write("C    Z-axis Li-7\n")
-    PNS_model.write("637 23 -2.635 -603 TRCL= (-1 0 3) "+ imp3+ "\n")
-    PNS_model.write("638 23 -2.635 -604 TRCL= (-1 0 -3) "+ imp3+ "\n")
-    PNS_model.write("639 23 -2.635 -603 TRCL= (-1 0 6) "+ imp3+ "\n")
-    PNS_model.write("640 23 -2.635 -604 TRCL= (-1 0 -5.8) "+ imp3+ "\n")
-    PNS_model.write("641 23 -2.635 -603 TRCL= (-1 0 8) "+ imp3+ "\n")
-    PNS_model.write("642 23 -2.635 -604 TRCL= (-1 0 -7.8) "+ imp3+ "\n")
-    PNS_model.write("643 23 -2.635 -603 TRCL= (-1 0 9) "+ imp3+ "\n")
-    PNS_model.write("644 23 -2.635 -604 TRCL= (-1 0 -8.8) "+ imp3+ "\n")
-    PNS_model.write("645 23 -2.635 -603 TRCL= (-1 0 10) "+ imp3+ "\n")
-    PNS_model.write("646 23 -2.635 -604 TRCL= (-1 0 -10) "+ imp3+ "\n")
-    PNS_model.write("647 23 -2.635 -603 TRCL= (-1 0 11) "+ imp3+ "\n")
-    PNS_model.write("648 23 -2.635 -604 TRCL= (-1 0 -11) "+ imp3+ "\n")
-    PNS_model.write("649 23 -2.635 -603 TRCL= (-1 0 12) "+ imp3+ "\n")
-    PNS_model.write("650 23 -2.635 -604 TRCL= (-1 0 -12) "+ imp3+ "\n")
-    PNS_model.write("651 23 -2.635 -603 TRCL= (-1 0 13) "+ imp3+ "\n")
-    PNS_model.write("652 23 -2.635 -604 TRCL= (-1 0 -13) "+ imp3+ "\n")
-    PNS_model.write("653 23 -2.635 -603 TRCL= (-1 0 14) "+ imp3+ "\n")
-    PNS_model.write("654 23 -2.635 -604 TRCL= (-1 0 -14) "+ imp3+ "\n")
-    PNS_model.write("C    X-axis back casing of Li-7\n")
-    PNS_model.write("700 24 -1.42 -700 "+ imp1+ "\n")
-    PNS_model.write(TRCL(701, 700, 3, 0, 0))
-    PNS_model.write(TRCL(702, 700, -3, 0, 0))
-    PNS_model.write(TRCL(703, 700, 6, 0, 0))
-    PNS_model.write(TRCL(704, 700, -5.8, 0, 0))
-    PNS_model.write(TRCL(705, 700, 8, 0, 0))
-    PNS_model.write(TRCL(706, 700, -7.8, 0, 0))
-    PNS_model.write(TRCL(707, 700, 9, 0, 0))
-    PNS_model.write(TRCL(708, 700, -8.8, 0, 0))
-    PNS_model.write(TRCL(709, 700, 10, 0, 0))
-    PNS_model.write(TRCL(710, 700, -10, 0, 0))
-    PNS_model.write(TRCL(711, 700, 11, 0, 0))
-    PNS_model.write(TRCL(712, 700, -11, 0, 0))
-    PNS_model.write(TRCL(713, 700, 12, 0, 0))
-    PNS_model.write(TRCL(714, 700, -12, 0, 0))
-    PNS_model.write(TRCL(715, 700, 13, 0, 0))
-    PNS_model.write(TRCL(716, 700, -13, 0, 0))
-    PNS_model.write(TRCL(717, 700, 14, 0, 0))
-    PNS_model.write(TRCL(718, 700, -14, 0, 0))
-    PNS_model.write("C    Y-axis back casing of Li-7\n")
-    PNS_model.write("719 24 -1.42 -701 TRCL= (0 3 0) "+ imp1+ "\n")
-    PNS_model.write("720 24 -1.42 -702 TRCL= (0 -3 0) "+ imp1+ "\n")
-    PNS_model.write("721 24 -1.42 -701 TRCL= (0 6 0) "+ imp1+ "\n")
-    PNS_model.write("722 24 -1.42 -702 TRCL= (0 -5.8 0) "+ imp1+ "\n")
-    PNS_model.write("723 24 -1.42 -701 TRCL= (0 8 0) "+ imp1+ "\n")
-    PNS_model.write("724 24 -1.42 -702 TRCL= (0 -7.8 0) "+ imp1+ "\n")
-    PNS_model.write("725 24 -1.42 -701 TRCL= (0 9 0) "+ imp1+ "\n")
-    PNS_model.write("726 24 -1.42 -702 TRCL= (0 -8.8 0) "+ imp1+ "\n")
-    PNS_model.write("727 24 -1.42 -701 TRCL= (0 10 0) "+ imp1+ "\n")
-    PNS_model.write("728 24 -1.42 -702 TRCL= (0 -10 0) "+ imp1+ "\n")
-    PNS_model.write("729 24 -1.42 -701 TRCL= (0 11 0) "+ imp1+ "\n")
-    PNS_model.write("730 24 -1.42 -702 TRCL= (0 -11 0) "+ imp1+ "\n")
-    PNS_model.write("731 24 -1.42 -701 TRCL= (0 12 0) "+ imp1+ "\n")
-    PNS_model.write("732 24 -1.42 -702 TRCL= (0 -12 0) "+ imp1+ "\n")
-    PNS_model.write("733 24 -1.42 -701 TRCL= (0 13 0) "+ imp1+ "\n")
-    PNS_model.write("734 24 -1.42 -702 TRCL= (0 -13 0) "+ imp1+ "\n")
-    PNS_model.write("735 24 -1.42 -701 TRCL= (0 14 0) "+ imp1+ "\n")
-    PNS_model.write("736 24 -1.42 -702 TRCL= (0 -14 0) "+ imp1+ "\n")
-    PNS_model.write("C    Z-axis front casing of Li-7\n")
-    PNS_model.write("737 24 -1.42 -703 TRCL= (-1 0 3) "+ imp1+ "\n")
-    PNS_model.write("738 24 -1.42 -704 TRCL= (-1 0 -3) "+ imp1+ "\n")
-    PNS_model.write("739 24 -1.42 -703 TRCL= (-1 0 6) "+ imp1+ "\n")
-    PNS_model.write("740 24 -1.42 -704 TRCL= (-1 0 -5.8) "+ imp1+ "\n")
-    PNS_model.write("741 24 -1.42 -703 TRCL= (-1 0 8) "+ imp1+ "\n")
-    PNS_model.write("742 24 -1.42 -704 TRCL= (-1 0 -7.8) "+ imp1+ "\n")
-    PNS_model.write("743 24 -1.42 -703 TRCL= (-1 0 9) "+ imp1+ "\n")
-    PNS_model.write("744 24 -1.42 -704 TRCL= (-1 0 -8.8) "+ imp1+ "\n")
-    PNS_model.write("745 24 -1.42 -703 TRCL= (-1 0 10) "+ imp1+ "\n")
-    PNS_model.write("746 24 -1.42 -704 TRCL= (-1 0 -10) "+ imp1+ "\n")
-    PNS_model.write("747 24 -1.42 -703 TRCL= (-1 0 11) "+ imp1+ "\n")
-    PNS_model.write("748 24 -1.42 -704 TRCL= (-1 0 -11) "+ imp1+ "\n")
-    PNS_model.write("749 24 -1.42 -703 TRCL= (-1 0 12) "+ imp1+ "\n")
-    PNS_model.write("750 24 -1.42 -704 TRCL= (-1 0 -12) "+ imp1+ "\n")
-    PNS_model.write("751 24 -1.42 -703 TRCL= (-1 0 13) "+ imp1+ "\n")
-    PNS_model.write("752 24 -1.42 -704 TRCL= (-1 0 -13) "+ imp1+ "\n")
-    PNS_model.write("753 24 -1.42 -703 TRCL= (-1 0 14) "+ imp1+ "\n")
-    PNS_model.write("754 24 -1.42 -704 TRCL= (-1 0 -14) "+ imp1+ "\n")
-    PNS_model.write("C    ---------------CRADLE--------------\n")
-    PNS_model.write("C    Upper ring\n")
-    PNS_model.write("2000 3 -2.7 (-2001 2000):(-2003 2002):(-2005 2004):(-2007 2006) &\n"
+    return input('Which material for detector? ')
+
+def render_cell_card(detectorMaterial):
+    # This function returns the text of all of the cell cards. The only thing
+    #  that changes it is the detector material of the Li-6 cells (22 for 
+    #  Li-6, 2 for Au), which used to be asked for in the middle of writing
+    #  the cells.
+    imp1 = "imp:n=1 imp:a=1 imp:p=1 imp:e=1"
+    imp3 = "imp:n=3 imp:a=3 imp:p=3 imp:e=3"
+    text = []
+    text.append("C    **************CELL CARD**************\n")
+    text.append("C    -------MOIST AIR AROUND SPHERE-------\n")
+    text.append("801    1 -1.29E-3 -800 20000 20100 20200 20300 #2000 #2001 #2002 #2003 #2004 &\n     " + imp1 + "\n")
+    text.append("C    ---------SPHERE AND CYLINDER---------\n")
+    text.append("C    Poly sphere (outside of cylinder and holes)\n")
+    text.append("10000 20 -0.93  -20000 20100 20200 20300 #2000 "+ imp1+ "\n")
+    text.append(render_cylinder_cells(imp1))
+    text.append("C    ---------HOLES IN CYLINDER---------\n")
+    text.append("C             (Filled with air)         \n")
+    text.append(render_hole_cells(imp1))
+    text.append(render_tld_cells(detectorMaterial))
+    text.append("C    ---------------CRADLE--------------\n")
+    text.append("C    Upper ring\n")
+    text.append("2000 3 -2.7 (-2001 2000):(-2003 2002):(-2005 2004):(-2007 2006) &\n"
                     "           :(-2009 2008):(-2011 2010):(-2013 2012) "+ imp1+ "\n")
-    PNS_model.write("C    Lower ring and base\n")
-    PNS_model.write("2001 3 -2.7 -2014 2015 2016 2017 "+ imp1+ "\n")
-    PNS_model.write("C    Legs\n")
-    PNS_model.write("2002 3 -2.7 -2020 #2000 #2001 "+ imp1+ "\n")
-    PNS_model.write("2003 3 -2.7 -2021 #2000 #2001 "+ imp1+ "\n")
-    PNS_model.write("2004 3 -2.7 -2022 #2000 #2001 "+ imp1+ "\n")
-    PNS_model.write("C    ----------EXTERNAL UNIVERSE--------\n")
-    PNS_model.write("999  0 800 imp:n=0 imp:a=0 imp:p=0 imp:e=0\n")
-    PNS_model.write("C    ************END OF CELLS************\n")
+    text.append("C    Lower ring and base\n")
+    text.append("2001 3 -2.7 -2014 2015 2016 2017 "+ imp1+ "\n")
+    text.append("C    Legs\n")
+    text.append("2002 3 -2.7 -2020 #2000 #2001 "+ imp1+ "\n")
+    text.append("2003 3 -2.7 -2021 #2000 #2001 "+ imp1+ "\n")
+    text.append("2004 3 -2.7 -2022 #2000 #2001 "+ imp1+ "\n")
+    text.append("C    ----------EXTERNAL UNIVERSE--------\n")
+    text.append("999  0 800 imp:n=0 imp:a=0 imp:p=0 imp:e=0\n")
+    text.append("C    ************END OF CELLS************\n")
     
-    PNS_model.write("\n")   # blank line at the end of the cell card
-    PNS_model.close()
+    text.append("\n")   # blank line at the end of the cell card
+    return "".join(text)
+
+def wrap_card(words, indent="     ", width=80):
+    # This function joins the words of a card into lines that are no longer 
+    #  than width. Every line after the first starts with indent, since MCNP
+    #  reads a line that starts with 5 or more spaces as more of the card 
+    #  above it.
+    lines = [words[0]]
+    for word in words[1:]:
+        if len(lines[-1]) + 1 + len(word) > width:
+            lines.append(indent + word)
+        else:
+            lines[-1] += " " + word
+    return "\n".join(lines) + "\n"
+
+def render_cylinder_cells(imp):
+    # This function returns the poly cylinder cell of each axis. Each one is 
+    #  the inside of its cylinder without the TLD slots of that axis (and 
+    #  without the cylinders of the axes before it). The cells, surfaces and 
+    #  slots come from tldGeometry.py.
+    text = []
+    for axis, axis_name in enumerate(tld.axis_names):
+        slots = tld.tld_slots['surface'][tld.tld_slots['axis'] == axis]
+        words = ([str(tld.cylinder_cells[axis]), "20", "-0.93", "-" + str(tld.cylinder_surfaces[axis])]
+                 + [str(surface) for surface in tld.cylinder_surfaces[:axis]]
+                 + [str(surface) for surface in slots] + imp.split())
+        text.append("C    " + axis_name + "-axis cylinder\n")
+        text.append(wrap_card(words))
+    return "".join(text)
+
+def render_hole_cells(imp):
+    # This function returns the air cell of each axis, which fills the TLD 
+    #  slots of that axis around the TLD cells.
+    text = []
+    for axis, axis_name in enumerate(tld.axis_names):
+        slots = tld.tld_slots['surface'][tld.tld_slots['axis'] == axis]
+        stations = tld.tld_stations[tld.tld_stations['axis'] == axis]
+        union = ["-" + str(surface) + ":" for surface in slots]
+        union[0] = "(" + union[0]
+        union[-1] = union[-1][:-1] + ")"
+        words = ([str(tld.hole_cells[axis]), "1", "-1.2E-3"] + union
+                 + ["-" + str(tld.cylinder_surfaces[axis])]
+                 + ["#" + str(cell) for cell in stations['cells'].T.ravel()] + imp.split())
+        text.append("C    " + axis_name + "-axis holes\n")
+        text.append(wrap_card(words, indent="        "))
+    return "".join(text)
+
+def render_tld_cells(detectorMaterial):
+    # This function returns the cells of every TLD station (see tld_layers in
+    #  tldGeometry.py). The first station on a surface with no translation
+    #  (the center TLD) is written out and the others on that surface are 
+    #  LIKE BUT copies of it, the rest are written out with their TRCL.
+    text = []
+    for layer, (number, name, material, density, importance) in enumerate(tld.tld_layers):
+        if layer == 0 or name[-4:] != tld.tld_layers[layer-1][1][-4:]:
+            side = "A" if name.endswith("Li-6") else "B"
+            text.append("C    --------TLD MATERIAL (" + side + "-SIDE)------\n")
+        if material is None:
+            material = str(detectorMaterial)
+        imp = " ".join("imp:" + particle + "=" + str(importance) for particle in "nape")
+        for axis, axis_name in enumerate(tld.axis_names):
+            text.append("C    " + axis_name + "-axis " + name + "\n")
+            defined = {}
+            for station in tld.tld_stations[tld.tld_stations['axis'] == axis]:
+                cell = station['cells'][layer]
+                surface = station['surfaces'][layer]
+                shift = ["%g" % x for x in station['shift']]
+                if not station['shift'].any():
+                    text.append(f"{cell} {material} {density} -{surface} {imp}\n")
+                    defined[surface] = cell
+                elif surface in defined:
+                    text.append(TRCL(cell, defined[surface], *shift))
+                else:
+                    text.append(f"{cell} {material} {density} -{surface} TRCL= ({' '.join(shift)}) {imp}\n")
+    return "".join(text)
 
 def write_surf_card(run_path,filename,which_source):
-    # This function writes all of the surfaces within the PNS. It uses the 
-    #  variables 'run_path' and 'filename' to open each input deck as this 
-    #  function is called and it appends each line to the input deck. The
-    #  variable 'which_source' isn't used yet, but will probably be used if I 
+    # This function appends the text from render_surf_card() to the input deck.
+    PNS_model = open(run_path + filename, "a")
+    PNS_model.write(render_surf_card(which_source))
+    PNS_model.close()
+
+def render_surf_card(which_source):
+    # This function returns the text of all of the surfaces within the PNS. 
+    #  The variable 'which_source' isn't used yet, but will probably be used if I 
     #  start using more distributed sources so that the source surface can be
     #  adjusted based on the 'which_source' input. The below variables are the 
     #  definitions of some of sizes and locations of various aspects of the 
@@ -688,238 +852,205 @@ def write_surf_card(run_path,filename,which_source):
     TLD_slot_w_max = 0.5        # Max value for width of slot for TLD
     TLD_slot_l_min = -1.10516   # Min value of length of slot for TLD
     TLD_slot_l_max = 1.89484    # Max value of length of slot for TLD
-    TLD_slot_x_ax_x_min = [-14.1258,-13.1155,-12.0995,-11.0925,-10.0865,-9.0655,-8.0625,-6.0575,-3.0875,-0.1795,2.7525,5.7525,7.7545,8.7585,9.7625,10.7915,11.8305,12.8575,13.8665]
-    TLD_slot_x_ax_x_max = [-13.7555,-12.7585,-11.7495,-10.7355,-9.7205,-8.6975,-7.6725,-5.6965,-2.7015,0.1795,3.1155,6.1135,8.1245,9.1295,10.1565,11.1705,12.1995,13.2255,14.2235]
-    TLD_slot_y_ax_y_min = [-14.1258,-13.1155,-12.0995,-11.0925,-10.0865,-9.0655,-8.0625,-6.0575,-3.0875,2.7525,5.7525,7.7545,8.7585,9.7625,10.7915,11.8305,12.8575,13.8665]
-    TLD_slot_y_ax_y_max = [-13.7555,-12.7585,-11.7495,-10.7355,-9.7205,-8.6975,-7.6725,-5.6965,-2.7015,3.1155,6.1135,8.1245,9.1295,10.1565,11.1705,12.1995,13.2255,14.2235]
-    TLD_slot_z_ax_z_min = [-14.1255,-13.1155,-12.0995,-11.0925,-10.0865,-9.0655,-8.0625,-6.0575,-3.0875,2.7525,5.7525,7.7545,8.7585,9.7625,10.7915,11.8305,12.8575,13.8665]
-    TLD_slot_z_ax_z_max = [-13.7555,-12.7585,-11.7495,-10.7355,-9.7205,-8.6975,-7.6725,-5.6965,-2.7015,3.1155,6.1135,8.1245,9.1295,10.1565,11.1705,12.1995,13.2255,14.2235]
-    TLD_slot_x_surf_names = [21000, 21100, 21200, 21300, 21400, 21500, 21600, 21700, 21800, 21900, 22000, 22100, 22200, 22300, 22400, 22500, 22600, 22700, 22800]
-    TLD_slot_y_surf_names = [23000, 23100, 23200, 23300, 23400, 23500, 23600, 23700, 23800, 23900, 24000, 24100, 24200, 24300, 24400, 24500, 24600, 24700]
-    TLD_slot_z_surf_names = [25000, 25100, 25200, 25300, 25400, 25500, 25600, 25700, 25800, 25900, 26000, 26100, 26200, 26300, 26400, 26500, 26600, 26700]
-    num_x_TLDs = len(TLD_slot_x_ax_x_min)
-    num_y_TLDs = len(TLD_slot_y_ax_y_min)
-    num_z_TLDs = len(TLD_slot_z_ax_z_min)
     
-    PNS_model = open(run_path + filename, "a")
-    PNS_model.write("C    *************SURFACE CARD************\n")
-    PNS_model.write("C    -----Container for entire sphere-----\n")
-    PNS_model.write("800  RPP -110 110 -110 110 -161.2 110\n")
-    PNS_model.write("C    -----SPHERE AND CYLINDER INSERTS-----\n")
-    PNS_model.write("20000 SPH   0 0 0   " + str(r) + "\n")
-    PNS_model.write("20100 RCC   -" +str(r)+ " 0 0    " +str(2*r)+ " 0 0   " +str(r_cyl)+ " $ X-axis cyl\n")
-    PNS_model.write("20200 RCC   0 -" +str(r)+ " 0    0 " +str(2*r)+ " 0   " +str(r_cyl)+ " $ Y-axis cyl\n")
-    PNS_model.write("20300 RCC   0 0 -" +str(r)+ "    0 0 " +str(2*r)+ "   " +str(r_cyl)+ " $ Z-axis cyl\n")
-    PNS_model.write("C    HOLES IN CYLINDER\n")
-    PNS_model.write("C    ----------X-axis TLD slots-----------\n")
-    for i in range(num_x_TLDs):
-        PNS_model.write(str(TLD_slot_x_surf_names[i])+ " RPP "+ str(TLD_slot_x_ax_x_min[i])+ " "+ str(TLD_slot_x_ax_x_max[i])+ "  "+ str(TLD_slot_w_min)+ " "+ str(TLD_slot_w_max)+ "  "+ str(TLD_slot_l_min)+ " "+ str(TLD_slot_l_max)+ "\n")
-    PNS_model.write("C    ----------Y-axis TLD slots-----------\n")
-    for i in range(num_y_TLDs):
-        PNS_model.write(str(TLD_slot_y_surf_names[i])+ " RPP "+ str(TLD_slot_w_min)+ " "+ str(TLD_slot_w_max)+ "  "+ str(TLD_slot_y_ax_y_min[i])+ " "+ str(TLD_slot_y_ax_y_max[i])+ "  "+ str(TLD_slot_l_min)+ " "+ str(TLD_slot_l_max)+ "\n")
-    PNS_model.write("C    ----------Z-axis TLD slots-----------\n")
-    for i in range(num_z_TLDs):
-        PNS_model.write(str(TLD_slot_z_surf_names[i])+ " RPP "+ str(-1*TLD_slot_l_max)+ " "+ str(-1*TLD_slot_l_min)+ "  "+ str(TLD_slot_w_min)+ " "+ str(TLD_slot_w_max)+ "  "+ str(TLD_slot_z_ax_z_min[i])+ " "+ str(TLD_slot_z_ax_z_max[i])+ "\n")
-    PNS_model.write("C    ---------X-axis TLD SURFACES---------\n")
-    PNS_model.write("200 RPP  0.0581  0.0781 -0.4275  0.4725  -0.603   1.814   $ Casing\n")
-    PNS_model.write("400 RPP  0.02    0.0581 -0.15875 0.15875 -0.15875 0.15875 $ Li-6\n")
-    PNS_model.write("300 RPP  0       0.02   -0.4725  0.4725  -0.603   1.814   $ Casing\n")
-    PNS_model.write("500 RPP -0.02    0      -0.4725  0.4725  -0.603   1.814   $ Casing\n")
-    PNS_model.write("600 RPP -0.0581 -0.02   -0.15875 0.15875 -0.15875 0.15875 $ Li-7\n")
-    PNS_model.write("700 RPP -0.0781 -0.0581 -0.4725  0.4725  -0.603   1.814   $ Casing\n")
-    PNS_model.write("C    -------(+) Y-axis TLD SURFACES-------\n")
-    PNS_model.write("201 RPP -0.4275  0.4725   0.0581  0.0781 -0.603   1.814   $ Casing\n")
-    PNS_model.write("401 RPP -0.15875 0.15875  0.02    0.0581 -0.15875 0.15875 $ Li-6\n")
-    PNS_model.write("301 RPP -0.4725  0.4725   0       0.02   -0.603   1.814   $ Casing\n")
-    PNS_model.write("501 RPP -0.4725  0.4725  -0.02    0      -0.603   1.814   $ Casing\n")
-    PNS_model.write("601 RPP -0.15875 0.15875 -0.0581 -0.02   -0.15875 0.15875 $ Li-7\n")
-    PNS_model.write("701 RPP -0.4725  0.4725  -0.0781 -0.0581 -0.603   1.814   $ Casing\n")
-    PNS_model.write("C    -------(-) Y-axis TLD SURFACES-------\n")
-    PNS_model.write("202 RPP -0.4275  0.4725  -0.0781 -0.0581 -0.603   1.814   $ Casing\n")
-    PNS_model.write("402 RPP -0.15875 0.15875 -0.0581 -0.02   -0.15875 0.15875 $ Li-6\n")
-    PNS_model.write("302 RPP -0.4725  0.4725  -0.02    0      -0.603   1.814   $ Casing\n")
-    PNS_model.write("502 RPP -0.4725  0.4725   0       0.02   -0.603   1.814   $ Casing\n")
-    PNS_model.write("602 RPP -0.15875 0.15875  0.02    0.0581 -0.15875 0.15875 $ Li-7\n")
-    PNS_model.write("702 RPP -0.4725  0.4725   0.0581  0.0781 -0.603   1.814   $ Casing\n")
-    PNS_model.write("C    -------(+) Z-axis TLD SURFACES-------\n")
-    PNS_model.write("203 RPP -0.603   1.814   -0.4275  0.4725   0.0581  0.0781 $ Casing\n")
-    PNS_model.write("403 RPP -0.15875 0.15875 -0.15875 0.15875  0.02    0.0581 $ Li-6\n")
-    PNS_model.write("303 RPP -0.603   1.814   -0.4725  0.4725   0       0.02   $ Casing\n")
-    PNS_model.write("503 RPP -0.603   1.814   -0.4725  0.4725  -0.02    0      $ Casing\n")
-    PNS_model.write("603 RPP -0.15875 0.15875 -0.15875 0.15875 -0.0581 -0.02   $ Li-7\n")
-    PNS_model.write("703 RPP -0.603   1.814   -0.4725  0.4725  -0.0781 -0.0581 $ Casing\n")
-    PNS_model.write("C    -------(-) Z-axis TLD SURFACES-------\n")
-    PNS_model.write("204 RPP -0.603   1.814   -0.4275  0.4725  -0.0781 -0.0581 $ Casing\n")
-    PNS_model.write("404 RPP -0.15875 0.15875 -0.15875 0.15875 -0.0581 -0.02   $ Li-6\n")
-    PNS_model.write("304 RPP -0.603   1.814   -0.4725  0.4725  -0.02    0      $ Casing\n")
-    PNS_model.write("504 RPP -0.603   1.814   -0.4725  0.4725   0       0.02   $ Casing\n")
-    PNS_model.write("604 RPP -0.15875 0.15875 -0.15875 0.15875  0.02    0.0581 $ Li-7\n")
-    PNS_model.write("704 RPP -0.603   1.814   -0.4725  0.4725   0.0581  0.0781 $ Casing\n")
-    PNS_model.write("C    ----------CRADLE UPPER RING----------\n")
-    PNS_model.write("2000  RCC 0 0 -14.03 0 0 0.43 6.4   $ Part 1\n")
-    PNS_model.write("2001  RCC 0 0 -14.03 0 0 0.43 8.2   $ Part 1\n")
-    PNS_model.write("2002  RCC 0 0 -13.60 0 0 0.10 6.6   $ Part 2\n")
-    PNS_model.write("2003  RCC 0 0 -13.60 0 0 0.10 8.2   $ Part 2\n")
-    PNS_model.write("2004  RCC 0 0 -13.50 0 0 0.10 6.8   $ Part 3\n")
-    PNS_model.write("2005  RCC 0 0 -13.50 0 0 0.10 8.2   $ Part 3\n")
-    PNS_model.write("2006  RCC 0 0 -13.40 0 0 0.10 7.0   $ Part 4\n")
-    PNS_model.write("2007  RCC 0 0 -13.40 0 0 0.10 8.2   $ Part 4\n")
-    PNS_model.write("2008  RCC 0 0 -13.30 0 0 0.10 7.2   $ Part 5\n")
-    PNS_model.write("2009  RCC 0 0 -13.30 0 0 0.10 8.2   $ Part 5\n")
-    PNS_model.write("2010  RCC 0 0 -13.20 0 0 0.10 7.4   $ Part 6\n")
-    PNS_model.write("2011  RCC 0 0 -13.20 0 0 0.10 8.2   $ Part 6\n")
-    PNS_model.write("2012  RCC 0 0 -13.10 0 0 0.07 7.6   $ Part 7\n")
-    PNS_model.write("2013  RCC 0 0 -13.10 0 0 0.07 8.1   $ Part 7\n")
-    PNS_model.write("C    -------------CRADLE BASE-------------\n")
-    PNS_model.write("2014  RCC  0    0    -31.16 0 0    0.80 16.0  $ Ring\n")
-    PNS_model.write("2015  RCC  0.0  8.0  -31.16 0 0    0.80 5.0   $ Holes\n")
-    PNS_model.write("2016  RCC  6.9 -4.0  -31.16 0 0    0.80 5.0   $ Holes\n")
-    PNS_model.write("2017  RCC -6.9 -4.0  -31.16 0 0    0.80 5.0   $ Holes\n")
-    PNS_model.write("C    -------------CRADLE LEGS-------------\n")
-    PNS_model.write("2020  RCC  0.0  -14.8 -31.00  0.00  7.50 17.2 0.4   $ Leg\n")
-    PNS_model.write("2021  RCC  12.8  7.4  -31.00 -6.48 -3.75 17.2 0.4   $ Leg\n")
-    PNS_model.write("2022  RCC -12.8  7.4  -31.00  6.48 -3.75 17.2 0.4   $ Leg\n")
-    PNS_model.write("C    -----------SOURCE SURFACES-----------\n")
-    PNS_model.write("9999   SPH   0 0 0 50\n")
-    PNS_model.write("C    ***********END OF SURFACES***********\n")
-    PNS_model.write("\n")   # blank line at the end of the surface card
-    PNS_model.close()
+    text = []
+    text.append("C    *************SURFACE CARD************\n")
+    text.append("C    -----Container for entire sphere-----\n")
+    text.append("800  RPP -110 110 -110 110 -161.2 110\n")
+    text.append("C    -----SPHERE AND CYLINDER INSERTS-----\n")
+    text.append("20000 SPH   0 0 0   " + str(r) + "\n")
+    text.append("20100 RCC   -" +str(r)+ " 0 0    " +str(2*r)+ " 0 0   " +str(r_cyl)+ " $ X-axis cyl\n")
+    text.append("20200 RCC   0 -" +str(r)+ " 0    0 " +str(2*r)+ " 0   " +str(r_cyl)+ " $ Y-axis cyl\n")
+    text.append("20300 RCC   0 0 -" +str(r)+ "    0 0 " +str(2*r)+ "   " +str(r_cyl)+ " $ Z-axis cyl\n")
+    text.append("C    HOLES IN CYLINDER\n")
+    for axis, axis_name in enumerate(tld.axis_names):
+        text.append("C    ----------" + axis_name + "-axis TLD slots-----------\n")
+        for slot in tld.tld_slots[tld.tld_slots['axis'] == axis].tolist():
+            surface, slot_min, slot_max = str(slot[1]), str(slot[2]), str(slot[3])
+            if axis == 0:
+                text.append(surface+ " RPP "+ slot_min+ " "+ slot_max+ "  "+ str(TLD_slot_w_min)+ " "+ str(TLD_slot_w_max)+ "  "+ str(TLD_slot_l_min)+ " "+ str(TLD_slot_l_max)+ "\n")
+            elif axis == 1:
+                text.append(surface+ " RPP "+ str(TLD_slot_w_min)+ " "+ str(TLD_slot_w_max)+ "  "+ slot_min+ " "+ slot_max+ "  "+ str(TLD_slot_l_min)+ " "+ str(TLD_slot_l_max)+ "\n")
+            else:
+                text.append(surface+ " RPP "+ str(-1*TLD_slot_l_max)+ " "+ str(-1*TLD_slot_l_min)+ "  "+ str(TLD_slot_w_min)+ " "+ str(TLD_slot_w_max)+ "  "+ slot_min+ " "+ slot_max+ "\n")
+    text.append("C    ---------X-axis TLD SURFACES---------\n")
+    text.append("200 RPP  0.0581  0.0781 -0.4275  0.4725  -0.603   1.814   $ Casing\n")
+    text.append("400 RPP  0.02    0.0581 -0.15875 0.15875 -0.15875 0.15875 $ Li-6\n")
+    text.append("300 RPP  0       0.02   -0.4725  0.4725  -0.603   1.814   $ Casing\n")
+    text.append("500 RPP -0.02    0      -0.4725  0.4725  -0.603   1.814   $ Casing\n")
+    text.append("600 RPP -0.0581 -0.02   -0.15875 0.15875 -0.15875 0.15875 $ Li-7\n")
+    text.append("700 RPP -0.0781 -0.0581 -0.4725  0.4725  -0.603   1.814   $ Casing\n")
+    text.append("C    -------(+) Y-axis TLD SURFACES-------\n")
+    text.append("201 RPP -0.4275  0.4725   0.0581  0.0781 -0.603   1.814   $ Casing\n")
+    text.append("401 RPP -0.15875 0.15875  0.02    0.0581 -0.15875 0.15875 $ Li-6\n")
+    text.append("301 RPP -0.4725  0.4725   0       0.02   -0.603   1.814   $ Casing\n")
+    text.append("501 RPP -0.4725  0.4725  -0.02    0      -0.603   1.814   $ Casing\n")
+    text.append("601 RPP -0.15875 0.15875 -0.0581 -0.02   -0.15875 0.15875 $ Li-7\n")
+    text.append("701 RPP -0.4725  0.4725  -0.0781 -0.0581 -0.603   1.814   $ Casing\n")
+    text.append("C    -------(-) Y-axis TLD SURFACES-------\n")
+    text.append("202 RPP -0.4275  0.4725  -0.0781 -0.0581 -0.603   1.814   $ Casing\n")
+    text.append("402 RPP -0.15875 0.15875 -0.0581 -0.02   -0.15875 0.15875 $ Li-6\n")
+    text.append("302 RPP -0.4725  0.4725  -0.02    0      -0.603   1.814   $ Casing\n")
+    text.append("502 RPP -0.4725  0.4725   0       0.02   -0.603   1.814   $ Casing\n")
+    text.append("602 RPP -0.15875 0.15875  0.02    0.0581 -0.15875 0.15875 $ Li-7\n")
+    text.append("702 RPP -0.4725  0.4725   0.0581  0.0781 -0.603   1.814   $ Casing\n")
+    text.append("C    -------(+) Z-axis TLD SURFACES-------\n")
+    text.append("203 RPP -0.603   1.814   -0.4275  0.4725   0.0581  0.0781 $ Casing\n")
+    text.append("403 RPP -0.15875 0.15875 -0.15875 0.15875  0.02    0.0581 $ Li-6\n")
+    text.append("303 RPP -0.603   1.814   -0.4725  0.4725   0       0.02   $ Casing\n")
+    text.append("503 RPP -0.603   1.814   -0.4725  0.4725  -0.02    0      $ Casing\n")
+    text.append("603 RPP -0.15875 0.15875 -0.15875 0.15875 -0.0581 -0.02   $ Li-7\n")
+    text.append("703 RPP -0.603   1.814   -0.4725  0.4725  -0.0781 -0.0581 $ Casing\n")
+    text.append("C    -------(-) Z-axis TLD SURFACES-------\n")
+    text.append("204 RPP -0.603   1.814   -0.4275  0.4725  -0.0781 -0.0581 $ Casing\n")
+    text.append("404 RPP -0.15875 0.15875 -0.15875 0.15875 -0.0581 -0.02   $ Li-6\n")
+    text.append("304 RPP -0.603   1.814   -0.4725  0.4725  -0.02    0      $ Casing\n")
+    text.append("504 RPP -0.603   1.814   -0.4725  0.4725   0       0.02   $ Casing\n")
+    text.append("604 RPP -0.15875 0.15875 -0.15875 0.15875  0.02    0.0581 $ Li-7\n")
+    text.append("704 RPP -0.603   1.814   -0.4725  0.4725   0.0581  0.0781 $ Casing\n")
+    text.append("C    ----------CRADLE UPPER RING----------\n")
+    text.append("2000  RCC 0 0 -14.03 0 0 0.43 6.4   $ Part 1\n")
+    text.append("2001  RCC 0 0 -14.03 0 0 0.43 8.2   $ Part 1\n")
+    text.append("2002  RCC 0 0 -13.60 0 0 0.10 6.6   $ Part 2\n")
+    text.append("2003  RCC 0 0 -13.60 0 0 0.10 8.2   $ Part 2\n")
+    text.append("2004  RCC 0 0 -13.50 0 0 0.10 6.8   $ Part 3\n")
+    text.append("2005  RCC 0 0 -13.50 0 0 0.10 8.2   $ Part 3\n")
+    text.append("2006  RCC 0 0 -13.40 0 0 0.10 7.0   $ Part 4\n")
+    text.append("2007  RCC 0 0 -13.40 0 0 0.10 8.2   $ Part 4\n")
+    text.append("2008  RCC 0 0 -13.30 0 0 0.10 7.2   $ Part 5\n")
+    text.append("2009  RCC 0 0 -13.30 0 0 0.10 8.2   $ Part 5\n")
+    text.append("2010  RCC 0 0 -13.20 0 0 0.10 7.4   $ Part 6\n")
+    text.append("2011  RCC 0 0 -13.20 0 0 0.10 8.2   $ Part 6\n")
+    text.append("2012  RCC 0 0 -13.10 0 0 0.07 7.6   $ Part 7\n")
+    text.append("2013  RCC 0 0 -13.10 0 0 0.07 8.1   $ Part 7\n")
+    text.append("C    -------------CRADLE BASE-------------\n")
+    text.append("2014  RCC  0    0    -31.16 0 0    0.80 16.0  $ Ring\n")
+    text.append("2015  RCC  0.0  8.0  -31.16 0 0    0.80 5.0   $ Holes\n")
+    text.append("2016  RCC  6.9 -4.0  -31.16 0 0    0.80 5.0   $ Holes\n")
+    text.append("2017  RCC -6.9 -4.0  -31.16 0 0    0.80 5.0   $ Holes\n")
+    text.append("C    -------------CRADLE LEGS-------------\n")
+    text.append("2020  RCC  0.0  -14.8 -31.00  0.00  7.50 17.2 0.4   $ Leg\n")
+    text.append("2021  RCC  12.8  7.4  -31.00 -6.48 -3.75 17.2 0.4   $ Leg\n")
+    text.append("2022  RCC -12.8  7.4  -31.00  6.48 -3.75 17.2 0.4   $ Leg\n")
+    text.append("C    -----------SOURCE SURFACES-----------\n")
+    text.append("9999   SPH   0 0 0 50\n")
+    text.append("C    ***********END OF SURFACES***********\n")
+    text.append("\n")   # blank line at the end of the surface card
+    return "".join(text)
     
 def write_material_card(run_path,filename):
-    # This card defines all of the materials in the input deck and writes the
+    # This function appends the text from render_material_card() to the input deck.
+    PNS_model = open(run_path + filename, "a")
+    PNS_model.write(render_material_card())
+    PNS_model.close()
+
+def render_material_card():
+    # This card defines all of the materials in the input deck and has the
     #  associated card for them. I don't anticipate this will change much, but
     #  maybe later in the project it will.
+    text = []
+    text.append("C    ************MATERIAL CARD************\n")
+    text.append("C    Moist air from LLNL PNS; Other materials from PNNL Materials Compendium\n")
+    text.append("C       Moist Air @ den = 1.2e-3 g/cm3\n")
+    text.append("m1      8016   -0.2403 7014  -0.7460   18000 -1.239e-2\n")
+    text.append("        6000  -1.21e-4 1001  -1.3367e-3\n")
+    text.append("mt1     lwtr.60t\n")
+    text.append("C       Al  aluminum, den = 2.7 g/cm3\n")
+    text.append("m3      13027 -1\n")
+    text.append("C       Au  gold, den = 19.1 g/cm3\n")
+    text.append("m2      79197 -1\n")
+    text.append("C 	POLYETHLENE, NON-BORATED, C2H4\n")
+    text.append("m20	 1001.80C 	0.333338	$ H\n")
+    text.append("		 6000.80C 	0.666662 	$ C\n")
+    text.append("mt20 poly.01t\n")
+    text.append("C LITHIUM-6 Flouride @ den = 2.635 g/cm3\n")
+    text.append("m22 3006 -0.267585 9000 -0.732415\n")
+    text.append("C LITHIUM-7 Flouride  @ den = 2.635 g/cm3\n")
+    text.append("m23 3007 -0.267585 9000 -0.732415\n")
+    text.append("C KAPTON POLYIMIDE FILM CASING @ den = 1.42 g/cm3\n")
+    text.append("m24 1000 -0.026362 6000 -0.691133 7000 -0.073270 8000 -0.209235\n")
+    text.append("C    ***********END OF MATERIAL***********\n")
+    text.append("C\n")
+    return "".join(text)
+
+def write_source_card(run_path,filename,sdef,sdef_mod):
+    # This function appends the text from render_source_card() to the input deck.
     PNS_model = open(run_path + filename, "a")
-    PNS_model.write("C    ************MATERIAL CARD************\n")
-    PNS_model.write("C    Moist air from LLNL PNS; Other materials from PNNL Materials Compendium\n")
-    PNS_model.write("C       Moist Air @ den = 1.2e-3 g/cm3\n")
-    PNS_model.write("m1      8016   -0.2403 7014  -0.7460   18000 -1.239e-2\n")
-    PNS_model.write("        6000  -1.21e-4 1001  -1.3367e-3\n")
-    PNS_model.write("mt1     lwtr.60t\n")
-    PNS_model.write("C       Al  aluminum, den = 2.7 g/cm3\n")
-    PNS_model.write("m3      13027 -1\n")
-    PNS_model.write("C       Au  gold, den = 19.1 g/cm3\n")
-    PNS_model.write("m2      79197 -1\n")
-    PNS_model.write("C 	POLYETHLENE, NON-BORATED, C2H4\n")
-    PNS_model.write("m20	 1001.80C 	0.333338	$ H\n")
-    PNS_model.write("		 6000.80C 	0.666662 	$ C\n")
-    PNS_model.write("mt20 poly.01t\n")
-    PNS_model.write("C LITHIUM-6 Flouride @ den = 2.635 g/cm3\n")
-    PNS_model.write("m22 3006 -0.267585 9000 -0.732415\n")
-    PNS_model.write("C LITHIUM-7 Flouride  @ den = 2.635 g/cm3\n")
-    PNS_model.write("m23 3007 -0.267585 9000 -0.732415\n")
-    PNS_model.write("C KAPTON POLYIMIDE FILM CASING @ den = 1.42 g/cm3\n")
-    PNS_model.write("m24 1000 -0.026362 6000 -0.691133 7000 -0.073270 8000 -0.209235\n")
-    PNS_model.write("C    ***********END OF MATERIAL***********\n")
-    PNS_model.write("C\n")
+    PNS_model.write(render_source_card(sdef,sdef_mod))
     PNS_model.close()
 
-def write_source_card(run_path,filename,sdef,sdef_mod):
-    # This card writes in the source information using the 'sdef' and 
+def render_source_card(sdef,sdef_mod):
+    # This card has the source information using the 'sdef' and 
     #  'sdef_mod' variables, which are chosen in the function 
     #  define_which_source(). The for loop below iterates through all of the 
     #  strings within the 'sdef_mod' variable.
-    PNS_model = open(run_path + filename, "a")
-    PNS_model.write("C    *************SOURCE CARD*************\n")
-    PNS_model.write("mode  n a p e  $ Transport neutrons\n")
+    text = []
+    text.append("C    *************SOURCE CARD*************\n")
+    text.append("mode  n a p e  $ Transport neutrons\n")
     if isinstance(sdef,str):
-        PNS_model.write(sdef)
+        text.append(sdef)
     elif isinstance(sdef,tuple):
         for line in sdef:
-            PNS_model.write(sdef)
+            text.append(line)
     for line in sdef_mod:
-        PNS_model.write(line)
-    PNS_model.write("C    ************END OF SOURCE************\n")
-    PNS_model.write("C\n")
-    PNS_model.close()
+        text.append(line)
+    text.append("C    ************END OF SOURCE************\n")
+    text.append("C\n")
+    return "".join(text)
     
 def write_tally_card(run_path, filename):
-    # This card writes all of the tally commands. I'm working based off of
-    #  Paige's example and for some reason, she only has tallies on the Li-6.
+    # This function appends the text from render_tally_card() to the input deck.
     PNS_model = open(run_path + filename, "a")
-    PNS_model.write("C    *************TALLY CARD**************\n")
-    PNS_model.write("C Tally cards: Need gamma/alpha/nuetron energy deposition in each detector.\n")
-    PNS_model.write("C    --------------LITHIUM 6--------------\n")
-    PNS_model.write("C X-axis\n")
-    PNS_model.write("+F4006 (400)\n")
-    PNS_model.write("+F4016 (401)\n")
-    PNS_model.write("+F4026 (402)\n")
-    PNS_model.write("+F4036 (403)\n")
-    PNS_model.write("+F4046 (404)\n")
-    PNS_model.write("+F4056 (405)\n")
-    PNS_model.write("+F4066 (406)\n")
-    PNS_model.write("+F4076 (407)\n")
-    PNS_model.write("+F4086 (408)\n")
-    PNS_model.write("+F4096 (409)\n")
-    PNS_model.write("+F4106 (410)\n")
-    PNS_model.write("+F4116 (411)\n")
-    PNS_model.write("+F4126 (412)\n")
-    PNS_model.write("+F4136 (413)\n")
-    PNS_model.write("+F4146 (414)\n")
-    PNS_model.write("+F4156 (415)\n")
-    PNS_model.write("+F4166 (416)\n")
-    PNS_model.write("+F4176 (417)\n")
-    PNS_model.write("+F4186 (418)\n")
-    PNS_model.write("C Y-axis\n")
-    PNS_model.write("+F4196 (419)\n")
-    PNS_model.write("+F4206 (420)\n")
-    PNS_model.write("+F4216 (421)\n")
-    PNS_model.write("+F4226 (422)\n")
-    PNS_model.write("+F4236 (423)\n")
-    PNS_model.write("+F4246 (424)\n")
-    PNS_model.write("+F4256 (425)\n")
-    PNS_model.write("+F4266 (426)\n")
-    PNS_model.write("+F4276 (427)\n")
-    PNS_model.write("+F4286 (428)\n")
-    PNS_model.write("+F4296 (429)\n")
-    PNS_model.write("+F4306 (430)\n")
-    PNS_model.write("+F4316 (431)\n")
-    PNS_model.write("+F4326 (432)\n")
-    PNS_model.write("+F4336 (433)\n")
-    PNS_model.write("+F4346 (434)\n")
-    PNS_model.write("+F4356 (435)\n")
-    PNS_model.write("+F4366 (436)\n")
-    PNS_model.write("C Z-axis\n")
-    PNS_model.write("+F4376 (437)\n")
-    PNS_model.write("+F4386 (438)\n")
-    PNS_model.write("+F4396 (439)\n")
-    PNS_model.write("+F4406 (440)\n")
-    PNS_model.write("+F4416 (441)\n")
-    PNS_model.write("+F4426 (442)\n")
-    PNS_model.write("+F4436 (443)\n")
-    PNS_model.write("+F4446 (444)\n")
-    PNS_model.write("+F4456 (445)\n")
-    PNS_model.write("+F4466 (446)\n")
-    PNS_model.write("+F4476 (447)\n")
-    PNS_model.write("+F4486 (448)\n")
-    PNS_model.write("+F4496 (449)\n")
-    PNS_model.write("+F4506 (450)\n")
-    PNS_model.write("+F4516 (451)\n")
-    PNS_model.write("+F4526 (452)\n")
-    PNS_model.write("+F4536 (453)\n")
-    PNS_model.write("+F4546 (454)\n")
-    PNS_model.write("C    ************END OF TALLIES***********\n")
+    PNS_model.write(render_tally_card())
     PNS_model.close()
 
+def render_tally_card():
+    # This card has all of the tally commands. I'm working based off of
+    #  Paige's example and for some reason, she only has tallies on the Li-6.
+    text = []
+    text.append("C    *************TALLY CARD**************\n")
+    text.append("C Tally cards: Need gamma/alpha/nuetron energy deposition in each detector.\n")
+    text.append("C    --------------LITHIUM 6--------------\n")
+    li6_cells = tld.tld_stations['cells'][:, tld.li6_layer]
+    for axis, axis_name in enumerate(tld.axis_names):
+        text.append("C " + axis_name + "-axis\n")
+        on_axis = tld.tld_stations['axis'] == axis
+        for tally, cell in zip(tld.tld_stations['tally'][on_axis], li6_cells[on_axis]):
+            text.append("+F" + str(tally) + " (" + str(cell) + ")\n")
+    text.append("C    ************END OF TALLIES***********\n")
+    return "".join(text)
+
 def write_print_card(run_path,filename,nps):
-    # This card writes the print commands to record tallies at various nps's 
-    #  throughout the run.
+    # This function appends the text from render_print_card() to the input deck.
     PNS_model = open(run_path + filename, "a")
-    PNS_model.write("C    *************PRINT CARD**************\n")
-    PNS_model.write("dbcn  7j  1 0 0 0 0 154917 j\n") # This appears to be a debugging code?
-    PNS_model.write("C        ndp     ndm     mct ndmp dmmp  Values below ckecked by LCh\n")
-    PNS_model.write("prdmp   1.0e+09  0         1   2    0\n")
-    PNS_model.write("ctme    57600      $ 1200\n")
-    PNS_model.write("nps  "+nps+"\n")
-    
-def write_sbatch(run_path,dir1,dir2,Ebins,Ebin_names,numNodes,numCores):
+    PNS_model.write(render_print_card(nps))
+    PNS_model.close()
+
+def render_print_card(nps,ctme=default_ctme):
+    # This card has the print commands to record tallies at various nps's 
+    #  throughout the run. ctme is the computer time (minutes) the run stops
+    #  at if it hasn't reached nps.
+    text = []
+    text.append("C    *************PRINT CARD**************\n")
+    text.append("dbcn  7j  1 0 0 0 0 154917 j\n") # This appears to be a debugging code?
+    text.append("C        ndp     ndm     mct ndmp dmmp  Values below ckecked by LCh\n")
+    text.append("prdmp   1.0e+09  0         1   2    0\n")
+    if ctme == default_ctme:
+        text.append("ctme    57600      $ 1200\n")
+    else:
+        text.append("ctme    "+str(ctme)+"\n")
+    text.append("nps  "+str(nps)+"\n")
+    return "".join(text)
+
+def write_sbatch(run_path,dir1,dir2,Ebins,Ebin_names,numNodes,numCores,batch_name="batch.bash",walltime="23:30:00"):
     # This function writes the SBATCH file which is what is needed to run these
-    #  input decks on Quartz.
-    sbatch_file = open(run_path + '\\' + dir1 + "batch.bash","x",newline='\n')
+    #  input decks on Quartz. batch_name is the end of the file's name and
+    #  walltime is the time limit of the job.
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
     sbatch_file.write("#!/bin/csh\n")
     sbatch_file.write("#SBATCH -N " + str(len(Ebins)) + "\n")
     sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
-    sbatch_file.write("#SBATCH -t 23:30:00\n")
+    sbatch_file.write("#SBATCH -t " + walltime + "\n")
     sbatch_file.write("#SBATCH -p pbatch\n")
     sbatch_file.write("#SBATCH --mail-type=ALL\n")
     sbatch_file.write("#SBATCH -A cbronze\n")
@@ -945,15 +1076,15 @@ def write_sbatch(run_path,dir1,dir2,Ebins,Ebin_names,numNodes,numCores):
     sbatch_file.write("echo 'Done'")
     sbatch_file.close()
 
-def write_sbatch_spectrum(run_path,dir1,dir2,num_runs):
+def write_sbatch_spectrum(run_path,dir1,dir2,num_runs,batch_name="batch.bash",walltime="23:30:00"):
     # This function writes the SBATCH file which is what is needed to run these
     #  input decks on Quartz. This function focuses on writing the sbtach file 
     #  for the input decks that contain an energy spectrum.
-    sbatch_file = open(run_path + '\\' + dir1 + "batch.bash","x",newline='\n')
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
     sbatch_file.write("#!/bin/csh\n")
     sbatch_file.write("#SBATCH -N " + str(num_runs) + "\n")
     sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
-    sbatch_file.write("#SBATCH -t 23:30:00\n")
+    sbatch_file.write("#SBATCH -t " + walltime + "\n")
     sbatch_file.write("#SBATCH -p pbatch\n")
     sbatch_file.write("#SBATCH --mail-type=ALL\n")
     sbatch_file.write("#SBATCH -A cbronze\n")
@@ -979,14 +1110,14 @@ def write_sbatch_spectrum(run_path,dir1,dir2,num_runs):
     sbatch_file.write("echo 'Done'")
     sbatch_file.close()
     
-def write_sbatch_continuation(run_path,dir1,dir2,Ebins,Ebin_names,numNodes,numCores):
+def write_sbatch_continuation(run_path,dir1,dir2,Ebins,Ebin_names,numNodes,numCores,batch_name="batch_cont.bash",walltime="23:30:00"):
     # Quartz has a 24 hour time limit. In case that limit gets hit by the first
     #  batch file, this one will take the runtp files and continue the run.
-    sbatch_file = open(run_path + '\\' + dir1 + "batch_cont.bash","x",newline='\n')
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
     sbatch_file.write("#!/bin/csh\n")
     sbatch_file.write("#SBATCH -N " + str(len(Ebins)) + "\n")
     sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
-    sbatch_file.write("#SBATCH -t 23:30:00\n")
+    sbatch_file.write("#SBATCH -t " + walltime + "\n")
     sbatch_file.write("#SBATCH -p pbatch\n")
     sbatch_file.write("#SBATCH --mail-type=ALL\n")
     sbatch_file.write("#SBATCH -A cbronze\n")
@@ -1012,14 +1143,15 @@ def write_sbatch_continuation(run_path,dir1,dir2,Ebins,Ebin_names,numNodes,numCo
     sbatch_file.write("echo 'Done'")
     sbatch_file.close()
 
-def write_sbatch_continuation_spectrum(run_path,dir1,dir2,num_runs):
+def write_sbatch_continuation_spectrum(run_path,dir1,dir2,num_runs,batch_name="batch_cont.bash",
+                                       walltime="23:30:00"):
     # Quartz has a 24 hour time limit. In case that limit gets hit by the first
     #  batch file, this one will take the runtp files and continue the run.
-    sbatch_file = open(run_path + '\\' + dir1 + "batch_cont.bash","x",newline='\n')
+    sbatch_file = open(run_path + os.sep + dir1 + batch_name,"x",newline='\n')
     sbatch_file.write("#!/bin/csh\n")
     sbatch_file.write("#SBATCH -N " + str(num_runs) + "\n")
     sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
-    sbatch_file.write("#SBATCH -t 23:30:00\n")
+    sbatch_file.write("#SBATCH -t " + walltime + "\n")
     sbatch_file.write("#SBATCH -p pbatch\n")
     sbatch_file.write("#SBATCH --mail-type=ALL\n")
     sbatch_file.write("#SBATCH -A cbronze\n")
@@ -1045,46 +1177,444 @@ def write_sbatch_continuation_spectrum(run_path,dir1,dir2,num_runs):
     sbatch_file.write("echo 'Done'")
     sbatch_file.close()
     
-def write_PNS_input(Ebins,Ebin_names,sdef_list,nps,which_source,numNodes,numCores):
+def write_sbatch_array(run_path,dir1,dir2,deck_names,numCores,max_running=None,
+                       walltime="23:30:00",decks_per_task=1,batch_name="batch_array.bash"):
+    # This function writes one SBATCH file that runs every deck as a task of a
+    #  Slurm job array, instead of one job that asks for a node per deck. Each
+    #  task gets its own node and starts as soon as one is free, so the decks
+    #  don't wait in the queue until there are enough nodes for all of them.
+    # The deck names are written one per line to a deck list file
+    #  (batch_array_decks.txt for batch_array.bash) and task i runs the decks
+    #  on lines i*decks_per_task+1 to (i+1)*decks_per_task. Decks that take a
+    #  whole node run one after the other. Decks with fewer cores (the 1 core
+    #  source 4 decks) run as many at a time as fit on the node, so a task 
+    #  with 36 source 4 decks runs them all at once (see array_rounds()).
+    #  A continuation file (batch_array_cont.bash) that restarts the
+    #  same decks from their runtp files is written with it.
+    # Requirements for input variables:
+        # deck_names: the decks to run (eg. PNS_1e-9MeV or Run1_rand_energy)
+        # max_running: the most tasks that run at the same time (the %K of
+        #  --array), or None for no limit
+        # walltime: the time limit of each task (see write_batch_files() for
+        #  how it is scaled by the decks that run one after the other)
+        # decks_per_task: the number of decks each task runs. Slurm limits
+        #  the size of an array (MaxArraySize, 1001 by default), so large
+        #  source 4 campaigns need more than one deck per task. If there 
+        #  would be more than max_array_tasks tasks, a ValueError is raised.
+    # It returns the names of the deck list and the two batch files.
+    num_tasks = math.ceil(len(deck_names)/decks_per_task)
+    if num_tasks > max_array_tasks:
+        raise ValueError(f"{len(deck_names)} decks at {decks_per_task} per task make {num_tasks} "
+                         f"job array tasks, more than Slurm's limit of {max_array_tasks} "
+                         f"(MaxArraySize). Use a decks_per_task of at least "
+                         f"{math.ceil(len(deck_names)/max_array_tasks)}.")
+    base_name = os.path.splitext(batch_name)[0]
+    list_name = base_name + "_decks.txt"
+    with open(run_path + os.sep + dir1 + list_name,"w",newline='\n') as f:
+        f.write("".join(name + "\n" for name in deck_names))
+    at_once = min(decks_per_task, deckScheduler.cores_per_node // numCores)
+    array = "0-" + str(num_tasks - 1)
+    if max_running is not None:
+        array += "%" + str(max_running)
+    names = []
+    for continuation in (False, True):
+        name = base_name + ("_cont.bash" if continuation else ".bash")
+        sbatch_file = open(run_path + os.sep + dir1 + name,"x",newline='\n')
+        sbatch_file.write("#!/bin/csh\n")
+        sbatch_file.write("#SBATCH -N 1\n")
+        sbatch_file.write("#SBATCH -J Condon_PNS" + str(dir2) + "\n")
+        sbatch_file.write("#SBATCH -t " + walltime + "\n")
+        sbatch_file.write("#SBATCH -p pbatch\n")
+        sbatch_file.write("#SBATCH --mail-type=ALL\n")
+        sbatch_file.write("#SBATCH -A cbronze\n")
+        sbatch_file.write("#SBATCH -D /g/g20/condon3/PNS/" + dir2 + "\n")
+        sbatch_file.write("#SBATCH --array=" + array + "\n")
+        sbatch_file.write("#SBATCH -o slurm-%A_%a.out\n")
+        sbatch_file.write("\n")
+        sbatch_file.write("echo '=================Job diagnostics================='\n")
+        sbatch_file.write("date\n")
+        sbatch_file.write("echo -n 'This machine is ';hostname\n")
+        sbatch_file.write("echo -n 'My jobid is '; echo $SLURM_ARRAY_JOB_ID\n")
+        sbatch_file.write("echo -n 'My task is '; echo $SLURM_ARRAY_TASK_ID\n")
+        sbatch_file.write("echo 'My job info:'\n")
+        sbatch_file.write("squeue -j $SLURM_JOBID\n")
+        sbatch_file.write("\n")
+        sbatch_file.write("echo '=================Job Starting================='\n")
+        sbatch_file.write("@ first = $SLURM_ARRAY_TASK_ID * " + str(decks_per_task) + " + 1\n")
+        sbatch_file.write("@ last = $first + " + str(decks_per_task - 1) + "\n")
+        if at_once > 1:
+            sbatch_file.write("@ running = 0\n")
+        sbatch_file.write("foreach deck (`sed -n \"${first},${last}p\" " + dir1 + list_name + "`)\n")
+        if continuation:
+            run = "    srun -N1 -n"+str(numCores)+" mcnp6 c r=r_$deck o=out_${deck}_cont"
+        else:
+            run = "    srun -N1 -n"+str(numCores)+" mcnp6 i=$deck o=out_$deck runtpe=r_$deck"
+        if at_once > 1:
+            sbatch_file.write(run + " &\n")
+            sbatch_file.write("    @ running++\n")
+            sbatch_file.write("    if ($running == " + str(at_once) + ") then\n")
+            sbatch_file.write("        wait\n")
+            sbatch_file.write("        @ running = 0\n")
+            sbatch_file.write("    endif\n")
+        else:
+            sbatch_file.write(run + "\n")
+        sbatch_file.write("end\n")
+        if at_once > 1:
+            sbatch_file.write("wait\n")
+        sbatch_file.write("\n")
+        sbatch_file.write("echo 'Done'")
+        sbatch_file.close()
+        names.append(name)
+    return [list_name] + names
+
+def array_rounds(decks_per_task, numCores):
+    # This function returns how many decks of a job array task run one after
+    #  the other (see write_sbatch_array()). A task has a whole node, so decks
+    #  with numCores cores run cores_per_node // numCores at a time.
+    at_once = max(1, deckScheduler.cores_per_node // numCores)
+    return math.ceil(decks_per_task/at_once)
+
+def write_sbatch_packed(run_path,dir1,dir2,deck_names,nps,numCores,deck_rates=None,
+                        batch_name="batch_packed.bash"):
+    # This function writes an SBATCH file that packs the decks onto as few 
+    #  nodes as will run them all in the time limit (see 
+    #  deckScheduler.schedule_decks()). Each deck runs on numCores cores.
+    #  Decks that will take longer than the time limit on their own are 
+    #  printed, since they will need the continuation file. nps is either the
+    #  nps of every deck or {deck name: nps}.
+    # It returns the schedule.
+    if not isinstance(nps, dict):
+        nps = {name: nps for name in deck_names}
+    schedule = deckScheduler.schedule_decks({name: float(nps[name]) for name in deck_names},
+                                            deck_rates or {},numCores)
+    deckScheduler.write_sbatch_schedule(run_path,dir1,dir2,schedule,batch_name)
+    print(f"{len(deck_names)} decks packed onto {schedule['nodes']} nodes, "
+          f"about {schedule['makespan']/3600:.1f} hours")
+    if schedule['too_long']:
+        print(f"These decks won't finish in one job: {', '.join(schedule['too_long'])}")
+    return schedule
+
+def batch_file_names(batch_options, update=False):
+    # This function returns the names of the batch files of a run: 'batch' 
+    #  (the one to submit), 'cont' (its continuation file), 'chain', 'check'
+    #  and 'submit' (see continuationChain.py). An update of a run directory 
+    #  (see resume_path in write_PNS_input()) gets its own batch_update... 
+    #  files so the ones that were already run are kept.
+    batch, cont = "batch.bash", "batch_cont.bash"
+    chain, submit = "batch_chain.bash", "submit_chain.bash"
+    if update:
+        batch, cont = "batch_update.bash", "batch_update_cont.bash"
+        chain, submit = "batch_update_chain.bash", "submit_update_chain.bash"
+    if batch_options['job_array']:
+        batch = batch.replace(".bash", "_array.bash")
+        cont = batch.replace(".bash", "_cont.bash")
+    elif batch_options['packing']:
+        batch = batch.replace(".bash", "_packed.bash")
+    return {'batch': batch, 'cont': cont, 'chain': chain, 'check': chain.replace(".bash", "_check.bash"),
+            'submit': submit}
+
+def batch_walltimes(options, deck_names, plans, numCores):
+    # This function returns the time limit of the batch files that run these
+    #  decks and the time limit of the links of their continuation chain, 
+    #  from walltime in options or from the longest of the plans (see
+    #  write_batch_files()). A job array task that runs decks one after the
+    #  other (see array_rounds()) asks for that many times the time of one
+    #  deck. If that is longer than the time limit on Quartz, a ValueError is
+    #  raised.
+    walltime = chain_walltime = options['walltime']
+    rounds = array_rounds(options['decks_per_task'], numCores) if options['job_array'] else 1
+    if plans:
+        plan_list = [plans[name] for name in deck_names]
+        chain_walltime = runtimeModel.batch_walltime(plan_list)
+        walltime = runtimeModel.batch_walltime(plan_list, rounds)
+    seconds = deckScheduler.walltime_seconds(chain_walltime)*rounds
+    if rounds > 1 and seconds > deckScheduler.time_limit:
+        raise ValueError(f"Each job array task runs {rounds} decks one after the other, which "
+                         f"doesn't fit in the time limit at {chain_walltime} each. Use fewer decks "
+                         f"per task, split the decks into more sub-decks, or a shorter walltime.")
+    if not plans:
+        walltime = deckScheduler.format_walltime(seconds)
+    return walltime, chain_walltime
+
+def write_batch_files(run_path,dir1,dir2,deck_names,deck_nps,numNodes,numCores,which_source,
+                      batch_options=None,plans=None,update=False):
+    # This function writes every batch file that runs a set of decks, for 
+    #  every source. Which files are written comes from batch_options (see
+    #  default_batch_options):
+        # job_array: a Slurm job array (see write_sbatch_array()), with 
+        #  max_running, walltime and decks_per_task. walltime is the time 
+        #  of one deck (see batch_walltimes()).
+        # packing: the decks packed onto as few nodes as will finish them 
+        #  (see write_sbatch_packed()), with deck_rates
+        # otherwise: one job with a node per deck (write_sbatch() or 
+        #  write_sbatch_spectrum() for source 4). Its continuation file asks
+        #  for the same time limit.
+        # chain_depth: if more than 0, a continuation chain is written as well
+        #  (see continuationChain.py), with target_error. Its links ask for
+        #  walltime (or the longest planned deck).
+    # Requirements for input variables:
+        # deck_names: the decks to run
+        # deck_nps: {deck name: nps}
+        # plans: {deck name: plan} from runtimeModel.plan_deck(), or None. The
+        #  time limit of the batch files and the speeds for packing come from
+        #  them instead of walltime and deck_rates.
+        # update: if True, the batch_update... files are written (see 
+        #  batch_file_names()) and any that are already there are replaced.
+        #  Otherwise files that are already there are kept, so a source 4 
+        #  campaign that is picked up again keeps its batch files.
+    # A deck that isn't in deck_rates uses the rate of the deck it was split 
+    #  from (see splitSeed.py), if that one is in it.
+    # It returns the batch file names (see batch_file_names()).
+    options = dict(default_batch_options, **(batch_options or {}))
+    names = batch_file_names(options, update)
+    def missing(name):
+        filename = run_path + os.sep + dir1 + name
+        if update and os.path.exists(filename):
+            os.remove(filename)
+        return not os.path.exists(filename)
+    if not deck_names:
+        for name in names.values():
+            missing(name)
+        return names
+    walltime, chain_walltime = batch_walltimes(options,deck_names,plans,numCores)
+    deck_rates = options['deck_rates']
+    if plans and deck_rates is None:
+        deck_rates = {name: plans[name]['rate'] for name in deck_names}
+    if deck_rates is not None:
+        deck_rates = {name: deck_rates.get(name, deck_rates.get(splitSeed.base_deck_name(name)))
+                      for name in deck_names}
+        deck_rates = {name: rate for name, rate in deck_rates.items() if rate is not None}
+    bin_names = [name[len("PNS_"):] for name in deck_names]
+    if options['job_array']:
+        if missing(names['batch']) and missing(names['cont']):
+            write_sbatch_array(run_path,dir1,dir2,deck_names,numCores,options['max_running'],walltime,
+                               options['decks_per_task'],batch_name=names['batch'])
+    else:
+        if missing(names['batch']):
+            if options['packing']:
+                write_sbatch_packed(run_path,dir1,dir2,deck_names,deck_nps,numCores,deck_rates,
+                                    batch_name=names['batch'])
+            elif which_source == 4:
+                write_sbatch_spectrum(run_path,dir1,dir2,len(deck_names),
+                                      batch_name=names['batch'],walltime=walltime)
+            else:
+                write_sbatch(run_path,dir1,dir2,deck_names,bin_names,numNodes,numCores,
+                             batch_name=names['batch'],walltime=walltime)
+        if missing(names['cont']):
+            if which_source == 4:
+                write_sbatch_continuation_spectrum(run_path,dir1,dir2,len(deck_names),
+                                                   batch_name=names['cont'],walltime=walltime)
+            else:
+                write_sbatch_continuation(run_path,dir1,dir2,deck_names,bin_names,numNodes,numCores,
+                                          batch_name=names['cont'],walltime=walltime)
+    if options['chain_depth'] > 0 and all([missing(names[key]) for key in ('chain', 'check', 'submit')]):
+        continuationChain.write_chain_targets(run_path,deck_nps,options['target_error'],numCores,
+                                              options['chain_depth'],dir1 + names['chain'],
+                                              dir1 + names['check'])
+        continuationChain.write_sbatch_chain(run_path,dir1,dir2,numCores,chain_walltime,
+                                             batch_name=names['chain'])
+        continuationChain.write_sbatch_chain_check(run_path,dir1,dir2,batch_name=names['check'])
+        continuationChain.write_submit_chain(run_path,dir1,names['batch'],names['check'],names['submit'])
+    return names
+
+def write_PNS_input(Ebins,Ebin_names,sdef_list,nps,which_source,numNodes,numCores,
+                    detector_material=None,notes=None,num_spectra=1,
+                    output_root=default_output_root,
+                    transfer_directory=default_transfer_directory,
+                    master_seed=None,processes=None,resume_path=None,
+                    shared_blocks=False,result_cache=None,lint=True,
+                    runtime_model=None,fit_nps=False,split=1,split_method='hist',
+                    batch_options=None):
     # This is the main function that calls all of the other functions to write
     #  the PNS input decks and batch files.
-    sbatch_dir1 = make_today_dir()
-    path,sbatch_dir2 = make_run_dir()
+    # The inputs after numCores are optional:
+        # detector_material - the material number of the detector cells (22 
+        #  for Li-6, 2 for Au). If it is None, it is asked for.
+        # notes - the lines for the notes file. If it is None, they are typed
+        #  in (see write_run_notes()).
+        # num_spectra - the number of random spectrum decks for source 4
+        # master_seed - the seed the source 4 decks are made from (see 
+        #  write_spectrum_campaign()). A new one is drawn if this is None.
+        # processes - the number of processes that make the source 4 decks
+        # output_root - where the daily and run directories are made
+        # transfer_directory - where the run directory is copied to for 
+        #  sending to Quartz. If it is None, nothing is copied.
+        # resume_path - a run directory that was already made. No new run 
+        #  directory is made and the notes and batch files that are already 
+        #  there are kept. For source 4, this picks up a campaign that was 
+        #  stopped before it finished (see write_spectrum_campaign()). For the
+        #  other sources, the decks are made again but only the ones that 
+        #  changed (eg. after nps was changed) are rewritten (see 
+        #  store_decks()), and the decks that need to be run again get their
+        #  own batch_update.bash and batch_update_cont.bash files.
+        # shared_blocks - if True, the cell, surface, material and tally cards
+        #  are written once to shared files in the run directory and every 
+        #  deck reads them with READ cards (see write_shared_blocks())
+        # result_cache - the file of a result cache (see resultCache.py). The
+        #  decks (not for source 4) that were already run to at least this 
+        #  nps get the cached output files linked into the run directory and
+        #  are left out of the batch files.
+        # lint - if True, every deck in the run directory is checked (in 
+        #  parallel, see deckLint.py) once they are all written. If any of 
+        #  them have problems, the problems are printed and a ValueError is
+        #  raised before anything is copied to transfer_directory.
+        # runtime_model - a model from runtimeModel.build_runtime_model() (or
+        #  the file it was saved to). The ctme of each deck and the time 
+        #  limit of the batch files come from how long the deck is predicted
+        #  to take instead of ctme 57600 and walltime (see 
+        #  runtimeModel.plan_deck()), and packing uses its speeds if 
+        #  deck_rates isn't given. The plan of each deck is saved to 
+        #  deck_plans.json in the run directory.
+        # fit_nps - with runtime_model, a deck that won't finish in one job 
+        #  gets the nps that will instead of needing the continuation file.
+        # split - if more than 1, each deck (not for source 4) is split into 
+        #  this many sub-decks <deck>_s1, <deck>_s2, ... that each run 1/split
+        #  of its nps with their own RAND card (see splitSeed.py), so they 
+        #  can run as short jobs. split_method is 'hist' (each sub-deck 
+        #  starts at a different history of the same random numbers) or 
+        #  'seed' (each sub-deck has its own seed, from master_seed if it is
+        #  given). tallyDataset.build_tally_dataset() merges the sub-decks 
+        #  back into one deck. The sub-decks are always run by a job array.
+        #  Unless runtime_model or a walltime batch option is given, their 
+        #  ctme and time limit are planned from deckScheduler.default_rate
+        #  (1e10 particles in 18 hours on a node), eg. 1e10 split 12 ways
+        #  asks for 01:50:00 a sub-deck. decks_per_task is raised so the job
+        #  array has at most max_array_tasks tasks (the 84 energy bins split
+        #  12 ways run 2 sub-decks a task, 03:40:00), and a ValueError is
+        #  raised before the decks are written if a task won't fit in the 
+        #  time limit.
+        # batch_options - a dictionary with any of the keys of 
+        #  default_batch_options, which decide the batch files that are 
+        #  written (see write_batch_files()):
+            # job_array - if True, the decks are run by a Slurm job array 
+            #  (see write_sbatch_array()) instead of one job with a node per
+            #  deck. max_running, walltime (the time of one deck) and 
+            #  decks_per_task are passed on to it.
+            # packing - if True, the decks are packed onto as few nodes as 
+            #  will finish them in the time limit, longest first (see 
+            #  write_sbatch_packed() and deckScheduler.py).
+            # deck_rates - {deck name: particles per core per second} for 
+            #  packing, eg. from deckScheduler.rates_from_run_dirs(). Decks
+            #  that aren't in it get deckScheduler.default_rate.
+            # chain_depth - if more than 0, submit_chain.bash is written, 
+            #  which submits the first batch file and then up to chain_depth
+            #  continuation jobs that each check which decks aren't done and
+            #  continue only those (see continuationChain.py).
+            # target_error - with chain_depth, a deck whose tallies all have
+            #  a relative error at or below this is done even if it didn't 
+            #  get to its nps.
+    # If detector_material and notes are both given, nothing is ever asked 
+    #  for, so this can be run without anyone at the keyboard (see the 
+    #  --headless option of automatePNS.py).
+    # Every run directory gets a deck hash manifest (see write_deck_hashes()).
+    #  When it is copied to transfer_directory again, only the files that 
+    #  changed are copied (see sync_run_dir()).
+    # It returns the path of the run directory.
+    if split > 1 and which_source == 4:
+        raise ValueError("The source 4 decks are already short 1 core jobs and can't be split")
+    if split > 1 and fit_nps:
+        raise ValueError("fit_nps can't be used with split, the sub-decks already fit")
+    batch_options = dict(batch_options or {})
+    if split > 1:
+        if batch_options.get('packing'):
+            raise ValueError("The sub-decks are run as a job array, so packing can't be used with split")
+        batch_options['job_array'] = True
+        # A job array can't have more than max_array_tasks tasks, so with 
+        #  more sub-decks than that each task runs more than one
+        batch_options['decks_per_task'] = max(batch_options.get('decks_per_task', 1),
+                                              math.ceil(len(Ebins)*split/max_array_tasks))
+        # Without a runtime model or a walltime, the sub-decks are planned 
+        #  from deckScheduler.default_rate so each task asks for a short time
+        if runtime_model is None and batch_options.get('walltime') is None:
+            runtime_model = {}
+    if resume_path is None:
+        sbatch_dir1 = make_today_dir(output_root)
+        path,sbatch_dir2 = make_run_dir(output_root)
+    else:
+        path = os.path.normpath(resume_path)
+        sbatch_dir2 = os.path.basename(path)
+        sbatch_dir1 = sbatch_dir2[:10]
+    if detector_material is None:
+        detector_material = ask_detector_material()
+    if isinstance(runtime_model, str):
+        runtime_model = runtimeModel.load_runtime_model(runtime_model)
+    plans = {}
     if (which_source == 1) or (which_source == 2) or (which_source == 3) or (which_source == 5):
         num_runs = len(Ebins)
         source_text, sdef_mod, source_strength = define_which_source(which_source, Ebins, sdef_list)
-        write_run_notes(path,sbatch_dir2,num_runs,source_text)
-        write_sbatch(path,sbatch_dir1,sbatch_dir2,Ebins,Ebin_names,numNodes,numCores)
-        write_sbatch_continuation(path,sbatch_dir1,sbatch_dir2,Ebins,Ebin_names,numNodes,numCores)
+        if resume_path is None:
+            write_run_notes(path,sbatch_dir2,num_runs,source_text,notes)
+        hashes, changed = {}, []
+        if shared_blocks:
+            hashes, changed = write_shared_blocks(path,detector_material,which_source)
+        decks = {}
         for E in range(num_runs):
-            filename = "\PNS_" + Ebin_names[E]
-            initialize_PNS_deck(path,filename,Ebins[E])
-            write_cell_card(path,filename)
-            write_surf_card(path,filename,which_source)
-            write_material_card(path,filename)
-            write_source_card(path,filename,sdef_list[E],sdef_mod)
-            write_tally_card(path,filename)
-            write_print_card(path,filename,nps)
+            name = "PNS_" + Ebin_names[E]
+            if runtime_model is not None:
+                # A split deck is planned by the time of one of its sub-decks
+                plans[name] = runtimeModel.plan_deck(runtime_model,which_source,name,
+                                                     nps if split == 1 else float(nps)/split,
+                                                     numCores,fit_nps=fit_nps)
+            plan = plans.get(name, {'nps': nps, 'ctme': default_ctme})
+            decks[name] = render_PNS_deck(Ebins[E],sdef_list[E],sdef_mod,nps if split > 1 else plan['nps'],
+                                          detector_material,which_source,shared_blocks,plan['ctme'])
+        if split > 1:
+            decks = splitSeed.split_decks(decks,split,split_method,master_seed)
+            plans = {name: dict(plans[splitSeed.base_deck_name(name)], nps=resultCache.deck_nps(decks[name]))
+                     for name in decks if plans}
+            # This raises a ValueError before any deck is written if the 
+            #  tasks of the job array won't fit in the time limit
+            batch_walltimes(dict(default_batch_options, **batch_options),list(decks),plans,numCores)
+        deck_hashes, changed_decks = store_decks(path,decks)
+        hashes.update(deck_hashes)
+        # If a shared card file changed, every deck that reads it has to be
+        #  run again even though its own file is the same
+        rerun = list(decks) if changed else changed_decks
+        if result_cache is not None:
+            cached = resultCache.use_cached_results(path,{name: decks[name] for name in rerun},result_cache)
+            if cached:
+                print(f"{len(cached)} decks already have results in {result_cache} and won't be run")
+            rerun = [name for name in rerun if name not in cached]
+        write_deck_hashes(path,hashes,changed + changed_decks,rerun)
+        if resume_path is not None:
+            print(f"{len(changed + changed_decks)} files changed, {len(rerun)} decks to run again")
+        rerun = [name for name in decks if name in rerun]
+        write_batch_files(path,sbatch_dir1,sbatch_dir2,rerun,
+                          {name: resultCache.deck_nps(decks[name]) for name in rerun},
+                          numNodes,numCores,which_source,batch_options,plans,
+                          update=resume_path is not None)
     elif which_source == 4:
-        num_runs = 1
-        source_text = "The source for this is a random spectrum, more info below\n"
-        write_run_notes(path,sbatch_dir2,num_runs,source_text)
-        write_sbatch_spectrum(path,sbatch_dir1,sbatch_dir2,num_runs)
-        write_sbatch_continuation_spectrum(path,sbatch_dir1,sbatch_dir2,num_runs)
-        for i in range(num_runs):
-            filename = "\Run" + str(i+1) + "_rand_energy"
-            initialize_PNS_deck(path,filename,0)
-            write_cell_card(path,filename)
-            write_surf_card(path,filename,which_source)
-            write_material_card(path,filename)
-            source_text, sdef_mod, source_strength = define_which_source(which_source,Ebins,sdef_list)
-            append_run_notes(path,sbatch_dir2,i,source_strength)
-            write_source_card(path,filename,sdef_list[i],sdef_mod)
-            write_tally_card(path,filename)
-            write_print_card(path,filename,nps)
+        num_runs = num_spectra
+        if master_seed is None and resume_path is None:
+            master_seed = np.random.SeedSequence().entropy
+        source_text = ("The source for this is a random spectrum. The spectrum and position of each deck are in manifest.csv. "
+                       "Master seed: " + str(master_seed) + "\n")
+        if not os.path.exists(path + os.sep + 'notes_' + sbatch_dir2 + '.txt'):
+            write_run_notes(path,sbatch_dir2,num_runs,source_text,notes)
+        # Every random spectrum deck has the same plan
+        ctme = default_ctme
+        if runtime_model is not None:
+            plan = runtimeModel.plan_deck(runtime_model,4,spectrum_deck_name(0),nps,1,fit_nps=fit_nps)
+            plans = {spectrum_deck_name(i): plan for i in range(num_runs)}
+            nps, ctme = plan['nps'], plan['ctme']
+        deck_names = [spectrum_deck_name(i) for i in range(num_runs)]
+        write_batch_files(path,sbatch_dir1,sbatch_dir2,deck_names,{name: nps for name in deck_names},
+                          numNodes,1,which_source,batch_options,plans)
+        write_spectrum_campaign(path,num_runs,Ebins,nps,detector_material,master_seed,processes,
+                                shared=shared_blocks,ctme=ctme)
+    if plans:
+        with open(os.path.join(path, "deck_plans.json"), "w") as f:
+            json.dump(plans, f, indent=1)
     
+    if lint:
+        problems = deckLint.lint_decks(deckLint.find_decks(path),processes)
+        if problems:
+            deckLint.print_problems(problems)
+            raise ValueError(f"{len(problems)} decks in {path} have problems, see above")
+
     # Copy files from cloud-saved directory to a directory for transferring to 
     #  LLNL's quartz computer.
-    source_directory = path
-    destination_directory = 'C:\\Users\\zacht\\AppData\\Local\\Packages\\CanonicalGroupLimited.Ubuntu20.04onWindows_79rhkp1fndgsc\\LocalState\\rootfs\\home\\zach\\Research\\quartzTransfer\\' + sbatch_dir2
-    shutil.copytree(source_directory,destination_directory)
\ No newline at end of file
+    if transfer_directory is not None:
+        destination_directory = os.path.join(transfer_directory, sbatch_dir2)
+        sync_run_dir(path,destination_directory)
+    return path
@@ -0,0 +1,136 @@
+# This script watches the output files of MCNP runs while they are still
+#  running on Quartz. Each time it polls, it only reads the part of each output
+#  file that was written since the last poll and keeps the latest tally
+#  fluctuation chart values for each tally. This lets me see which energy bins
+#  are noisy or already converged before the 23.5 hour job is over, so those
+#  jobs can be cancelled or shortened.
+# To run it from the run directory on Quartz:
+    # python monitorMCNP.py . --target-error 0.01 --interval 600
+
+import argparse
+import os
+import time
+import numpy as np
+import ScrapeMCNP as scrape
+
+def new_tail_state():
+    # This function makes the dictionary that keeps track of one output file
+    #  between polls.
+        # offset: how many bytes of the file have been read so far
+        # partial: the end of the last read that wasn't a whole line yet
+        # parse: the ScrapeMCNP parse state the lines are fed into
+    return {'offset': 0, 'partial': b'', 'parse': scrape.new_parse_state()}
+
+def poll_out_file(tail_state, filename):
+    # This function reads whatever was added to an output file since the last
+    #  time it was polled and feeds the new whole lines to the parser. It
+    #  returns the number of new bytes. If the file got smaller (for example
+    #  the run was restarted and the output file was rewritten), it is read
+    #  again from the beginning.
+    size = os.path.getsize(filename)
+    if size < tail_state['offset']:
+        tail_state.update(new_tail_state())
+    if size == tail_state['offset']:
+        return 0
+    with open(filename, 'rb') as myfile:
+        myfile.seek(tail_state['offset'])
+        new_bytes = myfile.read(size - tail_state['offset'])
+    tail_state['offset'] += len(new_bytes)
+    lines = (tail_state['partial'] + new_bytes).split(b'\n')
+    tail_state['partial'] = lines.pop()
+    for line in lines:
+        scrape.feed_line(tail_state['parse'], line.decode('ascii', 'replace'))
+    return len(new_bytes)
+
+def tally_status(tail_state, target_error, tallies=None):
+    # This function summarizes the latest tally fluctuation chart values of
+    #  one output file. By default all 55 F6 tallies (the Li-6 TLDs) are
+    #  checked; tallies can be a list of tally numbers to only check some.
+    # It returns a dictionary with:
+        # nps: the latest nps in the tally fluctuation charts (-1 if none yet)
+        # max_error: the largest relative error of the checked tallies
+        # min_fom: the smallest figure of merit of the checked tallies
+        # converged: True if every checked tally is at or below target_error
+        # nps_needed: estimated nps for the worst tally to reach target_error
+        #  (see ScrapeMCNP.particles_needed)
+    current = scrape.parse_state_to_array(tail_state['parse'])
+    if tallies is not None:
+        current = current[np.isin(current['tally'], tallies)]
+    found = current['nps'] > 0
+    if not found.any():
+        return {'nps': -1, 'max_error': np.nan, 'min_fom': np.nan,
+                'converged': False, 'nps_needed': np.nan}
+    current = current[found]
+    nps = int(current['nps'].max())
+    max_error = float(current['error'].max())
+    return {'nps': nps,
+            'max_error': max_error,
+            'min_fom': float(current['fom'].min()),
+            'converged': bool(found.all() and max_error <= target_error),
+            'nps_needed': nps*(max_error/target_error)**2}
+
+def recommendation(name, status, target_error, deck_nps=None):
+    # This function turns the status of one run into a line of text saying
+    #  what should be done with it.
+    if status['nps'] < 0:
+        return f"{name}: no tally fluctuation chart yet"
+    text = (f"{name}: nps {status['nps']:.3g}, worst error "
+            f"{status['max_error']:.4f}, worst fom {status['min_fom']:.3g}")
+    if status['converged']:
+        return text + f" -> all tallies at or below {target_error} - can be stopped early"
+    if deck_nps is not None and status['nps_needed'] > deck_nps:
+        return text + (f" -> needs about {status['nps_needed']:.2g} particles,"
+                       f" more than the deck's {deck_nps:.2g}")
+    return text + f" -> needs about {status['nps_needed']:.2g} particles"
+
+def monitor_run_dir(run_dir, target_error=0.01, poll_interval=600,
+                    max_polls=None, deck_nps=None, tallies=None):
+    # This function polls every output file in a run directory (see
+    #  ScrapeMCNP.find_out_files, leaving out compressed ones since those runs
+    #  are finished) every poll_interval seconds and prints a
+    #  recommendation for each one. It stops when every run has converged,
+    #  after max_polls polls, or when it is interrupted with ctrl-c. The latest
+    #  statuses are returned as {filename: status}.
+    # Requirements for input variables:
+        # run_dir: the run directory (or a list of them)
+        # target_error: the relative error that counts as converged
+        # poll_interval: seconds between polls
+        # deck_nps: the nps on the decks' nps card, used to flag runs that
+        #  won't reach target_error before they finish
+        # tallies: the tally numbers to check (all 55 if None)
+    tail_states = {}
+    statuses = {}
+    polls = 0
+    try:
+        while True:
+            for filename in scrape.find_out_files(run_dir):
+                if os.path.splitext(filename)[1] in scrape.compressed_extensions:
+                    continue
+                tail_state = tail_states.setdefault(filename, new_tail_state())
+                poll_out_file(tail_state, filename)
+                statuses[filename] = tally_status(tail_state, target_error,
+                                                  tallies)
+            print(time.strftime('%Y-%m-%d %H:%M:%S'))
+            for filename, status in statuses.items():
+                print('    ' + recommendation(os.path.basename(filename), status,
+                                              target_error, deck_nps))
+            polls += 1
+            if statuses and all(status['converged'] for status in statuses.values()):
+                break
+            if max_polls is not None and polls >= max_polls:
+                break
+            time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        pass
+    return statuses
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Watch running MCNP output files.')
+    parser.add_argument('run_dirs', nargs='+')
+    parser.add_argument('--target-error', type=float, default=0.01)
+    parser.add_argument('--interval', type=float, default=600)
+    parser.add_argument('--max-polls', type=int, default=None)
+    parser.add_argument('--nps', type=float, default=None)
+    args = parser.parse_args()
+    monitor_run_dir(args.run_dirs, args.target_error, args.interval,
+                    args.max_polls, args.nps)
@@ -0,0 +1,184 @@
+# This script keeps track of which input decks have already been simulated so
+#  the same deck is never run on Quartz twice. The same decks get made over and
+#  over in different run directories (eg. running the source 1 or source 5
+#  response sets again), and each one that doesn't have to be run saves up to
+#  36 cores for 18 hours.
+# The cache is a text file with one JSON object per line. Each line is one deck
+#  that has finished:
+    # key: the sha256 of the deck's normalized text (see normalize_deck)
+    # deck: the name of the deck
+    # out_file: the output file with the deck's final results
+    # nps: the nps that the output file got to
+# The normalized text leaves out the title, comments, spacing, line wrapping,
+#  capitalization and the nps/ctme/prdmp cards, and the files on READ cards
+#  are put in, so two decks have the same key when MCNP would simulate the
+#  same thing. A cached result is only used for a deck if it got to at least
+#  the deck's nps.
+# Example:
+    # index_run_dirs(glob.glob('2023-*/2023-*'), 'result_cache.jsonl')
+    # python automatePNS.py --headless --which-source 1 --result-cache result_cache.jsonl
+
+import json
+import os
+import re
+import shutil
+import hashlib
+import ScrapeMCNP as scrape
+import tallyDataset as dataset
+
+comment_pattern = re.compile(r"^ {0,4}c( |$)")
+read_card_pattern = re.compile(r"^read +file *= *(\S+)", re.I)
+run_control_pattern = re.compile(r"^(nps|ctme|prdmp)( |$)")
+separator_pattern = re.compile(r" ?([():]) ?")
+nps_card_pattern = re.compile(r"^ *nps +(\S+)", re.I | re.M)
+
+def normalize_deck(deck_text, directory='.'):
+    # This function returns the text of a deck with everything that doesn't
+    #  change the simulation taken out (see the top of the file). A card that
+    #  goes on for more than one line (with & or 5 spaces) is put on one line
+    #  and the spaces around ( ) : are taken out, so the same card wrapped
+    #  differently gives the same text. Files on READ cards are looked for in
+    #  directory (the run directory of the deck).
+    lines = []
+    continued = False
+    for line in deck_text.splitlines()[1:]:
+        if comment_pattern.match(line.lower()):
+            continue
+        # File names are the only thing that keeps its capitalization
+        read_card = read_card_pattern.match(" ".join(line.split()))
+        text = line.lower().split("$")[0]
+        words = " ".join(text.split())
+        if not words:
+            continued = False
+            continue
+        if lines and (continued or text.startswith("     ")):
+            lines[-1] += " " + words
+        elif read_card:
+            with open(os.path.join(directory, read_card.group(1)), "r") as f:
+                # The title line of the deck is skipped, so one is added for
+                #  the file that is read in
+                lines.extend(normalize_deck("\n" + f.read(), directory).split("\n"))
+            continue
+        else:
+            lines.append(words)
+        continued = lines[-1].endswith("&")
+        if continued:
+            lines[-1] = lines[-1][:-1].rstrip()
+    lines = [separator_pattern.sub(r"\1", line) for line in lines
+             if line and not run_control_pattern.match(line)]
+    return "\n".join(lines)
+
+def deck_key(deck_text, directory='.'):
+    # This function returns the cache key of a deck (see normalize_deck).
+    return hashlib.sha256(normalize_deck(deck_text, directory).encode()).hexdigest()
+
+def deck_nps(deck_text):
+    # This function returns the nps on a deck's nps card as a float, or None if
+    #  the deck doesn't have one.
+    nps_card = nps_card_pattern.search(deck_text)
+    if nps_card is None:
+        return None
+    return float(nps_card.group(1))
+
+def load_result_cache(cache_path):
+    # This function reads the cache. If a deck is in it more than once, the
+    #  entry with the largest nps is kept. It returns {key: entry}.
+    cache = {}
+    if not os.path.exists(cache_path):
+        return cache
+    with open(cache_path, "r") as f:
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except json.JSONDecodeError:
+                continue
+            if entry['key'] not in cache or entry['nps'] > cache[entry['key']]['nps']:
+                cache[entry['key']] = entry
+    return cache
+
+def index_run_dirs(run_dirs, cache_path, processes=None, scrape_cache=None):
+    # This function adds the finished decks of run directories to the cache.
+    #  Every deck with an output file is scraped (in parallel, see
+    #  ScrapeMCNP.scrape_files) to find the nps it got to. Decks that are
+    #  already in the cache with at least that nps are skipped.
+    # Requirements for input variables:
+        # run_dirs: a run directory or a list of them
+        # cache_path: the cache file, it is made if it isn't there
+        # scrape_cache: passed on to ScrapeMCNP.scrape_files
+    # It returns the number of entries that were added.
+    if isinstance(run_dirs, str):
+        run_dirs = [run_dirs]
+    cache = load_result_cache(cache_path)
+    decks = []
+    for run_dir in run_dirs:
+        for filename in scrape.find_out_files(run_dir):
+            if '_cont' in os.path.basename(filename):
+                continue
+            deck = scrape.deck_name_from_out_file(filename)
+            deck_file = os.path.join(run_dir, deck)
+            if os.path.exists(deck_file):
+                with open(deck_file, "r") as f:
+                    key = deck_key(f.read(), run_dir)
+                decks.append((key, deck, dataset.latest_out_file(run_dir, deck)))
+    results = scrape.scrape_files([out_file for key, deck, out_file in decks],
+                                  processes, scrape_cache)
+    added = 0
+    with open(cache_path, "a") as f:
+        for (key, deck, out_file), (filename, tallies, error) in zip(decks, results):
+            if error is not None or tallies['nps'].max() <= 0:
+                continue
+            nps = int(tallies['nps'].max())
+            if key in cache and cache[key]['nps'] >= nps:
+                continue
+            entry = {'key': key, 'deck': deck, 'out_file': os.path.abspath(out_file),
+                     'nps': nps}
+            f.write(json.dumps(entry) + "\n")
+            cache[key] = entry
+            added += 1
+    return added
+
+def find_cached_results(run_path, decks, cache_path):
+    # This function looks up decks ({deck name: deck text}) in the cache. It
+    #  returns {deck name: cache entry} for the decks that have a cached result
+    #  with at least the nps on their nps card and whose output file is still
+    #  there.
+    cache = load_result_cache(cache_path)
+    found = {}
+    for name, deck_text in decks.items():
+        entry = cache.get(deck_key(deck_text, run_path))
+        nps = deck_nps(deck_text)
+        if entry is None or nps is None or entry['nps'] < nps:
+            continue
+        if os.path.exists(entry['out_file']):
+            found[name] = entry
+    return found
+
+def link_cached_result(entry, run_path, deck):
+    # This function puts a cached output file in a run directory as
+    #  out_<deck> (keeping a compressed file's extension) so it is scraped
+    #  like the other decks. A hard link is made if it can be, otherwise the
+    #  file is copied.
+    extension = os.path.splitext(entry['out_file'])[1]
+    if extension not in scrape.compressed_extensions:
+        extension = ''
+    target = os.path.join(run_path, 'out_' + deck + extension)
+    if os.path.lexists(target):
+        os.remove(target)
+    try:
+        os.link(entry['out_file'], target)
+    except OSError:
+        shutil.copy2(entry['out_file'], target)
+    return target
+
+def use_cached_results(run_path, decks, cache_path):
+    # This function links the cached results of decks ({deck name: deck text})
+    #  into a run directory (see find_cached_results and link_cached_result)
+    #  and writes the list of them to cached_results.json in the run
+    #  directory. It returns the names of the decks that don't have to be run.
+    found = find_cached_results(run_path, decks, cache_path)
+    for name, entry in found.items():
+        link_cached_result(entry, run_path, name)
+    if found:
+        with open(os.path.join(run_path, 'cached_results.json'), "w") as f:
+            json.dump(found, f, indent=1)
+    return sorted(found)
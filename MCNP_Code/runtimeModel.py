@@ -0,0 +1,178 @@
+# This script predicts how long a deck will take on Quartz from how long the
+#  same kind of deck took before. The only calibration there was is that 1e10
+#  particles take about 18 hours, but the speed depends a lot on the source
+#  and the energy bin, so every deck was given ctme 57600 and 23:30:00 and
+#  either waited in the queue for time it didn't use or timed out and needed
+#  the continuation file.
+# The model is the speed (particles per core per second) of every earlier
+#  run, read from the nps and computer time in its out file (see
+#  deckScheduler.read_run_time), grouped by:
+    # source: the source type of the run directory (from its notes file)
+    # deck: the energy bin deck (PNS_<bin>), or rand_energy for source 4
+    # cores: the cores the run used
+# If there is more than one run in a group, the median speed is used. A deck
+#  that has no run of its own with the same cores uses the runs of the same
+#  deck with any cores, then the runs of the same source, then
+#  deckScheduler.default_rate (see predict_rate).
+# plan_deck turns a prediction into the nps, ctme and #SBATCH -t of a deck.
+# Example:
+    # model = build_runtime_model(glob.glob('2023-*/2023-*'))
+    # save_runtime_model(model, 'runtime_model.json')
+    # python runtimeModel.py runtime_model.json 2023-*/2023-*
+    # python automatePNS.py --runtime-model runtime_model.json
+
+import argparse
+import os
+import re
+import json
+import glob
+import math
+import numpy as np
+import ScrapeMCNP as scrape
+import deckScheduler
+
+source_pattern = re.compile(r"Source information\s*Source (\d)")
+spectrum_pattern = re.compile(r"Source information\s*The source for this is a random spectrum")
+spectrum_deck_pattern = re.compile(r"^Run\d+_rand_energy$")
+
+# The cores a deck of each source runs on, for out files that don't say (an
+#  MPI run prints its subtasks, a run with srun -n1 doesn't). The random
+#  spectrum decks (source 4) run on one core and the others on a whole node.
+source_cores = {4: 1}
+
+# MCNP stops at ctme and still has to write the final tallies and runtpe, so
+#  the job asks for this many seconds more than ctme
+ctme_headroom = 600
+
+def run_dir_source(run_dir):
+    # This function returns the source type (1 to 5) of a run directory from
+    #  the "Source information" line of its notes file, or None if it doesn't
+    #  have one.
+    for filename in glob.glob(os.path.join(run_dir, 'notes_*.txt')):
+        with open(filename, "r") as f:
+            text = f.read()
+        match = source_pattern.search(text)
+        if match:
+            return int(match.group(1))
+        if spectrum_pattern.search(text):
+            return 4
+    return None
+
+def deck_group(deck):
+    # This function returns the deck name the model groups a deck under. The
+    #  random spectrum decks are all grouped together.
+    if spectrum_deck_pattern.match(deck):
+        return 'rand_energy'
+    return deck
+
+def collect_run_times(run_dirs, cores=None):
+    # This function reads the run time of every out file (not the
+    #  continuations) in one or more run directories. cores is used for out
+    #  files that don't say how many cores they ran on, or if it is None, the
+    #  cores of their source (see source_cores). It returns a list of
+    #  (source, deck, cores, nps, seconds), leaving out run directories whose
+    #  source isn't known.
+    if isinstance(run_dirs, str):
+        run_dirs = [run_dirs]
+    runs = []
+    for run_dir in run_dirs:
+        source = run_dir_source(run_dir)
+        if source is None:
+            continue
+        for filename in scrape.find_out_files(run_dir):
+            if '_cont' in os.path.basename(filename):
+                continue
+            try:
+                run_time = deckScheduler.read_run_time(filename)
+            except (OSError, EOFError, ValueError):
+                continue
+            if run_time is None or run_time[0] <= 0 or run_time[1] <= 0:
+                continue
+            nps, seconds, run_cores = run_time
+            deck = deck_group(scrape.deck_name_from_out_file(filename))
+            if run_cores is None:
+                run_cores = cores or source_cores.get(source, deckScheduler.cores_per_node)
+            runs.append((source, deck, run_cores, nps, seconds))
+    return runs
+
+def build_runtime_model(run_dirs, cores=None):
+    # This function builds the model from the out files in run_dirs (see
+    #  collect_run_times). It returns {(source, deck, cores): speed}.
+    speeds = {}
+    for source, deck, run_cores, nps, seconds in collect_run_times(run_dirs, cores):
+        speeds.setdefault((source, deck, run_cores), []).append(nps/(seconds*run_cores))
+    return {key: float(np.median(values)) for key, values in speeds.items()}
+
+def save_runtime_model(model, filename):
+    # This function saves a model as JSON (one entry per group).
+    with open(filename, "w") as f:
+        json.dump([{'source': source, 'deck': deck, 'cores': cores, 'rate': rate}
+                   for (source, deck, cores), rate in sorted(model.items())], f, indent=1)
+
+def load_runtime_model(filename):
+    # This function reads a model saved by save_runtime_model.
+    with open(filename, "r") as f:
+        return {(entry['source'], entry['deck'], entry['cores']): entry['rate']
+                for entry in json.load(f)}
+
+def predict_rate(model, source, deck, cores):
+    # This function returns (speed, basis) for a deck, where basis says which
+    #  runs the speed came from (see the top of the file).
+    deck = deck_group(deck)
+    if (source, deck, cores) in model:
+        return model[(source, deck, cores)], 'deck'
+    levels = ((lambda key: key[0] == source and key[1] == deck, 'deck, other cores'),
+              (lambda key: key[0] == source, 'source'))
+    for matches, basis in levels:
+        rates = [rate for key, rate in model.items() if matches(key)]
+        if rates:
+            return float(np.median(rates)), basis
+    return deckScheduler.default_rate, 'default'
+
+def plan_deck(model, source, deck, nps, cores, limit=deckScheduler.time_limit,
+              margin=deckScheduler.time_margin, fit_nps=False):
+    # This function decides the nps, ctme and time limit of one deck.
+    #  The job asks for the predicted time times margin plus ctme_headroom
+    #  (rounded up to 10 minutes, and never more than limit), and ctme is set
+    #  ctme_headroom before the end of the job so MCNP stops on its own and
+    #  writes its results instead of being killed.
+    # A deck that is predicted to take longer than limit keeps its nps (the
+    #  continuation file finishes it) unless fit_nps is True, in which case
+    #  nps is lowered to what fits in one job.
+    # It returns a dictionary with nps, ctme (minutes), walltime (HH:MM:SS),
+    #  seconds (the predicted run time), rate and basis (see predict_rate).
+    rate, basis = predict_rate(model, source, deck, cores)
+    seconds = deckScheduler.deck_seconds(nps, rate, cores)
+    if fit_nps and seconds*margin + ctme_headroom > limit:
+        fitted = rate*cores*(limit - ctme_headroom)/margin
+        # Two significant figures, rounded down so it still fits
+        exponent = math.floor(math.log10(fitted))
+        nps = format(math.floor(fitted/10**(exponent - 1))/10, 'g') + "e" + str(exponent)
+        seconds = deckScheduler.deck_seconds(nps, rate, cores)
+    job_seconds = min(seconds*margin + ctme_headroom, limit)
+    walltime = deckScheduler.format_walltime(job_seconds, limit)
+    hours, minutes = walltime.split(':')[:2]
+    ctme = max(1, int(hours)*60 + int(minutes) - ctme_headroom//60)
+    return {'nps': nps, 'ctme': ctme, 'walltime': walltime, 'seconds': seconds,
+            'rate': rate, 'basis': basis}
+
+def batch_walltime(plans, decks_per_task=1, limit=deckScheduler.time_limit,
+                   margin=deckScheduler.time_margin):
+    # This function returns the time limit of a batch file that runs decks
+    #  with these plans (a list of plan_deck results) at the same time, with
+    #  decks_per_task of them one after the other (see 
+    #  generateModel.array_rounds()).
+    longest = max(plan['seconds'] for plan in plans)
+    return deckScheduler.format_walltime((longest*margin + ctme_headroom)*decks_per_task, limit)
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Build a runtime model from the out files of earlier runs.')
+    parser.add_argument('model', help='the file the model is saved to')
+    parser.add_argument('run_dirs', nargs='+', help='run directories with out files')
+    parser.add_argument('--cores', type=int,
+                        help="cores of runs whose out files don't say (1 for source 4 and 36 for the others by default)")
+    args = parser.parse_args()
+    model = build_runtime_model(args.run_dirs, args.cores)
+    save_runtime_model(model, args.model)
+    for (source, deck, cores), rate in sorted(model.items()):
+        print(f"source {source}  {deck:20s} {cores:3d} cores  {rate:10.1f} particles per core per second")
@@ -0,0 +1,121 @@
+# This script splits one deck into K sub-decks that each run 1/K of its
+#  particles, so an 18 hour deck can be run as K short jobs that fit in the
+#  backfill slots on Quartz instead of waiting for a whole day on a node. This
+#  is instead of running one deck on more than one node, which would need
+#  changes to the decks themselves.
+# Each sub-deck <deck>_s<i> gets its own RAND card so the sub-decks don't run
+#  the same particles:
+    # 'hist' (the default): every sub-deck starts at a different history of
+    #  the same random number sequence (RAND HIST=), so sub-deck i runs
+    #  exactly the histories that the one long run would have run as its
+    #  i-th part. The merged result is the long run's result.
+    # 'seed': every sub-deck gets its own odd SEED (from master_seed, or
+    #  from the text of the deck so making it again gives the same seeds), with
+    #  the deck's stride. The streams aren't guaranteed not to overlap, but
+    #  the sequence has 2^46 numbers so they practically never do.
+#  The dbcn card of the deck already sets the starting history and stride,
+#  so it is replaced by the RAND card.
+# The tallies of the sub-decks are merged with ScrapeMCNP.merge_tallies (the
+#  nps weighted mean and its error), which tallyDataset.build_tally_dataset
+#  does by itself for split decks.
+# Example:
+    # sub_decks = split_deck('PNS_1e-9MeV', deck_text, 12)
+    # tallies = scrape_split_deck(run_dir, 'PNS_1e-9MeV')
+
+import re
+import hashlib
+import numpy as np
+import ScrapeMCNP as scrape
+import tallyDataset as dataset
+
+split_suffix = "_s"
+split_methods = ('hist', 'seed')
+sub_deck_pattern = re.compile(split_suffix + r"\d+$")
+nps_card_pattern = re.compile(r"^nps +(\S+) *$", re.I | re.M)
+dbcn_card_pattern = re.compile(r"^dbcn\b.*\n", re.I | re.M)
+# MCNP's default stride, used if the deck doesn't set one on its dbcn card
+default_stride = 152917
+
+def split_nps(nps, k):
+    # This function splits nps into k whole numbers of particles that add up
+    #  to it (the first ones get one more if it doesn't divide evenly).
+    nps = int(float(nps))
+    if nps < k:
+        raise ValueError(f"nps {nps} can't be split into {k} sub-decks")
+    return [nps//k + (i < nps % k) for i in range(k)]
+
+def dbcn_stride(deck_text):
+    # This function returns the random number stride set by the 13th entry
+    #  of the deck's dbcn card (nj skips n entries), or default_stride.
+    match = dbcn_card_pattern.search(deck_text)
+    if match is None:
+        return default_stride
+    entries = []
+    for word in match.group(0).split('$')[0].split()[1:]:
+        if word.lower().endswith('j'):
+            entries.extend([None]*int(word[:-1] or 1))
+        else:
+            entries.append(word)
+    if len(entries) > 12 and entries[12] is not None:
+        return int(float(entries[12]))
+    return default_stride
+
+def split_seeds(k, master_seed=None):
+    # This function returns k different odd seeds (less than 2^48, the size
+    #  of MCNP's default generator) made from master_seed.
+    state = np.random.SeedSequence(master_seed).generate_state(k, dtype=np.uint64)
+    return [int(value) % 2**47 * 2 + 1 for value in state]
+
+def split_deck_names(deck, k):
+    # This function returns the names of the k sub-decks of a deck.
+    return [deck + split_suffix + str(i+1) for i in range(k)]
+
+def base_deck_name(name):
+    # This function returns the name of the deck a sub-deck was split from,
+    #  or the name itself if it isn't a sub-deck.
+    return sub_deck_pattern.sub("", name)
+
+def split_deck(deck, deck_text, k, method='hist', master_seed=None):
+    # This function splits the text of one deck (with an nps card, see
+    #  generateModel.render_print_card) into k sub-decks. It returns
+    #  {sub-deck name: text}.
+    if method not in split_methods:
+        raise ValueError(f"method must be one of {split_methods}, not {method!r}")
+    nps_card = nps_card_pattern.search(deck_text)
+    if nps_card is None:
+        raise ValueError(f"{deck} has no nps card to split")
+    stride = dbcn_stride(deck_text)
+    parts = split_nps(nps_card.group(1), k)
+    if master_seed is None:
+        master_seed = int(hashlib.sha256(deck_text.encode()).hexdigest(), 16)
+    seeds = split_seeds(k, master_seed) if method == 'seed' else None
+    text = dbcn_card_pattern.sub("", deck_text)
+    nps_card = nps_card_pattern.search(text)
+    sub_decks = {}
+    first = 1
+    for i, name in enumerate(split_deck_names(deck, k)):
+        if method == 'hist':
+            rand = "RAND GEN=1 STRIDE=" + str(stride) + " HIST=" + str(first)
+        else:
+            rand = "RAND GEN=1 STRIDE=" + str(stride) + " SEED=" + str(seeds[i])
+        sub_decks[name] = (text[:nps_card.start()] + rand + "\n" + "nps  " + str(parts[i])
+                           + text[nps_card.end():])
+        first += parts[i]
+    return sub_decks
+
+def split_decks(decks, k, method='hist', master_seed=None):
+    # This function splits every deck of {deck name: text} (see split_deck).
+    #  With the 'seed' method, each deck gets its own seeds.
+    sub_decks = {}
+    for n, (deck, deck_text) in enumerate(decks.items()):
+        seed = None if master_seed is None else [master_seed, n]
+        sub_decks.update(split_deck(deck, deck_text, k, method, seed))
+    return sub_decks
+
+def scrape_split_deck(run_dir, deck):
+    # This function scrapes the final output file of every sub-deck of a
+    #  deck and returns their merged tallies (see ScrapeMCNP.merge_tallies).
+    filenames = dataset.split_out_files(run_dir, deck)
+    if not filenames:
+        raise ValueError(f"{deck} has no sub-decks in {run_dir}")
+    return scrape.merge_tallies([scrape.scrape_out_file(filename) for filename in filenames])
@@ -0,0 +1,189 @@
+# This script contains the functions that save and load the scraped tally
+#  results as one binary dataset instead of CSV and pickle files.
+# A dataset is made of three files that share a base name:
+    # <name>.npy          - float array with shape (runs, decks, 55 tallies, 4)
+    #                       where the last axis is (mean, error, vov, slope).
+    #                       For the energy bin runs there are 84 decks per run.
+    # <name>_checks.npy   - int16 array with shape (runs, decks, 55) holding the
+    #                       number of statistical checks each tally passed.
+    # <name>.json         - the run names, deck names, tally numbers, field
+    #                       names and nps that go with the two arrays.
+# The arrays are loaded with memory-mapping, so taking one tally across all of
+#  the energy bins (data[run, :, tally, 0]) doesn't read the rest of the file.
+
+import re
+import glob
+import json
+import os
+import numpy as np
+import ScrapeMCNP as scrape
+
+dataset_fields = ('mean', 'error', 'vov', 'slope')
+
+def latest_out_file(run_dir, deck):
+    # This function returns the output file with the final results of a deck.
+    #  If the run was continued with the batch_cont file, the continuation's 
+    #  output (out_<deck>_cont) has the final tallies, otherwise it is 
+    #  out_<deck>. If it was run by a continuation chain, the last link's
+    #  output (out_<deck>_cont<N>, see continuationChain.py) has them. Any of
+    #  them may have been compressed (see ScrapeMCNP.compress_out_file).
+    filename = os.path.join(run_dir, 'out_' + deck)
+    links = set()
+    for name in glob.glob(glob.escape(filename) + '_cont[0-9]*'):
+        match = re.match(r"_cont(\d+)", name[len(filename):])
+        if match:
+            links.add(int(match.group(1)))
+    names = [filename + '_cont' + str(link) for link in sorted(links, reverse=True)]
+    for name in names + [filename + '_cont', filename]:
+        for extension in [''] + list(scrape.compressed_extensions):
+            if os.path.exists(name + extension):
+                return name + extension
+    return filename
+
+def split_out_files(run_dir, deck):
+    # This function returns the final output file of each sub-deck of a deck
+    #  that was split into <deck>_s1, <deck>_s2, ... (see splitSeed.py), in
+    #  order, or an empty list if the deck wasn't split.
+    parts = []
+    for name in glob.glob(os.path.join(glob.escape(run_dir), glob.escape(deck) + '_s[0-9]*')):
+        match = re.match(r"_s(\d+)$", os.path.basename(name)[len(deck):])
+        if match:
+            parts.append(int(match.group(1)))
+    return [latest_out_file(run_dir, deck + '_s' + str(part)) for part in sorted(parts)]
+
+def save_tally_dataset(dataset_path, data, checks, run_names, deck_names,
+                       nps=None):
+    # This function saves an already built dataset.
+    # Requirements for input variables:
+        # dataset_path: the base name of the dataset files (no extension)
+        # data: array with shape (runs, decks, 55, 4), see the top of the file
+        # checks: array with shape (runs, decks, 55)
+        # run_names: a list with the name of each run (eg. the run directory)
+        # deck_names: a list with the name of each deck (eg. 'PNS_1e-9MeV')
+        # nps: optional array with shape (runs, decks) of the nps of each deck
+    data = np.asarray(data)
+    if data.shape != (len(run_names), len(deck_names), len(scrape.tally_numbers),
+                      len(dataset_fields)):
+        raise ValueError(f'data has shape {data.shape}, which does not match '
+                         f'{len(run_names)} runs and {len(deck_names)} decks')
+    np.save(dataset_path + '.npy', data)
+    np.save(dataset_path + '_checks.npy', np.asarray(checks, dtype='i2'))
+    if nps is None:
+        nps = np.full(data.shape[:2], -1, dtype='i8')
+    write_dataset_metadata(dataset_path, data.shape, data.dtype, run_names,
+                           deck_names, nps)
+
+def write_dataset_metadata(dataset_path, shape, dtype, run_names, deck_names,
+                           nps):
+    # This function writes the .json file that goes with a dataset.
+    metadata = {'shape': list(shape),
+                'dtype': np.dtype(dtype).str,
+                'fields': list(dataset_fields),
+                'tallies': [int(tally) for tally in scrape.tally_numbers],
+                'runs': [str(run) for run in run_names],
+                'decks': [str(deck) for deck in deck_names],
+                'nps': np.asarray(nps).tolist()}
+    with open(dataset_path + '.json', 'w') as f:
+        json.dump(metadata, f, indent=1)
+
+def build_tally_dataset(run_dirs, dataset_path, deck_names=None,
+                        dtype='float64', processes=None, cache_file=None):
+    # This function scrapes a list of run directories (in parallel, see
+    #  ScrapeMCNP.scrape_files) and writes them straight into a dataset. Each
+    #  run directory becomes one run of the dataset.
+    # Requirements for input variables:
+        # run_dirs: a list of run directories
+        # dataset_path: the base name of the dataset files (no extension)
+        # deck_names: the decks to put in the dataset, in order. If this is
+        #  None, the decks in the first run directory are used (a split deck
+        #  once, under its own name). For the energy
+        #  bin runs, this should be ['PNS_'+name for name in E_bin_names] so
+        #  the decks are in energy order.
+        # dtype: 'float64' or 'float32' (float32 is half the size)
+        # cache_file: passed on to ScrapeMCNP.scrape_files
+    # A deck that was split into sub-decks (see splitSeed.py) gets the merged
+    #  tallies of its sub-decks (see ScrapeMCNP.merge_tallies).
+    # Decks that are missing or couldn't be scraped are left as NaN in the
+    #  data and -1 in the checks. The list of files that couldn't be scraped is
+    #  returned.
+    if isinstance(run_dirs, str):
+        run_dirs = [run_dirs]
+    if deck_names is None:
+        deck_names = list(dict.fromkeys(re.sub(r"_s\d+$", "", scrape.deck_name_from_out_file(filename))
+                                        for filename in scrape.find_out_files(run_dirs[0])
+                                        if '_cont' not in os.path.basename(filename)))
+    shape = (len(run_dirs), len(deck_names), len(scrape.tally_numbers),
+             len(dataset_fields))
+    data = np.lib.format.open_memmap(dataset_path + '.npy', mode='w+',
+                                     dtype=dtype, shape=shape)
+    data[...] = np.nan
+    checks = np.full(shape[:3], -1, dtype='i2')
+    nps = np.full(shape[:2], -1, dtype='i8')
+
+    deck_files = []
+    for run_dir in run_dirs:
+        for deck in deck_names:
+            filename = latest_out_file(run_dir, deck)
+            parts = [] if os.path.exists(filename) else split_out_files(run_dir, deck)
+            deck_files.append(parts or [filename])
+    results = iter(scrape.scrape_files([filename for files in deck_files for filename in files],
+                                       processes, cache_file))
+    failed = []
+    for n, files in enumerate(deck_files):
+        run, deck = divmod(n, len(deck_names))
+        part_results = [next(results) for filename in files]
+        errors = [(filename, error) for filename, tallies, error in part_results
+                  if error is not None]
+        if errors:
+            failed.extend(errors)
+            continue
+        if len(part_results) == 1:
+            tallies = part_results[0][1]
+        else:
+            tallies = scrape.merge_tallies([tallies for filename, tallies, error in part_results])
+        for k, field in enumerate(dataset_fields):
+            data[run, deck, :, k] = tallies[field]
+        checks[run, deck] = tallies['checks']
+        nps[run, deck] = tallies['nps'].max()
+    data.flush()
+    del data
+
+    np.save(dataset_path + '_checks.npy', checks)
+    run_names = [os.path.basename(os.path.normpath(run_dir))
+                 for run_dir in run_dirs]
+    write_dataset_metadata(dataset_path, shape, dtype, run_names, deck_names,
+                           nps)
+    return failed
+
+def load_tally_dataset(dataset_path, mode='r'):
+    # This function loads a dataset. The data and checks arrays are memory-
+    #  mapped (mode='r' is read-only, 'r+' lets them be changed in place), so
+    #  loading is instant and slices are views into the file.
+    # It returns (data, checks, metadata).
+    # Example (tally F4186 for all energy bins of the first run):
+        # data, checks, metadata = load_tally_dataset('2023-03-01_response')
+        # means = data[0, :, tally_index(metadata, 4186), 0]
+    with open(dataset_path + '.json', 'r') as f:
+        metadata = json.load(f)
+    data = np.load(dataset_path + '.npy', mmap_mode=mode)
+    checks = np.load(dataset_path + '_checks.npy', mmap_mode=mode)
+    return data, checks, metadata
+
+def tally_index(metadata, tally):
+    # This function returns where a tally number (eg. 4186 or '4186') is along
+    #  the tally axis of a dataset.
+    return metadata['tallies'].index(int(tally))
+
+def field_index(field):
+    # This function returns where a field (eg. 'error') is along the last axis
+    #  of a dataset.
+    return dataset_fields.index(field)
+
+def run_table(dataset_path, run=0, field='mean'):
+    # This function returns a (decks, 55) array of one field for one run. This
+    #  is the same layout as the CSV tables that save_data writes, so it can be
+    #  passed to the functions in dataManipulation in place of those tables.
+    data, checks, metadata = load_tally_dataset(dataset_path)
+    if isinstance(run, str):
+        run = metadata['runs'].index(run)
+    return data[run, :, :, field_index(field)]
@@ -0,0 +1,73 @@
+# These are the tests of ScrapeMCNP.py. They write small made up output files
+#  with only the parts of a real output file that the scraper looks at (the
+#  statistical check lines and the tally fluctuation charts).
+# Run them with:
+    # python -m pytest test_ScrapeMCNP.py
+
+import numpy as np
+import ScrapeMCNP as scrape
+
+def write_out_file(filename, num_prints, step=1000000000, printout=False):
+    # This function writes an output file with num_prints prints of the tally
+    #  fluctuation charts, one every step particles (like prdmp 1.0e+09). Like
+    #  MCNP, each print has all of the rows of the prints before it. If 
+    #  printout is True, each print starts with the printout of a tally, which
+    #  has lines that start with "tally" but aren't chart headers.
+    tallies = [int(tally) for tally in scrape.tally_numbers]
+    lines = ["1mcnp     version 6     ld=05/08/13                     03/01/23 10:00:00"]
+    for n in range(1, num_prints + 1):
+        if printout:
+            lines.append(f"1tally     4006        nps = {step*n:13d}")
+            lines.append("           tally type 6    track length estimate of heating.            units   mev/gram")
+            lines.append("           masses")
+            lines.append("                 cell:      4006")
+            lines.append("                         1.00000E+00")
+            lines.append("")
+            lines.append(" cell  4006")
+            lines.append(f"                 {0.6e-8:.5E} 0.0316")
+            lines.append("")
+        lines.append("1status of the statistical checks used to form confidence intervals for the mean for each tally bin")
+        for tally in tallies:
+            lines.append(f"     {tally}   passed the 10 statistical checks for the tally fluctuation chart bin result")
+        lines.append("1tally fluctuation charts")
+        for g in range(0, len(tallies), 3):
+            group = tallies[g:g+3]
+            lines.append("")
+            lines.append("                " + "".join(f"          tally {tally:8d}              " for tally in group))
+            lines.append("          nps" + "      mean     error   vov  slope    fom"*len(group))
+            for d in range(1, n + 1):
+                row = f"  {step*d:13d}"
+                for tally in group:
+                    row += f"   {(tally - 4000)*1e-8:.4E} {0.1/d**0.5:.4f} {0.01/d:.4f}  10.0 {500.0 + d:.1E}"
+                lines.append(row)
+        lines.append("")
+    with open(filename, "w") as f:
+        f.write("\n".join(lines) + "\n")
+
+def test_tally_printout_between_prints(tmp_path):
+    filename = str(tmp_path / "out_PNS_1e-9MeV")
+    write_out_file(filename, 3, printout=True)
+    for mode in ('lines', 'mmap'):
+        tallies = scrape.scrape_out_file(filename, mode=mode)
+        assert (tallies['nps'] == 3000000000).all()
+        assert np.allclose(tallies['error'], 0.1/3**0.5, atol=1e-4)
+        assert (tallies['checks'] == 10).all()
+
+def test_history_keeps_only_the_last_print(tmp_path):
+    filename = str(tmp_path / "out_PNS_1e-9MeV")
+    write_out_file(filename, 3)
+    for mode in ('lines', 'mmap'):
+        tallies, history = scrape.get_tfc_history(filename, mode=mode)
+        assert history.shape == (len(scrape.tally_numbers), 3)
+        assert (history['nps'] == [1000000000, 2000000000, 3000000000]).all()
+        assert (tallies['nps'] == 3000000000).all()
+        assert np.allclose(tallies['error'], 0.1/3**0.5, atol=1e-4)
+        assert (tallies['checks'] == 10).all()
+
+def test_earlier_nps_is_found_in_the_last_print(tmp_path):
+    filename = str(tmp_path / "out_PNS_1e-9MeV")
+    write_out_file(filename, 3)
+    for mode in ('lines', 'mmap'):
+        tallies = scrape.scrape_out_file(filename, nps=2e9, mode=mode)
+        assert (tallies['nps'] == 2000000000).all()
+        assert np.allclose(tallies['error'], 0.1/2**0.5, atol=1e-4)
@@ -0,0 +1,27 @@
+# These are the tests of monitorMCNP.py. They grow a made up output file (see
+#  test_ScrapeMCNP.write_out_file) a piece at a time, like a running job
+#  writes it, and poll it in between.
+# Run them with:
+    # python -m pytest test_monitorMCNP.py
+
+import numpy as np
+import monitorMCNP as monitor
+from test_ScrapeMCNP import write_out_file
+
+def test_poll_past_tally_printout(tmp_path):
+    whole = str(tmp_path / "whole")
+    write_out_file(whole, 3, printout=True)
+    with open(whole, "rb") as f:
+        text = f.read()
+    filename = str(tmp_path / "out_PNS_1e-9MeV")
+    tail_state = monitor.new_tail_state()
+    # the first piece ends in the middle of the second print's tally printout
+    cut = text.index(b"tally type 6", text.index(b"tally fluctuation charts")) + 5
+    for end in (cut, len(text)):
+        with open(filename, "wb") as f:
+            f.write(text[:end])
+        monitor.poll_out_file(tail_state, filename)
+    status = monitor.tally_status(tail_state, 0.01)
+    assert status['nps'] == 3000000000
+    assert np.isclose(status['max_error'], 0.1/3**0.5, atol=1e-4)
+    assert not status['converged']
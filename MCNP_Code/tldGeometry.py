@@ -0,0 +1,132 @@
+# This script has the table of TLD stations in the PNS. Everything that has to
+#  agree about where the TLDs are is made from it: the TLD cells, the TLD slot
+#  surfaces, the cylinder and hole cells and the F6 tallies in
+#  generateModel.py, the tally numbers in ScrapeMCNP.py, and the order of the
+#  tallies along each axis in dataManipulation.py.
+# A station is one TLD position in one of the X, Y or Z cylinders. Each station
+#  has six cells (a Li-6 chip and a Li-7 chip, each between two casings, see
+#  tld_layers) and one F6 tally on its Li-6 cell. Stations are numbered in the
+#  order their cells and tallies are: station i has Li-6 cell 400+i and tally
+#  F(4006+10*i).
+# To add a station or change where they are, change tld_axis_offsets and
+#  tld_slot_bounds. The decks and the analysis indices follow from them.
+
+import numpy as np
+
+axis_names = ('X', 'Y', 'Z')
+
+# The offset (cm) of each station along its axis, in station order. The center
+#  TLD (offset 0) is only on the X axis, the Y and Z axes share it.
+tld_axis_offsets = ([0, 3, -3, 6, -5.8, 8, -7.8, 9, -8.8, 10, -10, 11, -11, 12, -12, 13, -13, 14, -14],
+                    [3, -3, 6, -5.8, 8, -7.8, 9, -8.8, 10, -10, 11, -11, 12, -12, 13, -13, 14, -14],
+                    [3, -3, 6, -5.8, 8, -7.8, 9, -8.8, 10, -10, 11, -11, 12, -12, 13, -13, 14, -14])
+
+# The Z-axis TLDs sit 1 cm off of the axis (TRCL= (-1 0 z)).
+tld_axis_shift = ((0, 0, 0), (0, 0, 0), (-1, 0, 0))
+
+# The (min, max) along the axis of each slot cut into the cylinders for the
+#  TLDs, from the most negative to the most positive. The slot surfaces of each
+#  axis start at tld_slot_first_surface and go up by 100.
+tld_slot_bounds = (
+    [(-14.1258,-13.7555),(-13.1155,-12.7585),(-12.0995,-11.7495),(-11.0925,-10.7355),
+     (-10.0865,-9.7205),(-9.0655,-8.6975),(-8.0625,-7.6725),(-6.0575,-5.6965),
+     (-3.0875,-2.7015),(-0.1795,0.1795),(2.7525,3.1155),(5.7525,6.1135),
+     (7.7545,8.1245),(8.7585,9.1295),(9.7625,10.1565),(10.7915,11.1705),
+     (11.8305,12.1995),(12.8575,13.2255),(13.8665,14.2235)],
+    [(-14.1258,-13.7555),(-13.1155,-12.7585),(-12.0995,-11.7495),(-11.0925,-10.7355),
+     (-10.0865,-9.7205),(-9.0655,-8.6975),(-8.0625,-7.6725),(-6.0575,-5.6965),
+     (-3.0875,-2.7015),(2.7525,3.1155),(5.7525,6.1135),(7.7545,8.1245),
+     (8.7585,9.1295),(9.7625,10.1565),(10.7915,11.1705),(11.8305,12.1995),
+     (12.8575,13.2255),(13.8665,14.2235)],
+    [(-14.1255,-13.7555),(-13.1155,-12.7585),(-12.0995,-11.7495),(-11.0925,-10.7355),
+     (-10.0865,-9.7205),(-9.0655,-8.6975),(-8.0625,-7.6725),(-6.0575,-5.6965),
+     (-3.0875,-2.7015),(2.7525,3.1155),(5.7525,6.1135),(7.7545,8.1245),
+     (8.7585,9.1295),(9.7625,10.1565),(10.7915,11.1705),(11.8305,12.1995),
+     (12.8575,13.2255),(13.8665,14.2235)])
+tld_slot_first_surface = (21000, 23000, 25000)
+
+# The cylinder surface, the poly cylinder cell and the air (hole) cell of each
+#  axis.
+cylinder_surfaces = (20100, 20200, 20300)
+cylinder_cells = (10100, 10200, 10300)
+hole_cells = (11000, 11100, 11200)
+
+# The six cells of a station, in the order they are written in the cell card:
+    # (number, name, material, density, importance)
+# Station i's cell in a layer is number+i. It is inside the surface
+#  number+side, where side is 0 for the X axis, 1 and 2 for the +Y and -Y
+#  sides and 3 and 4 for the +Z and -Z sides (the TLD surfaces in
+#  generateModel.render_surf_card). A material of None is the detector
+#  material (22 for Li-6, 2 for Au).
+tld_layers = ((200, 'front casing of Li-6', '24', '-1.42', 1),
+              (400, 'Li-6', None, '-2.635', 3),
+              (300, 'back casing of Li-6', '24', '-1.42', 1),
+              (500, 'front casing of Li-7', '24', '-1.42', 1),
+              (600, 'Li-7', '23', '-2.635', 3),
+              (700, 'back casing of Li-7', '24', '-1.42', 1))
+li6_layer = 1
+
+tld_station_dtype = np.dtype([('index', 'i4'), ('axis', 'i1'), ('offset', 'f8'),
+                              ('side', 'i1'), ('shift', 'f8', 3),
+                              ('cells', 'i4', len(tld_layers)),
+                              ('surfaces', 'i4', len(tld_layers)),
+                              ('slot_surface', 'i4'), ('tally', 'i4')])
+tld_slot_dtype = np.dtype([('axis', 'i1'), ('surface', 'i4'), ('min', 'f8'),
+                           ('max', 'f8')])
+
+def build_tld_slots():
+    # This function returns the table of TLD slots (one row per slot, see
+    #  tld_slot_dtype) from tld_slot_bounds.
+    rows = [(axis, tld_slot_first_surface[axis] + 100*i, low, high)
+            for axis in range(len(axis_names))
+            for i, (low, high) in enumerate(tld_slot_bounds[axis])]
+    return np.array(rows, dtype=tld_slot_dtype)
+
+def build_tld_stations(slots):
+    # This function returns the table of TLD stations (one row per station, see
+    #  tld_station_dtype) from tld_axis_offsets. Each station is put in the
+    #  slot its offset is in, and a ValueError is raised if there isn't one.
+    rows = []
+    for axis in range(len(axis_names)):
+        axis_slots = slots[slots['axis'] == axis]
+        for offset in tld_axis_offsets[axis]:
+            index = len(rows)
+            side = 0 if axis == 0 else 2*axis - 1 + (offset < 0)
+            shift = list(tld_axis_shift[axis])
+            shift[axis] += offset
+            in_slot = (axis_slots['min'] <= offset) & (offset <= axis_slots['max'])
+            if not in_slot.any():
+                raise ValueError(f"The {axis_names[axis]}-axis TLD at {offset} isn't in a slot")
+            rows.append((index, axis, offset, side, shift,
+                         [layer[0] + index for layer in tld_layers],
+                         [layer[0] + side for layer in tld_layers],
+                         axis_slots['surface'][in_slot][0], 4006 + 10*index))
+    return np.array(rows, dtype=tld_station_dtype)
+
+def build_axis_columns(stations):
+    # This function returns the station indices (which are also the columns of
+    #  the (decks, 55) tally tables) along each axis from the most negative
+    #  to the most positive, with the center station in every axis. It
+    #  returns an array with shape (3, stations per axis).
+    center = stations['index'][stations['offset'] == 0]
+    columns = []
+    for axis in range(len(axis_names)):
+        on_axis = stations[(stations['axis'] == axis) & (stations['offset'] != 0)]
+        order = np.concatenate((on_axis['index'], center))
+        offsets = np.concatenate((on_axis['offset'], np.zeros(len(center))))
+        columns.append(order[np.argsort(offsets, kind='stable')])
+    return np.array(columns)
+
+tld_slots = build_tld_slots()
+tld_stations = build_tld_stations(tld_slots)
+
+# These are what the analysis uses:
+    # tally_numbers: the F6 tally of each station, in station (column) order
+    # tld_axis_columns: the tally table columns along each axis in position
+    #  order, so data[:, tld_axis_columns[0]] is the X axis from -14 to 14
+    # tld_axis_positions: the offsets that go with tld_axis_columns
+    # tally_column: {tally number: column}
+tally_numbers = tld_stations['tally']
+tld_axis_columns = build_axis_columns(tld_stations)
+tld_axis_positions = tld_stations['offset'][tld_axis_columns]
+tally_column = {int(tally): column for column, tally in enumerate(tally_numbers)}